@@ -0,0 +1,930 @@
+# Benchmark del loop di controllo su un backend audio simulato (funziona anche fuori da Windows).
+# Uso: cd src && python benchmark.py
+#      python benchmark.py --suite [--save risultati.json] [--compare baseline.json]
+import argparse
+import asyncio
+import contextlib
+import importlib.util
+import json
+import math
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+import simulated_audio as sim
+
+
+def load_volume_manager():
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "volume_manager_1.1.py")
+    spec = importlib.util.spec_from_file_location("volume_manager", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+vm = load_volume_manager()
+os.chdir(os.path.dirname(os.path.abspath(__file__)))
+vm.load_config()
+
+
+def make_fake_backend(session_count, notify_changes=True, **latencies):
+    # Discord (trigger) e Spotify (target all'80%) più session_count - 2 app non coinvolte;
+    # con latencies (vedi SimulatedAudioBackend) ogni chiamata al backend costa il tempo indicato
+    backend = sim.SimulatedAudioBackend(notify_changes=notify_changes, **latencies) if latencies else \
+        sim.FakeAudioBackend(notify_changes=notify_changes)
+    backend.add_session("Discord.exe")
+    backend.add_session("Spotify.exe", volume=0.8)
+    for i in range(max(0, session_count - 2)):
+        backend.add_session(f"app_{i}.exe")
+    return backend
+
+
+@contextlib.contextmanager
+def bench_config(**changes):
+    # Configurazione e stato di un benchmark: applica changes a vm.CONFIG, azzera vm.status e ripristina entrambi all'uscita.
+    # Restituisce la configurazione originale
+    saved_config = vm.CONFIG
+    vm.CONFIG = saved_config.replace(**changes) if changes else saved_config
+    vm.status = vm.AppStatus()
+    try:
+        yield saved_config
+    finally:
+        vm.apply_settings(saved_config)
+        vm.status = vm.AppStatus()
+
+
+class VirtualClockScenario:
+    # Trigger (Discord) e target (Spotify) su clock virtuale: per ogni picco della traccia esegue un tick,
+    # i passi di fade scaduti e on_tick(indice), poi avanza il clock di un tick.
+    # make_actuator(clock), se dato, crea il VolumeActuator del controller sullo stesso clock virtuale
+    def __init__(self, tick, fade_engine_class=vm.FadeEngine, target_volume=0.8, make_actuator=None, **controller_args):
+        self.tick = tick
+        self.now = 0.0
+        clock = lambda: self.now
+        self.backend = make_fake_backend(2)
+        self.trigger, self.target = self.backend.sessions[0], self.backend.sessions[1]
+        self.target.volume_control.volume = target_volume
+        self.fade_engine = fade_engine_class(clock=clock)
+        if make_actuator is not None:
+            controller_args["actuator"] = make_actuator(clock)
+        self.controller = vm.VolumeController(self.backend, self.fade_engine, clock=clock, **controller_args)
+
+    def run(self, trace, on_tick=None):
+        for tick_index, peak in enumerate(trace):
+            self.trigger.meter.peak = peak
+            self.controller.tick()
+            self.fade_engine.pump(self.now)
+            if on_tick:
+                on_tick(tick_index)
+            self.now += self.tick
+
+
+def print_result(title, rows):
+    print(f"\n{title}")
+    for label, value in rows:
+        print(f"  {label:<40} {value}")
+
+
+def naive_find_app_sessions(backend, app_name_target, all_sessions_list):
+    # Ricerca originale (prima della cache dei nomi): il processo di ogni sessione viene letto a ogni chiamata
+    app_name_lower = app_name_target.lower()
+    return [session for session in all_sessions_list
+            if app_name_lower in backend.read_process(session.ProcessId)[1].lower()]
+
+
+def bench_session_lookup(session_count=40, ticks=2000):
+    # Prima: enumerazione completa e due ricerche per tick, nome risolto ogni volta
+    backend = make_fake_backend(session_count)
+    start = time.perf_counter()
+    for _ in range(ticks):
+        all_sessions = backend.list_sessions()
+        naive_find_app_sessions(backend, "Discord.exe", all_sessions)
+        naive_find_app_sessions(backend, "Spotify.exe", all_sessions)
+    naive_seconds = time.perf_counter() - start
+    naive_lists = backend.list_calls
+    naive_lookups = backend.process_reads
+
+    # Dopo: indice sessioni + cache dei nomi
+    backend = make_fake_backend(session_count)
+    resolver = vm.ProcessNameResolver(reader=backend.read_process)
+    index = vm.SessionIndex(backend, ["Discord.exe", "Spotify.exe"], rescan_interval_seconds=2.0, resolver=resolver)
+    start = time.perf_counter()
+    for tick in range(ticks):
+        index.refresh(tick * 0.02)
+    indexed_seconds = time.perf_counter() - start
+
+    print_result(f"Ricerca sessioni ({session_count} sessioni, {ticks} tick da 20 ms)", [
+        ("enumerazioni/tick (prima)", f"{naive_lists / ticks:.3f}"),
+        ("enumerazioni/tick (dopo)", f"{backend.list_calls / ticks:.3f}"),
+        ("lookup PID/tick (prima)", f"{naive_lookups / ticks:.3f}"),
+        ("lookup PID/tick (dopo)", f"{backend.process_reads / ticks:.3f}"),
+        ("us/tick (prima)", f"{naive_seconds / ticks * 1e6:.1f}"),
+        ("us/tick (dopo)", f"{indexed_seconds / ticks * 1e6:.1f}"),
+    ])
+
+
+def bench_session_index_changes(session_count=40):
+    # Verifica che l'indice segua creazione e scadenza delle sessioni senza attendere la riscansione
+    backend = make_fake_backend(session_count)
+    index = vm.SessionIndex(backend, ["Discord.exe", "Spotify.exe"], rescan_interval_seconds=60.0,
+                            resolver=vm.ProcessNameResolver(reader=backend.read_process))
+    index.refresh(0.0)
+    second_target = backend.add_session("Spotify.exe")
+    targets_after_create = index.refresh(0.02)["Spotify.exe"]
+    backend.expire_session(second_target)
+    targets_after_expire = index.refresh(0.04)["Spotify.exe"]
+    print_result("Indice sessioni: notifiche di creazione/scadenza", [
+        ("target dopo creazione", len(targets_after_create)),
+        ("target dopo scadenza", len(targets_after_expire)),
+        ("scansioni complete", index.scans),
+    ])
+
+
+class MainLoopRunner:
+    # Esegue vm.main_loop_tui su un thread e misura durata e CPU (del solo thread del loop) di ogni tick
+    def __init__(self, backend, rules=None):
+        self.fade_engine = vm.FadeEngine(backend)
+        self.controller = vm.VolumeController(backend, self.fade_engine, rules=rules)
+        self.tick_cpu = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=vm.main_loop_tui, args=(self.controller, None, self._stop), daemon=True)
+        controller_tick = self.controller.tick
+        def timed_tick():
+            cpu_start = time.thread_time()
+            controller_tick()
+            self.tick_cpu.append(time.thread_time() - cpu_start)
+        self.controller.tick = timed_tick
+
+    def __enter__(self):
+        self.fade_engine.start()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.fade_engine.stop()
+
+
+class AsyncRuntimeRunner:
+    # Esegue AsyncRuntime (--asyncio) su un event loop in un thread separato, con la stessa interfaccia di MainLoopRunner
+    def __init__(self, backend, rules=None):
+        self.fade_engine = vm.FadeEngine(backend)
+        self.controller = vm.VolumeController(backend, self.fade_engine, rules=rules)
+        self.runtime = vm.AsyncRuntime(self.controller)
+        self._loop = asyncio.new_event_loop()
+        self._task = None
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        self._task = self._loop.create_task(self.runtime.run())
+        try:
+            self._loop.run_until_complete(self._task)
+        except asyncio.CancelledError:
+            pass
+        finally:
+            self._loop.close()
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        while self._task is None:
+            time.sleep(0.001)
+        # Come Ctrl+C: la cancellazione esegue anche il ripristino dei volumi di uscita
+        self._loop.call_soon_threadsafe(self._task.cancel)
+        self._thread.join()
+        self.fade_engine.stop()
+        self.runtime.executor.shutdown()
+
+
+def bench_trigger_to_duck_latency():
+    # Latenza tra l'inizio dell'attività del trigger e il primo abbassamento del target,
+    # sia da fermo (polling rallentato fino a MaxPollingIntervalSeconds) sia a metà di un fade-in di ripristino
+    with bench_config(DebounceTimeSeconds=0.1, ConfigReloadIntervalSeconds=0.0):
+        backend = make_fake_backend(10)
+        trigger, target = backend.sessions[0], backend.sessions[1]
+        target.volume_control = sim.RecordingVolumeControl(0.8)
+        with MainLoopRunner(backend):
+            time.sleep(1.0)
+            trigger.meter.peak = 0.9
+            idle_start = time.perf_counter()
+            time.sleep(0.5)
+            idle_latency = target.volume_control.first_write_after(idle_start, lambda level: level < 0.8)
+
+            trigger.meter.peak = 0.0
+            # Attende l'inizio del fade-in (rilascio del TriggerDetector + debounce), poi un terzo della sua durata
+            ducked_level = target.volume_control.volume
+            deadline = time.perf_counter() + 5.0
+            while target.volume_control.volume <= ducked_level and time.perf_counter() < deadline:
+                time.sleep(0.005)
+            time.sleep(vm.CONFIG.FadeInDurationSeconds / 3)
+            mid_fade_level = target.volume_control.volume
+            trigger.meter.peak = 0.9
+            mid_fade_start = time.perf_counter()
+            time.sleep(0.5)
+            mid_fade_latency = target.volume_control.first_write_after(mid_fade_start, lambda level: level < mid_fade_level)
+        original_volume = vm.status.original_target_volume_value
+
+    def fmt(latency):
+        return "nessun duck" if latency is None else f"{latency * 1000:.1f} ms"
+    print_result(f"Latenza trigger -> duck (main_loop_tui, polling {vm.CONFIG.PollingIntervalSeconds * 1000:.0f}-"
+                 f"{vm.CONFIG.MaxPollingIntervalSeconds * 1000:.0f} ms)", [
+        ("da target a riposo", fmt(idle_latency)),
+        ("durante il fade-in di ripristino", fmt(mid_fade_latency)),
+        ("volume originale preservato", f"{original_volume}"),
+    ])
+
+
+def bench_async_runtime(trials=10, list_latency=0.05, peak_latency=0.002, churn_period=0.03):
+    # Loop a thread (main_loop_tui) contro runtime asyncio, entrambi con il polling adattivo di config.ini,
+    # con enumerazione lenta (list_latency) e sessioni che compaiono/spariscono ogni churn_period:
+    # nel loop a thread ogni scansione blocca il tick
+    rows = []
+    with bench_config(DebounceTimeSeconds=0.05, FadeInDurationSeconds=0.1, ConfigReloadIntervalSeconds=0.0):
+        for label, runner_class in (("thread", MainLoopRunner), ("asyncio", AsyncRuntimeRunner)):
+            vm.status = vm.AppStatus()
+            backend = make_fake_backend(10, list_latency=list_latency, peak_latency=peak_latency)
+            trigger, target = backend.sessions[0], backend.sessions[1]
+            target.volume_control = sim.RecordingVolumeControl(0.8)
+            stop_churn = threading.Event()
+            def churn():
+                while not stop_churn.wait(churn_period):
+                    backend.expire_session(backend.add_session("churn.exe"))
+            churn_thread = threading.Thread(target=churn, daemon=True)
+
+            runner = runner_class(backend)
+            tick_times = []
+            controller_tick = runner.controller.tick
+            def timed_tick():
+                controller_tick()
+                tick_times.append(time.perf_counter())
+            runner.controller.tick = timed_tick
+
+            latencies = []
+            with runner:
+                churn_thread.start()
+                time.sleep(0.3)
+                for _ in range(trials):
+                    trigger.meter.peak = 0.9
+                    duck_start = time.perf_counter()
+                    deadline = duck_start + 2.0
+                    while target.volume_control.first_write_after(duck_start, lambda level: level < 0.79) is None \
+                            and time.perf_counter() < deadline:
+                        time.sleep(0.002)
+                    latency = target.volume_control.first_write_after(duck_start, lambda level: level < 0.79)
+                    if latency is not None:
+                        latencies.append(latency)
+                    trigger.meter.peak = 0.0
+                    deadline = time.perf_counter() + 3.0
+                    while target.volume_control.volume < 0.8 - 1e-6 and time.perf_counter() < deadline:
+                        time.sleep(0.005)
+                    time.sleep(0.5) # Il polling adattivo torna a rallentare prima della prova successiva
+                stop_churn.set()
+                churn_thread.join()
+            gaps = [b - a for a, b in zip(tick_times, tick_times[1:])]
+            rows.append((f"{label}: trigger -> duck media/max",
+                         f"{statistics.mean(latencies) * 1000:.1f} / {max(latencies) * 1000:.1f} ms ({len(latencies)}/{trials} duck)"
+                         if latencies else "nessun duck"))
+            rows.append((f"{label}: intervallo tra tick (media/max)",
+                         f"{statistics.mean(gaps) * 1000:.1f} / {max(gaps) * 1000:.1f} ms"))
+            rows.append((f"{label}: scansioni complete", f"{runner.controller.session_index.scans}"))
+    print_result(f"Runtime a thread vs asyncio (enumerazione {list_latency * 1000:.0f} ms, picco {peak_latency * 1000:.0f} ms, "
+                 f"polling {vm.CONFIG.PollingIntervalSeconds * 1000:.0f}-{vm.CONFIG.MaxPollingIntervalSeconds * 1000:.0f} ms)", rows)
+
+
+def bench_fade_timing(set_latency=0.002):
+    # Durata reale dei fade configurati in [Fading], con SetMasterVolume che costa set_latency secondi
+    fades = [
+        ("fade-out", 0.8, 0.2, vm.CONFIG.FadeOutDurationSeconds, vm.CONFIG.FadeOutSteps),
+        ("fade-in", 0.2, 0.8, vm.CONFIG.FadeInDurationSeconds, vm.CONFIG.FadeInSteps),
+        ("uscita", 0.2, 0.8, vm.CONFIG.ExitFadeDurationSeconds, vm.CONFIG.ExitFadeSteps),
+    ]
+    rows = []
+    engine = vm.FadeEngine()
+    engine.start()
+    with bench_config() as saved_config:
+        try:
+            for curve in vm.FADE_CURVES:
+                vm.CONFIG = saved_config.replace(FadeTables=vm.build_fade_tables(curve))
+                for label, start_volume, target_volume, duration, steps in fades:
+                    control = sim.RecordingVolumeControl(start_volume, set_latency)
+                    started = time.perf_counter()
+                    engine.fade(control, control, target_volume, start_volume, duration, steps)
+                    engine.wait(control, duration + 1.0)
+                    elapsed = control.history[-1][0] - started
+                    rows.append((f"{curve} {label} ({duration:.2f}s, {steps} step)",
+                                 f"{elapsed * 1000:.1f} ms ({(elapsed - duration) * 1000:+.1f} ms, {len(control.history)} scritture)"))
+            # Come nel loop di controllo: le scritture passano da un VolumeChannel con il limite di MaxWritesPerSecond
+            vm.CONFIG = saved_config
+            actuator = vm.VolumeActuator(saved_config.VolumeFloatTolerance, saved_config.MaxWritesPerSecond)
+            for label, start_volume, target_volume, duration, steps in fades:
+                control = sim.RecordingVolumeControl(start_volume, set_latency)
+                channel = actuator.channel(label, control)
+                started = time.perf_counter()
+                engine.fade(label, channel, target_volume, start_volume, duration, steps)
+                engine.wait(label, duration + 1.0)
+                elapsed = control.history[-1][0] - started
+                rows.append((f"VolumeChannel {label} ({duration:.2f}s, {steps} step)",
+                             f"{elapsed * 1000:.1f} ms ({(elapsed - duration) * 1000:+.1f} ms, {len(control.history)} scritture, "
+                             f"volume finale {control.volume:.2f})"))
+        finally:
+            engine.stop()
+    print_result(f"Precisione durata fade (SetMasterVolume da {set_latency * 1000:.0f} ms)", rows)
+
+
+def bench_adaptive_polling(virtual_seconds=60.0):
+    # Tick eseguiti in un minuto virtuale con polling adattivo, nei casi tipici di una giornata
+    scenarios = [
+        ("app non aperte", [], 0.0),
+        ("trigger silenzioso", ["Discord.exe", "Spotify.exe"], 0.0),
+        ("trigger attivo", ["Discord.exe", "Spotify.exe"], 0.9),
+    ]
+    rows = []
+    with bench_config():
+        for label, app_names, peak in scenarios:
+            vm.status = vm.AppStatus()
+            backend = sim.FakeAudioBackend()
+            for name in app_names:
+                backend.add_session(name, volume=0.8)
+            if backend.sessions:
+                backend.sessions[0].meter.peak = peak
+            controller = vm.VolumeController(backend, vm.FadeEngine())
+            poller = vm.AdaptivePoller(vm.CONFIG.PollingIntervalSeconds, vm.CONFIG.MaxPollingIntervalSeconds,
+                                       vm.CONFIG.PollingBackoffFactor)
+            now, ticks = 0.0, 0
+            while now < virtual_seconds:
+                now += poller.interval
+                controller.tick()
+                poller.update(controller.needs_fast_polling(), now)
+                ticks += 1
+            fixed_ticks = virtual_seconds / vm.CONFIG.PollingIntervalSeconds
+            rows.append((label, f"{poller.effective_rate:.1f} Hz ({ticks} tick contro {fixed_ticks:.0f} a intervallo fisso)"))
+    print_result(f"Polling adattivo ({vm.CONFIG.PollingIntervalSeconds}s - {vm.CONFIG.MaxPollingIntervalSeconds}s)", rows)
+
+
+def bench_tui_rendering(iterations=2000):
+    # Costo di TuiRenderer.render() quando nulla cambia, rispetto alla ricostruzione di tutti i pannelli
+    with bench_config():
+        for i in range(vm.CONFIG.TuiMaxLogMessages):
+            vm.add_log_message(f"messaggio di prova {i}")
+        renderer = vm.TuiRenderer()
+        renderer.render()
+        start = time.perf_counter()
+        for _ in range(iterations):
+            renderer.render()
+        cached_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        for _ in range(iterations):
+            renderer._config_version = renderer._status_snapshot = renderer._log_version = None
+            renderer.render()
+        rebuild_seconds = time.perf_counter() - start
+    print_result(f"Rendering TUI ({vm.CONFIG.TuiMaxLogMessages} messaggi di log)", [
+        ("render() senza cambiamenti", f"{cached_seconds / iterations * 1e6:.1f} us"),
+        ("ricostruzione completa", f"{rebuild_seconds / iterations * 1e6:.1f} us"),
+    ])
+
+
+def bench_query_interface_cache(ticks=1000):
+    # QueryInterface eseguite dal loop: una per interfaccia per tutta la vita della sessione
+    with bench_config():
+        backend = make_fake_backend(10)
+        trigger = backend.sessions[0]
+        trigger.meter.peak = 0.9
+        controller = vm.VolumeController(backend, vm.FadeEngine())
+        controller.tick()
+        key_calls = backend.session_key_calls
+        for _ in range(ticks - 1):
+            controller.tick()
+        steady_calls = backend.query_interface_calls
+        steady_key_calls = backend.session_key_calls - key_calls
+
+        # Il target si chiude e riapre: la voce scaduta viene scartata e le interfacce richieste di nuovo
+        backend.expire_session(backend.sessions[1])
+        backend.add_session("Spotify.exe", volume=0.5)
+        for _ in range(ticks):
+            controller.tick()
+    print_result(f"Cache interfacce COM ({ticks} tick per fase, trigger attivo)", [
+        ("QueryInterface (2 sessioni usate)", steady_calls),
+        ("QueryInterface dopo riapertura target", backend.query_interface_calls - steady_calls),
+        ("session_key nei tick senza scansione", steady_key_calls),
+        ("voci in cache", len(controller.session_index.interfaces)),
+    ])
+
+
+def replay_trace(trace, tick, mode, release_ratio, debounce):
+    # Riproduce la traccia su clock virtuale; restituisce (transizioni regola, SetMasterVolume, secondi ridotto)
+    counts = {"transitions": 0, "active": False, "reduced_ticks": 0}
+    with bench_config(ReleaseThresholdRatio=release_ratio, DebounceTimeSeconds=debounce):
+        detector = vm.TriggerDetector(mode, vm.CONFIG.EnvelopeAttackSeconds, vm.CONFIG.EnvelopeReleaseSeconds,
+                                      math.ceil(vm.CONFIG.RmsWindowSeconds / tick))
+        scenario = VirtualClockScenario(tick, detector=detector)
+        controller = scenario.controller
+
+        def count(tick_index):
+            active = bool(controller.rule_active[0])
+            counts["transitions"] += active != counts["active"]
+            counts["active"] = active
+            counts["reduced_ticks"] += bool(controller.reduced[0])
+        scenario.run(trace, count)
+    return counts["transitions"], scenario.target.volume_control.set_calls, counts["reduced_ticks"] * tick
+
+
+def bench_trigger_detector(seconds=60.0):
+    # Flapping del rilevamento sul parlato con pause e sul rumore vicino alla soglia:
+    # picco istantaneo senza isteresi (comportamento originale) contro envelope/rms con isteresi
+    tick = vm.CONFIG.PollingIntervalSeconds
+    threshold = vm.CONFIG.TriggerVolumeThreshold
+    detectors = [("peak", 1.0), ("envelope", vm.CONFIG.ReleaseThresholdRatio), ("rms", vm.CONFIG.ReleaseThresholdRatio)]
+    rows = []
+    for trace_name, trace in (("parlato", sim.speech_trace(round(seconds / sim.SPEECH_BLOCK_SECONDS), tick)),
+                              ("rumore a soglia", sim.threshold_noise_trace(seconds, tick, threshold))):
+        for debounce in (0.3, vm.CONFIG.DebounceTimeSeconds):
+            for mode, release_ratio in detectors:
+                transitions, set_calls, reduced_seconds = replay_trace(trace, tick, mode, release_ratio, debounce)
+                rows.append((f"{trace_name}, debounce {debounce}s, {mode}",
+                             f"{transitions} transizioni, {set_calls} SetMasterVolume, ridotto {reduced_seconds:.1f}s"))
+
+    # Controlli sulla forma del rilevamento: attivazione immediata, rilascio entro un tempo limitato
+    detector = vm.TriggerDetector("envelope", vm.CONFIG.EnvelopeAttackSeconds, vm.CONFIG.EnvelopeReleaseSeconds, 15)
+    detector.resize(["trigger"])
+    detector.update(0, 0.0, 0.0)
+    attack_level = detector.update(0, 0.5, tick)
+    release_ticks = 1
+    while detector.update(0, 0.0, tick * (release_ticks + 1)) > threshold * vm.CONFIG.ReleaseThresholdRatio:
+        release_ticks += 1
+    rms_detector = vm.TriggerDetector("rms", window_samples=4)
+    rms_detector.resize(["trigger"])
+    rms_levels = [rms_detector.update(0, peak, i * tick) for i, peak in enumerate((0.4, 0.4, 0.4, 0.4, 0.0, 0.0, 0.0, 0.0))]
+    rows.append(("envelope dopo 1 tick a 0.5", f"{attack_level:.3f} (soglia {threshold})"))
+    rows.append(("rilascio envelope da 0.5", f"{release_ticks * tick * 1000:.0f} ms"))
+    rows.append(("rms finestra 4 (4x0.4 poi 4x0.0)", " ".join(f"{level:.2f}" for level in rms_levels)))
+    print_result(f"Rilevamento trigger su tracce sintetiche ({seconds:.0f} s, tick {tick * 1000:.0f} ms)", rows)
+
+
+class CountingFadeEngine(vm.FadeEngine):
+    fades_started = 0
+
+    def fade(self, *args):
+        self.fades_started += 1
+        super().fade(*args)
+
+
+def run_actuator_scenario(make_actuator, trace, tick, external_period_ticks=None):
+    # Riproduce la traccia su clock virtuale; se external_period_ticks è dato un'altra app riporta il target
+    # all'80% ogni external_period_ticks tick. Restituisce (SetMasterVolume sul target, fade avviati, attuatore)
+    with bench_config():
+        scenario = VirtualClockScenario(tick, CountingFadeEngine, make_actuator=make_actuator)
+        target = scenario.target
+
+        def external_write(tick_index):
+            if external_period_ticks and tick_index % external_period_ticks == 0:
+                target.volume_control.volume = 0.8
+        scenario.run(trace, external_write)
+    return target.volume_control.set_calls, scenario.fade_engine.fades_started, scenario.controller.actuator
+
+
+def bench_volume_actuator(seconds=30.0):
+    # Scritture del volume senza filtro (comportamento precedente) e con il VolumeActuator configurato
+    tick = vm.CONFIG.PollingIntervalSeconds
+    speech = sim.speech_trace(round(seconds / sim.SPEECH_BLOCK_SECONDS), tick)
+    always_on = [0.5] * int(seconds / tick)
+
+    def unfiltered(clock):
+        return vm.VolumeActuator(tolerance=-1.0, max_writes_per_second=0, fight_changes=10**9, clock=clock)
+
+    def configured(clock):
+        return vm.VolumeActuator(vm.CONFIG.VolumeFloatTolerance, vm.CONFIG.MaxWritesPerSecond, vm.CONFIG.FightChanges,
+                                 vm.CONFIG.FightWindowSeconds, vm.CONFIG.FightBackoffSeconds, vm.CONFIG.FightMaxBackoffSeconds,
+                                 clock)
+
+    rows = []
+    for scenario, trace, external_period_ticks in (("parlato", speech, None),
+                                                   ("conflitto ogni 100 ms", always_on, 5),
+                                                   ("conflitto ogni tick", always_on, 1)):
+        for label, make_actuator in (("senza filtro", unfiltered), ("con attuatore", configured)):
+            set_calls, fades_started, actuator = run_actuator_scenario(make_actuator, trace, tick, external_period_ticks)
+            rows.append((f"{scenario}, {label}",
+                         f"{set_calls} SetMasterVolume ({actuator.requested} richiesti, {actuator.dropped} scartati, "
+                         f"{actuator.coalesced} fusi), {fades_started} fade, {actuator.fights} conflitti"))
+    print_result(f"Attuatore volume ({seconds:.0f} s, tick {tick * 1000:.0f} ms)", rows)
+
+
+def write_trace(path, trace, tick, target_volume=0.8):
+    # Registra una traccia sintetica con TraceRecorder, come farebbe --record durante una chiamata
+    with bench_config():
+        scenario = VirtualClockScenario(tick, target_volume=target_volume)
+        controller = scenario.controller
+        recorder = vm.TraceRecorder(path, controller.trigger_names, controller.target_names)
+        try:
+            scenario.run(trace, lambda tick_index: recorder.record(controller, scenario.now))
+        finally:
+            recorder.close()
+    return recorder.rows
+
+
+def bench_trace_replay(seconds=600.0):
+    # Simulazione di una traccia registrata (parlato sintetico) su clock virtuale
+    tick = vm.CONFIG.PollingIntervalSeconds
+    path = os.path.join(tempfile.gettempdir(), "volume_changer_bench.vct")
+    rows = write_trace(path, sim.speech_trace(round(seconds / sim.SPEECH_BLOCK_SECONDS), tick), tick)
+    try:
+        with vm.TraceFile(path) as trace, bench_config():
+            report = vm.simulate_trace(trace)
+        result = [("righe registrate", f"{rows} ({os.path.getsize(path) / 1024:.0f} KiB)")]
+        result += [(line.split(":")[0], line.split(":", 1)[1].strip()) for line in report.lines()]
+    finally:
+        os.remove(path)
+    print_result(f"Registrazione e simulazione traccia ({seconds:.0f} s di parlato sintetico)", result)
+
+
+def bench_reduction_lookup(calls=200000):
+    # Costo di calculate_dynamic_reduction_amount: scansione lineare delle regole (prima) contro tabella compilata
+    def linear_scan(original_volume_level, rules):
+        for threshold, reduction_amount in rules:
+            if original_volume_level >= threshold:
+                return reduction_amount
+        return 0.0
+
+    volumes = [i / calls for i in range(calls)]
+    rows = []
+    with bench_config() as saved_config:
+        for rule_count in (len(vm.CONFIG.DynamicReductionRulesList), 100):
+            rules = vm.CONFIG.DynamicReductionRulesList if rule_count != 100 else \
+                [(i / 100, 0.8 * i / 100) for i in range(99, -1, -1)]
+            vm.CONFIG = saved_config.replace(DynamicReductionRulesList=tuple(rules), ReductionTable=vm.build_reduction_table(rules))
+            start = time.perf_counter()
+            for volume in volumes:
+                linear_scan(volume, rules)
+            scan_time = (time.perf_counter() - start) / calls
+            lookup = vm.calculate_dynamic_reduction_amount
+            start = time.perf_counter()
+            for volume in volumes:
+                lookup(volume)
+            table_time = (time.perf_counter() - start) / calls
+            rows.append((f"{rule_count} regole", f"scansione {scan_time * 1e9:.0f} ns, tabella {table_time * 1e9:.0f} ns"))
+
+    step_table = vm.build_reduction_table(vm.CONFIG.DynamicReductionRulesList)
+    interpolated_table = vm.build_reduction_table(vm.CONFIG.DynamicReductionRulesList, interpolate=True)
+    rows.append(("celle con una soglia (confronto esatto)", f"{sum(value != value for value in step_table)} su {len(step_table)}"))
+    for volume in (0.2, 0.4, 0.6, 0.7496, 0.75, 0.8, 0.9, 1.0):
+        reductions = []
+        for table in (step_table, interpolated_table):
+            with bench_config(ReductionTable=table):
+                reductions.append(vm.calculate_dynamic_reduction_amount(volume))
+        rows.append((f"volume {volume} -> riduzione", f"gradini {reductions[0]:.3f}, interpolata {reductions[1]:.3f}"))
+    print_result("Riduzione dinamica: tabella compilata", rows)
+
+
+def bench_config_reload(polls=20000):
+    # Ricaricamento a caldo: costo di ConfigWatcher.poll() senza modifiche, accesso ai valori e
+    # cambio di configurazione a target ridotto (il volume originale deve sopravvivere)
+    rows = []
+    watcher = vm.ConfigWatcher(vm.CONFIG_PATH, check_interval_seconds=0.0)
+    start = time.perf_counter()
+    for _ in range(polls):
+        watcher.poll()
+    rows.append(("poll() senza modifiche (os.stat)", f"{(time.perf_counter() - start) / polls * 1e6:.1f} us"))
+
+    values = {name: getattr(vm.CONFIG, name) for name in vm.Settings.__slots__}
+    settings = vm.CONFIG
+    start = time.perf_counter()
+    for _ in range(polls):
+        values['VolumeFloatTolerance']; values['FadeOutSteps']; values['DebounceTimeSeconds']
+    dict_time = time.perf_counter() - start
+    start = time.perf_counter()
+    for _ in range(polls):
+        settings.VolumeFloatTolerance; settings.FadeOutSteps; settings.DebounceTimeSeconds
+    slots_time = time.perf_counter() - start
+    rows.append(("3 letture: dict / Settings", f"{dict_time / polls * 1e9:.0f} ns / {slots_time / polls * 1e9:.0f} ns"))
+
+    path = os.path.join(tempfile.gettempdir(), "volume_changer_bench.ini")
+    with open(vm.CONFIG_PATH, encoding="utf-8") as source:
+        original_text = source.read()
+    with bench_config():
+        try:
+            with open(path, "w", encoding="utf-8") as target_file:
+                target_file.write(original_text)
+            backend = make_fake_backend(2)
+            trigger, target = backend.sessions[0], backend.sessions[1]
+            controller = vm.VolumeController(backend, vm.FadeEngine())
+            poller = vm.AdaptivePoller(vm.CONFIG.PollingIntervalSeconds, vm.CONFIG.MaxPollingIntervalSeconds)
+            watcher = vm.ConfigWatcher(path, check_interval_seconds=0.0)
+            trigger.meter.peak = 0.5
+            controller.tick()
+            controller.fade_engine.stop()
+            level_before = target.volume_control.volume
+
+            with open(path, "w", encoding="utf-8") as target_file:
+                target_file.write(original_text.replace("UseDynamicReduction = True", "UseDynamicReduction = False")
+                                               .replace("FixedReductionAmountPoints = 0.20", "FixedReductionAmountPoints = 0.10"))
+            os.utime(path, ns=(time.time_ns(), time.time_ns() + 10**9))
+            start = time.perf_counter()
+            new_settings = watcher.poll()
+            vm.reload_config(new_settings, controller, poller)
+            reload_time = time.perf_counter() - start
+            controller.tick()
+            controller.fade_engine.stop()
+            time.sleep(2 / vm.CONFIG.MaxWritesPerSecond)
+            controller.actuator.flush() # Ultima scrittura eventualmente rimandata dal limite di frequenza
+            rows.append(("rilettura + applicazione", f"{reload_time * 1000:.2f} ms"))
+            rows.append(("volume target prima / dopo", f"{level_before:.2f} / {target.volume_control.volume:.2f} "
+                                                       f"(originale conservato: {controller.original_volumes[0]:.2f})"))
+        finally:
+            os.remove(path)
+    print_result("Configurazione: Settings immutabile e ricaricamento a caldo", rows)
+
+
+def bench_ducking_scaling(ticks=2000):
+    # Costo per tick del motore di ducking con 1, 10 e 100 sessioni in totale e numero di regole crescente.
+    # Metà delle sessioni (almeno una) sono coppie trigger/target distribuite sulle regole, le altre sono app
+    # non coinvolte; un trigger su due è attivo.
+    rows = []
+    with bench_config():
+        for session_count, rule_count in ((1, 1), (10, 1), (10, 2), (100, 1), (100, 10), (100, 25)):
+            vm.status = vm.AppStatus()
+            backend = sim.FakeAudioBackend()
+            rules = [vm.DuckingRule(f"r{i}", [f"trigger_{i}.exe"], [f"target_{i}.exe"], 0.1, None) for i in range(rule_count)]
+            involved = max(1, session_count // 2)
+            for i in range(involved):
+                rule_id = (i // 2) % rule_count
+                name = f"trigger_{rule_id}.exe" if i % 2 == 0 else f"target_{rule_id}.exe"
+                backend.add_session(name, volume=0.8, peak=0.5 if i % 4 == 0 else 0.0)
+            for i in range(session_count - involved):
+                backend.add_session(f"app_{i}.exe")
+            controller = vm.VolumeController(backend, vm.FadeEngine(), rules=rules)
+            controller.tick()
+            start = time.perf_counter()
+            for _ in range(ticks):
+                controller.tick()
+            elapsed = (time.perf_counter() - start) / ticks
+            rows.append((f"{session_count} sessioni, {rule_count} regole",
+                         f"{elapsed * 1e6:.1f} us/tick ({len(controller.trigger_sessions)} trigger, "
+                         f"{len(controller.target_sessions)} target, {session_count - involved} non coinvolte)"))
+    print_result("Motore di ducking multi-regola", rows)
+
+
+def bench_profiling_overhead(ticks=5000, session_count=40):
+    # Costo di VolumeController.tick() con le sonde di profiling disattivate e attivate
+    def run(enabled):
+        vm.status = vm.AppStatus()
+        vm.PROFILER = vm.PhaseProfiler(enabled)
+        backend = make_fake_backend(session_count)
+        backend.sessions[0].meter.peak = 0.05
+        controller = vm.VolumeController(backend, vm.FadeEngine())
+        start = time.perf_counter()
+        for _ in range(ticks):
+            probe_start = time.perf_counter()
+            controller.tick()
+            if enabled:
+                vm.PROFILER.record_tick(time.perf_counter() - probe_start, vm.CONFIG.PollingIntervalSeconds)
+        return (time.perf_counter() - start) / ticks
+
+    with bench_config():
+        disabled = run(False)
+        enabled = run(True)
+    rows = [("tick con profiling disattivato", f"{disabled * 1e6:.2f} us"),
+            ("tick con profiling attivo", f"{enabled * 1e6:.2f} us")]
+    for phase, summary in vm.PROFILER.summary()["phases"].items():
+        rows.append((f"  {phase} p50/p99", f"{summary['p50_us']:.0f} / {summary['p99_us']:.0f} us ({summary['count']} campioni)"))
+    vm.PROFILER = vm.PhaseProfiler()
+    print_result(f"Overhead profiling ({session_count} sessioni, {ticks} tick)", rows)
+
+
+STARTUP_PROBE = '''
+import importlib.util, os, sys, time
+start = time.perf_counter()
+spec = importlib.util.spec_from_file_location("volume_manager", "volume_manager_1.1.py")
+vm = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(vm)
+vm.load_config()
+if sys.argv[1] == "headless":
+    vm.CONFIG = vm.CONFIG.replace(HeadlessLogFile=os.devnull)
+    vm.setup_headless_logging()
+else:
+    from rich.live import Live
+    vm.TuiRenderer().render()
+elapsed = time.perf_counter() - start
+import psutil
+print(elapsed, psutil.Process().memory_info().rss, "rich" in sys.modules, "asyncio" in sys.modules)
+'''
+
+def bench_startup(runs=5):
+    # Tempo di avvio e memoria residente (RSS) di un processo nuovo in modalità headless e TUI
+    rows = []
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    probe_env = dict(os.environ, PYTHONDONTWRITEBYTECODE="1")
+    for mode in ("headless", "tui"):
+        timings, rss_values = [], []
+        for _ in range(runs):
+            output = subprocess.run([sys.executable, "-c", STARTUP_PROBE, mode], cwd=script_dir,
+                                    capture_output=True, text=True, check=True, env=probe_env).stdout.split()
+            timings.append(float(output[0]))
+            rss_values.append(int(output[1]))
+            rich_loaded, asyncio_loaded = output[2], output[3]
+        rows.append((mode, f"{statistics.median(timings) * 1000:.1f} ms, RSS {statistics.median(rss_values) / 2**20:.1f} MiB, rich caricato: {rich_loaded}, asyncio caricato: {asyncio_loaded}"))
+    print_result("Avvio (mediana su processi nuovi)", rows)
+
+
+# --- SUITE DI REGRESSIONE ---
+# Esegue main_loop_tui su SimulatedAudioBackend con N sessioni e salva le metriche in JSON, così due versioni
+# possono essere confrontate: python benchmark.py --suite --save prima.json, poi --suite --compare prima.json
+SUITE_METRICS = {
+    # nome: (unità, True se valori più alti sono migliori, variazione assoluta sotto cui non è una regressione)
+    "ticks_per_second": ("tick/s", True, 0.0),
+    "cpu_us_per_tick": ("us", False, 2.0),
+    "trigger_to_duck_p50_ms": ("ms", False, 20.0),
+    "fade_duration_error_ms": ("ms", False, 2.0),
+    "fade_max_step_gap_ms": ("ms", False, 2.0),
+    "memory_kib": ("KiB", False, 4.0),
+}
+SUITE_LATENCIES = dict(list_latency=0.02, process_latency=0.001, peak_latency=0.0005, volume_latency=0.001)
+
+
+def suite_rules(session_count):
+    # Una regola ogni 10 sessioni: metà delle sessioni sono app non coinvolte
+    rule_count = max(1, session_count // 10)
+    return [vm.DuckingRule(f"r{i}", [f"trigger_{i}.exe"], [f"target_{i}.exe"], vm.CONFIG.TriggerVolumeThreshold, None)
+            for i in range(rule_count)]
+
+
+def suite_backend(session_count, **latencies):
+    rules = suite_rules(session_count)
+    backend = sim.SimulatedAudioBackend.from_rules(rules, max(0, session_count - 2 * len(rules)), **latencies)
+    return backend, rules
+
+
+def suite_throughput(session_count, seconds=1.0):
+    # Polling a intervallo zero e backend senza latenze: misura il costo del codice, non delle chiamate simulate
+    backend, rules = suite_backend(session_count)
+    runner = MainLoopRunner(backend, rules)
+    # Solo il poller di main_loop_tui usa l'intervallo zero (il TriggerDetector è già stato creato)
+    vm.CONFIG = vm.CONFIG.replace(PollingIntervalSeconds=0.0, MaxPollingIntervalSeconds=0.0)
+    with runner:
+        time.sleep(0.1)
+        first_tick = len(runner.tick_cpu)
+        time.sleep(seconds)
+        tick_cpu = runner.tick_cpu[first_tick:]
+    return {"ticks_per_second": len(tick_cpu) / seconds, "cpu_us_per_tick": statistics.mean(tick_cpu) * 1e6}
+
+
+def suite_trigger_to_duck(session_count, trials=5):
+    # Polling adattivo di config.ini e latenze SUITE_LATENCIES; tutti i trigger tacciono tranne quello misurato
+    vm.CONFIG = vm.CONFIG.replace(DebounceTimeSeconds=0.05, FadeInDurationSeconds=0.1)
+    backend, rules = suite_backend(session_count, **SUITE_LATENCIES)
+    trigger_names = {name for rule in rules for name in rule.trigger_names}
+    for session in backend.sessions:
+        if session.process_name in trigger_names:
+            session.meter.generator = sim.constant_peak(0.0)
+    trigger = next(session for session in backend.sessions if session.process_name == rules[0].trigger_names[0])
+    target = next(session for session in backend.sessions if session.process_name == rules[0].target_names[0])
+    target.volume_control = sim.RecordingVolumeControl(0.8, SUITE_LATENCIES["volume_latency"])
+    latencies = []
+    with MainLoopRunner(backend, rules):
+        time.sleep(0.5) # Il polling adattivo rallenta fino a MaxPollingIntervalSeconds
+        for _ in range(trials):
+            trigger.meter.generator = sim.constant_peak(0.9)
+            duck_start = time.perf_counter()
+            deadline = duck_start + 2.0
+            while target.volume_control.first_write_after(duck_start, lambda level: level < 0.79) is None and time.perf_counter() < deadline:
+                time.sleep(0.002)
+            latency = target.volume_control.first_write_after(duck_start, lambda level: level < 0.79)
+            latencies.append(2.0 if latency is None else latency)
+            trigger.meter.generator = sim.constant_peak(0.0)
+            deadline = time.perf_counter() + 3.0
+            while target.volume_control.volume < 0.8 - 1e-6 and time.perf_counter() < deadline:
+                time.sleep(0.005)
+            time.sleep(0.5)
+    return {"trigger_to_duck_p50_ms": statistics.median(latencies) * 1000}
+
+
+def suite_fade_timing(repeats=5):
+    # Fade di [Fading] attraverso un VolumeChannel (limite MaxWritesPerSecond), con SetMasterVolume da volume_latency:
+    # errore sulla durata e step più distanti del previsto
+    # (mediane su repeats ripetizioni, per non registrare un singolo ritardo dello scheduler come regressione)
+    latency = SUITE_LATENCIES["volume_latency"]
+    fades = [(0.8, 0.2, vm.CONFIG.FadeOutDurationSeconds, vm.CONFIG.FadeOutSteps),
+             (0.2, 0.8, vm.CONFIG.FadeInDurationSeconds, vm.CONFIG.FadeInSteps)]
+    errors, step_gaps = [], []
+    actuator = vm.VolumeActuator(vm.CONFIG.VolumeFloatTolerance, vm.CONFIG.MaxWritesPerSecond)
+    engine = vm.FadeEngine()
+    engine.start()
+    try:
+        for start_volume, target_volume, duration, steps in fades * repeats:
+            control = sim.RecordingVolumeControl(start_volume, latency)
+            started = time.perf_counter()
+            engine.fade(control, actuator.channel(control, control), target_volume, start_volume, duration, steps)
+            engine.wait(control, duration + 1.0)
+            times = [started] + [timestamp for timestamp, _ in control.history]
+            errors.append(abs(times[-1] - started - duration))
+            step_gaps.append(max(b - a for a, b in zip(times, times[1:])) - duration / steps)
+    finally:
+        engine.stop()
+    return {"fade_duration_error_ms": statistics.median(errors) * 1000, "fade_max_step_gap_ms": statistics.median(step_gaps) * 1000}
+
+
+def suite_memory(session_count, ticks=50):
+    # Memoria allocata da controller, indice sessioni e stato per slot (escluso il backend simulato)
+    backend, rules = suite_backend(session_count)
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    controller = vm.VolumeController(backend, vm.FadeEngine(), rules=rules)
+    for _ in range(ticks):
+        controller.tick()
+    allocated = tracemalloc.get_traced_memory()[0] - baseline
+    tracemalloc.stop()
+    return {"memory_kib": allocated / 1024}
+
+
+def run_suite(session_counts):
+    results = {}
+    with bench_config(ConfigReloadIntervalSeconds=0.0):
+        suite_config = vm.CONFIG
+        for metric, value in suite_fade_timing().items():
+            results[metric] = value
+        for session_count in session_counts:
+            for measure in (suite_throughput, suite_trigger_to_duck, suite_memory):
+                vm.status = vm.AppStatus()
+                vm.CONFIG = suite_config
+                for metric, value in measure(session_count).items():
+                    results[f"{metric}/{session_count}"] = value
+    return results
+
+
+def suite_unit(key):
+    return SUITE_METRICS[key.split("/")[0]][0]
+
+
+def compare_suite(results, baseline, tolerance):
+    # Restituisce il numero di metriche peggiorate rispetto al baseline oltre la tolleranza relativa (es. 0.15 = 15%)
+    # e oltre la soglia assoluta di rumore della metrica
+    rows, regressions = [], 0
+    for key, value in results.items():
+        if key not in baseline:
+            rows.append((key, f"{value:.2f} {suite_unit(key)} (nuova)"))
+            continue
+        previous = baseline[key]
+        change = (value - previous) / previous if previous else 0.0
+        _, higher_is_better, noise = SUITE_METRICS[key.split("/")[0]]
+        worse = abs(value - previous) > noise and (change < -tolerance if higher_is_better else change > tolerance)
+        regressions += worse
+        rows.append((key, f"{previous:.2f} -> {value:.2f} {suite_unit(key)} ({change * 100:+.1f}%)"
+                          f"{'  REGRESSIONE' if worse else ''}"))
+    print_result(f"Confronto con il baseline (tolleranza {tolerance * 100:.0f}%)", rows)
+    return regressions
+
+
+def main_suite(args):
+    results = run_suite(args.sessions)
+    print_result(f"Suite su backend simulato ({', '.join(map(str, args.sessions))} sessioni)",
+                 [(key, f"{value:.2f} {suite_unit(key)}") for key, value in results.items()])
+    if args.save:
+        report = {"created": time.strftime("%Y-%m-%dT%H:%M:%S"), "python": platform.python_version(),
+                  "platform": platform.platform(), "sessions": args.sessions, "latencies": SUITE_LATENCIES, "results": results}
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nRisultati salvati in '{args.save}'.")
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+        if compare_suite(results, baseline, args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Benchmark di Volume Changer su backend audio simulato.")
+    arg_parser.add_argument("--suite", action="store_true", help="Esegue la suite di regressione invece dei microbenchmark.")
+    arg_parser.add_argument("--sessions", type=int, nargs="+", default=[10, 100, 500], help="Numeri di sessioni simulate (suite).")
+    arg_parser.add_argument("--save", metavar="FILE", help="Salva i risultati della suite in un file JSON.")
+    arg_parser.add_argument("--compare", metavar="FILE", help="Confronta con un file salvato con --save; esce con 1 se ci sono regressioni.")
+    arg_parser.add_argument("--tolerance", type=float, default=0.15, help="Peggioramento relativo tollerato nel confronto (default 0.15).")
+    args = arg_parser.parse_args()
+
+    if args.suite:
+        main_suite(args)
+        sys.exit(0)
+
+    bench_session_lookup()
+    bench_session_lookup(500) # Più sessioni di ProcessNameCacheSize
+    bench_session_index_changes()
+    bench_trigger_to_duck_latency()
+    bench_async_runtime()
+    bench_fade_timing()
+    bench_adaptive_polling()
+    bench_tui_rendering()
+    bench_query_interface_cache()
+    bench_ducking_scaling()
+    bench_trigger_detector()
+    bench_volume_actuator()
+    bench_trace_replay()
+    bench_reduction_lookup()
+    bench_config_reload()
+    bench_profiling_overhead()
+    bench_startup()
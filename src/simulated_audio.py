@@ -0,0 +1,237 @@
+# Sessioni audio finte e backend simulato per volume_manager_1.1.py: servono a test, benchmark,
+# --backend simulated e --replay. Lo script li importa solo in questi casi, come pycaw e Rich.
+import itertools
+import math
+import random
+import time
+
+
+# --- BACKEND FINTO (IN MEMORIA) ---
+class FakeVolumeControl:
+    def __init__(self, volume=1.0):
+        self.volume = volume
+        self.set_calls = 0
+
+    def GetMasterVolume(self):
+        return self.volume
+
+    def SetMasterVolume(self, level, event_context):
+        self.set_calls += 1
+        self.volume = level
+
+
+class FakeMeter:
+    def __init__(self, peak=0.0):
+        self.peak = peak
+
+    def GetPeakValue(self):
+        return self.peak
+
+
+class FakeAudioSession:
+    def __init__(self, process_id, process_name, volume=1.0, peak=0.0):
+        self.ProcessId = process_id
+        self.process_name = process_name
+        self.volume_control = FakeVolumeControl(volume)
+        self.meter = FakeMeter(peak)
+        self.expired = False
+
+
+class FakeAudioBackend:
+    # Backend in memoria per provare indice sessioni e logica di controllo senza Windows.
+    # Stessa interfaccia di AudioBackend in volume_manager_1.1.py
+    errors = (Exception,)
+
+    def __init__(self, notify_changes=True):
+        self.notify_changes = notify_changes
+        self.sessions = []
+        self.list_calls = 0
+        self.process_reads = 0
+        self.query_interface_calls = 0
+        self.session_key_calls = 0 # Per pycaw session_key è una chiamata COM (GetSessionInstanceIdentifier)
+        self._changes = 0
+        self._next_pid = itertools.count(1000)
+
+    def add_session(self, process_name, volume=1.0, peak=0.0, process_id=None):
+        session = FakeAudioSession(next(self._next_pid) if process_id is None else process_id, process_name, volume, peak)
+        self.sessions.append(session)
+        self._changes += 1
+        return session
+
+    def expire_session(self, session):
+        session.expired = True
+        self.sessions.remove(session)
+        self._changes += 1
+
+    def list_sessions(self):
+        self.list_calls += 1
+        return list(self.sessions)
+
+    def is_expired(self, session):
+        return session.expired
+
+    def volume_control(self, session):
+        self.query_interface_calls += 1
+        return session.volume_control
+
+    def meter(self, session):
+        self.query_interface_calls += 1
+        return session.meter
+
+    def change_counter(self):
+        return self._changes if self.notify_changes else None
+
+    def session_key(self, session):
+        self.session_key_calls += 1
+        return id(session)
+
+    def init_thread(self):
+        pass
+
+    def read_process(self, pid):
+        self.process_reads += 1
+        for session in self.sessions:
+            if session.ProcessId == pid:
+                return 0.0, session.process_name
+        return None, f"PID_{pid}_?"
+
+
+# --- BACKEND SIMULATO ---
+# Sessioni, PID, picchi e controlli di volume sintetici con latenza configurabile per chiamata:
+# permette di eseguire (e misurare) il loop di controllo fuori da Windows. Un generatore di picchi
+# è una funzione del tempo (clock del backend) che restituisce il picco 0..1.
+def constant_peak(level):
+    return lambda now: level
+
+def burst_peak(level, on_seconds, off_seconds, phase_seconds=0.0):
+    # Parlato a raffiche: picco modulato intorno a level per on_seconds, poi silenzio per off_seconds
+    period = on_seconds + off_seconds
+    def peak(now):
+        position = (now + phase_seconds) % period
+        if position >= on_seconds: return 0.0
+        return level * (0.6 + 0.4 * abs(math.sin(position * 13.0)))
+    return peak
+
+
+def simulate_latency(seconds):
+    if seconds > 0:
+        time.sleep(seconds)
+
+
+class SimulatedVolumeControl(FakeVolumeControl):
+    def __init__(self, volume=1.0, latency=0.0):
+        super().__init__(volume)
+        self.latency = latency
+
+    def GetMasterVolume(self):
+        simulate_latency(self.latency)
+        return self.volume
+
+    def SetMasterVolume(self, level, event_context):
+        simulate_latency(self.latency)
+        super().SetMasterVolume(level, event_context)
+
+
+class SimulatedMeter:
+    def __init__(self, generator, clock, latency=0.0):
+        self.generator = generator
+        self.clock = clock
+        self.latency = latency
+
+    def GetPeakValue(self):
+        simulate_latency(self.latency)
+        return self.generator(self.clock())
+
+    @property
+    def peak(self):
+        return self.generator(self.clock())
+
+    @peak.setter
+    def peak(self, level):
+        # Come FakeMeter.peak: picco fisso
+        self.generator = constant_peak(level)
+
+
+class SimulatedAudioBackend(FakeAudioBackend):
+    # Latenze (secondi per chiamata): list_latency per l'enumerazione, process_latency per la lettura del
+    # processo di un PID, peak_latency per GetPeakValue, volume_latency per Get/SetMasterVolume
+    def __init__(self, list_latency=0.0, process_latency=0.0, peak_latency=0.0, volume_latency=0.0,
+                 clock=time.monotonic, notify_changes=True):
+        super().__init__(notify_changes)
+        self.list_latency = list_latency
+        self.process_latency = process_latency
+        self.peak_latency = peak_latency
+        self.volume_latency = volume_latency
+        self.clock = clock
+
+    @classmethod
+    def from_rules(cls, rules, background_sessions=8, **latencies):
+        # Una sessione per ogni app delle regole (trigger che parlano a raffiche sfasate, target all'80%)
+        # più background_sessions app non coinvolte
+        backend = cls(**latencies)
+        names = list(dict.fromkeys(name for rule in rules for name in rule.trigger_names + rule.target_names))
+        trigger_names = {name for rule in rules for name in rule.trigger_names}
+        for index, name in enumerate(names):
+            if name in trigger_names:
+                backend.add_session(name, peak=burst_peak(0.5, 2.0, 3.0, phase_seconds=index * 1.7))
+            else:
+                backend.add_session(name, volume=0.8)
+        for index in range(background_sessions):
+            backend.add_session(f"app_{index}.exe", peak=burst_peak(0.3, 1.0, 1.0, phase_seconds=index * 0.3))
+        return backend
+
+    def add_session(self, process_name, volume=1.0, peak=0.0, process_id=None):
+        # peak: valore fisso o generatore di picchi
+        session = super().add_session(process_name, volume, 0.0, process_id)
+        session.volume_control = SimulatedVolumeControl(volume, self.volume_latency)
+        session.meter = SimulatedMeter(peak if callable(peak) else constant_peak(peak), self.clock, self.peak_latency)
+        return session
+
+    def list_sessions(self):
+        simulate_latency(self.list_latency)
+        return super().list_sessions()
+
+    def read_process(self, pid):
+        simulate_latency(self.process_latency)
+        return super().read_process(pid)
+
+
+class RecordingVolumeControl(FakeVolumeControl):
+    # Registra (istante, livello) di ogni SetMasterVolume. clock: perf_counter nei benchmark in tempo reale,
+    # il clock virtuale nei test; latency simula il costo della chiamata COM
+    def __init__(self, volume=1.0, latency=0.0, clock=time.perf_counter):
+        super().__init__(volume)
+        self.latency = latency
+        self.clock = clock
+        self.history = []
+
+    def SetMasterVolume(self, level, event_context):
+        simulate_latency(self.latency)
+        self.history.append((self.clock(), level))
+        super().SetMasterVolume(level, event_context)
+
+    def first_write_after(self, since, predicate):
+        # Ritardo tra since e la prima scrittura con predicate(livello) vero, None se non è ancora avvenuta
+        return next((timestamp - since for timestamp, level in self.history if timestamp >= since and predicate(level)), None)
+
+
+# --- TRACCE DI PICCHI SINTETICHE ---
+# Un valore di picco per tick del polling, per TriggerDetector, VolumeActuator e registrazione/simulazione
+SPEECH_BLOCK_SECONDS = 4 * (1.0 + 0.15) + 3.0
+
+def speech_trace(blocks, tick, seed=3):
+    # blocks blocchi di parlato separati da pause lunghe (3 s); ogni blocco è fatto di 4 frasi da 1 s con
+    # brevi cali tra le parole e pause tra le frasi da 150 ms, che non devono far rilasciare il trigger
+    rng = random.Random(seed)
+    trace = []
+    for _ in range(blocks):
+        for _ in range(4):
+            trace += [rng.uniform(0.2, 0.6) if rng.random() > 0.2 else rng.uniform(0.0, 0.04) for _ in range(round(1.0 / tick))]
+            trace += [rng.uniform(0.0, 0.03) for _ in range(round(0.15 / tick))]
+        trace += [rng.uniform(0.0, 0.03) for _ in range(round(3.0 / tick))]
+    return trace
+
+def threshold_noise_trace(seconds, tick, threshold, seed=5):
+    # Rumore di fondo che oscilla attorno alla soglia del trigger (es. musica nel microfono)
+    rng = random.Random(seed)
+    return [max(0.0, threshold + rng.uniform(-0.03, 0.03)) for _ in range(round(seconds / tick))]
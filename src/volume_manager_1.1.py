@@ -1,88 +1,188 @@
 import time
 import os
+import argparse
+import bisect
 import configparser
-from ctypes import cast, POINTER
-from comtypes import CLSCTX_ALL, COMError
-from pycaw.pycaw import AudioUtilities, IAudioEndpointVolume, ISimpleAudioVolume, IAudioMeterInformation
+import json
+import logging
+import threading
 import psutil
 import math
-from collections import deque
-
-from rich.console import Console
-from rich.layout import Layout
-from rich.live import Live
-from rich.panel import Panel
-from rich.table import Table
-from rich.text import Text
-from rich.align import Align
+import mmap
+import struct
+from abc import ABC, abstractmethod
+from array import array
+from collections import deque, OrderedDict
+from typing import TYPE_CHECKING
+
+# Rich viene importato solo dalle funzioni della TUI: in modalità --headless non viene mai caricato
+if TYPE_CHECKING:
+    from rich.layout import Layout
+    from rich.panel import Panel
+    from rich.text import Text
 # import rich.box # Only if you use specific box styles like rich.box.ROUNDED
 
 
 # --- GLOBAL CONFIGURATION OBJECT ---
-CONFIG = {}
+CONFIG = None # Settings immutabile creato da load_config; il ricaricamento a caldo lo sostituisce in blocco
+CONFIG_PATH = "config.ini"
 LOG_MESSAGES = deque(maxlen=100) # Default, will be updated from config
+LOG_VERSION = 0 # Incrementato a ogni nuovo messaggio, per ridisegnare il pannello log solo se serve
+CONFIG_VERSION = 0 # Incrementato a ogni caricamento della configurazione
+LOGGER = logging.getLogger("volume_changer") # Usato solo in modalità --headless (file di log a rotazione)
+LOGGER.propagate = False
+LOG_LEVELS = {"INFO": logging.INFO, "WARN": logging.WARNING, "ERROR": logging.ERROR, "SUCCESS": logging.INFO, "ACTION": logging.INFO}
+
+class Settings:
+    # Valori di config.ini già convertiti e validati, più quelli derivati (tabelle di fade, tabella di riduzione,
+    # regole di ducking). Immutabile: una configurazione nuova è sempre un oggetto nuovo, assegnato a CONFIG
+    # in un'unica operazione, così i thread (fade, TUI) vedono la vecchia o la nuova, mai un misto.
+    __slots__ = (
+        'TriggerAppName', 'TargetAppName', 'PollingIntervalSeconds', 'MaxPollingIntervalSeconds', 'PollingBackoffFactor',
+        'NearThresholdRatio', 'DebounceTimeSeconds', 'ProcessNameCacheSize', 'ProcessNameCacheTTLSeconds',
+        'SessionRescanIntervalSeconds', 'ConfigReloadIntervalSeconds',
+        'TriggerVolumeThreshold', 'UseDynamicReduction', 'FixedReductionAmountPoints', 'MinimumVolumeAfterReduction',
+        'VolumeFloatTolerance',
+        'DynamicReductionRulesList', 'InterpolateReduction', 'ReductionTable', 'DuckingRules',
+        'DetectorLevel', 'EnvelopeAttackSeconds', 'EnvelopeReleaseSeconds', 'RmsWindowSeconds', 'ReleaseThresholdRatio',
+        'MaxWritesPerSecond', 'FightChanges', 'FightWindowSeconds', 'FightBackoffSeconds', 'FightMaxBackoffSeconds',
+        'FadeOutDurationSeconds', 'FadeOutSteps', 'FadeInDurationSeconds', 'FadeInSteps', 'ExitFadeDurationSeconds',
+        'ExitFadeSteps', 'FadeCurve', 'FadeTables',
+        'TuiRefreshRate', 'TuiMaxLogMessages',
+        'HeadlessLogFile', 'HeadlessLogMaxBytes', 'HeadlessLogBackupCount',
+        'EnableProfiling', 'ProfileDumpFile',
+    )
+
+    def __init__(self, **values):
+        for name in self.__slots__:
+            object.__setattr__(self, name, values[name])
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"Settings è immutabile: impossibile modificare '{name}' (usare replace())")
+
+    def replace(self, **changes):
+        # Copia con alcuni valori cambiati; i valori derivati non vengono ricalcolati
+        values = {name: getattr(self, name) for name in self.__slots__}
+        values.update(changes)
+        return Settings(**values)
+
 
 # --- CONFIGURATION LOADING ---
-def load_config():
-    global CONFIG, LOG_MESSAGES
+def read_settings(path=CONFIG_PATH):
+    # Legge e valida config.ini; solleva un'eccezione (senza toccare la configurazione attiva) se il file non è valido
     parser = configparser.ConfigParser(inline_comment_prefixes=';') # Allow ; for comments
-    
-    if not os.path.exists("config.ini"):
+    if not parser.read(path):
+        raise FileNotFoundError(f"File '{path}' non trovato")
+    values = {}
+
+    values['TriggerAppName'] = parser.get('General', 'TriggerAppName')
+    values['TargetAppName'] = parser.get('General', 'TargetAppName')
+    values['PollingIntervalSeconds'] = parser.getfloat('General', 'PollingIntervalSeconds')
+    values['MaxPollingIntervalSeconds'] = max(values['PollingIntervalSeconds'],
+                                              parser.getfloat('General', 'MaxPollingIntervalSeconds', fallback=0.25))
+    values['PollingBackoffFactor'] = max(1.0, parser.getfloat('General', 'PollingBackoffFactor', fallback=1.5))
+    values['NearThresholdRatio'] = parser.getfloat('General', 'NearThresholdRatio', fallback=0.5)
+    values['DebounceTimeSeconds'] = parser.getfloat('General', 'DebounceTimeSeconds')
+    values['ProcessNameCacheSize'] = parser.getint('General', 'ProcessNameCacheSize', fallback=256)
+    values['ProcessNameCacheTTLSeconds'] = parser.getfloat('General', 'ProcessNameCacheTTLSeconds', fallback=30.0)
+    values['SessionRescanIntervalSeconds'] = parser.getfloat('General', 'SessionRescanIntervalSeconds', fallback=2.0)
+    values['ConfigReloadIntervalSeconds'] = parser.getfloat('General', 'ConfigReloadIntervalSeconds', fallback=1.0)
+
+    values['TriggerVolumeThreshold'] = parser.getfloat('VolumeControl', 'TriggerVolumeThreshold')
+    values['UseDynamicReduction'] = parser.getboolean('VolumeControl', 'UseDynamicReduction')
+    values['FixedReductionAmountPoints'] = parser.getfloat('VolumeControl', 'FixedReductionAmountPoints')
+    values['MinimumVolumeAfterReduction'] = parser.getfloat('VolumeControl', 'MinimumVolumeAfterReduction')
+    values['VolumeFloatTolerance'] = parser.getfloat('VolumeControl', 'VolumeFloatTolerance')
+
+    rules_str = parser.get('DynamicReductionRules', 'Rules')
+    parsed_rules = []
+    if rules_str:
+        for rule_pair in rules_str.split(','):
+            parts = rule_pair.strip().split(':')
+            if len(parts) == 2:
+                try:
+                    threshold = float(parts[0].strip())
+                    reduction = float(parts[1].strip())
+                    parsed_rules.append((threshold, reduction))
+                except ValueError:
+                    raise ValueError(f"Formato regola non valido in DynamicReductionRules: '{rule_pair.strip()}'")
+    values['DynamicReductionRulesList'] = tuple(sorted(parsed_rules, key=lambda x: x[0], reverse=True))
+    values['InterpolateReduction'] = parser.getboolean('DynamicReductionRules', 'Interpolate', fallback=False)
+    values['ReductionTable'] = build_reduction_table(values['DynamicReductionRulesList'], values['InterpolateReduction'])
+
+    default_fixed_reduction = None if values['UseDynamicReduction'] else values['FixedReductionAmountPoints']
+    ducking_rules = parser.items('DuckingRules', raw=True) if parser.has_section('DuckingRules') else []
+    if ducking_rules:
+        values['DuckingRules'] = tuple(parse_ducking_rule(name, value, values['TriggerVolumeThreshold'], default_fixed_reduction)
+                                       for name, value in ducking_rules)
+    else:
+        # Senza sezione [DuckingRules] vale la singola coppia TriggerAppName -> TargetAppName
+        values['DuckingRules'] = (DuckingRule("default", (values['TriggerAppName'],), (values['TargetAppName'],),
+                                              values['TriggerVolumeThreshold'], default_fixed_reduction),)
+
+    values['DetectorLevel'] = parser.get('Detection', 'DetectorLevel', fallback='envelope').strip().lower()
+    if values['DetectorLevel'] not in DETECTOR_LEVELS:
+        raise ValueError(f"DetectorLevel non valido: '{values['DetectorLevel']}'. Valori ammessi: {', '.join(DETECTOR_LEVELS)}")
+    values['EnvelopeAttackSeconds'] = parser.getfloat('Detection', 'EnvelopeAttackSeconds', fallback=0.01)
+    values['EnvelopeReleaseSeconds'] = parser.getfloat('Detection', 'EnvelopeReleaseSeconds', fallback=0.25)
+    values['RmsWindowSeconds'] = parser.getfloat('Detection', 'RmsWindowSeconds', fallback=0.3)
+    values['ReleaseThresholdRatio'] = min(1.0, max(0.0, parser.getfloat('Detection', 'ReleaseThresholdRatio', fallback=0.6)))
+
+    values['MaxWritesPerSecond'] = parser.getfloat('Actuator', 'MaxWritesPerSecond', fallback=200.0)
+    values['FightChanges'] = parser.getint('Actuator', 'FightChanges', fallback=3)
+    values['FightWindowSeconds'] = parser.getfloat('Actuator', 'FightWindowSeconds', fallback=5.0)
+    values['FightBackoffSeconds'] = parser.getfloat('Actuator', 'FightBackoffSeconds', fallback=2.0)
+    values['FightMaxBackoffSeconds'] = parser.getfloat('Actuator', 'FightMaxBackoffSeconds', fallback=30.0)
+
+    values['FadeOutDurationSeconds'] = parser.getfloat('Fading', 'FadeOutDurationSeconds')
+    values['FadeOutSteps'] = parser.getint('Fading', 'FadeOutSteps')
+    values['FadeInDurationSeconds'] = parser.getfloat('Fading', 'FadeInDurationSeconds')
+    values['FadeInSteps'] = parser.getint('Fading', 'FadeInSteps')
+
+    exit_fade_duration = parser.getfloat('Fading', 'ExitFadeDurationSeconds', fallback=0.0)
+    exit_fade_steps = parser.getint('Fading', 'ExitFadeSteps', fallback=0)
+
+    if exit_fade_duration <= 0:
+        values['ExitFadeDurationSeconds'] = max(0.1, values['FadeInDurationSeconds'] / 2)
+    else:
+        values['ExitFadeDurationSeconds'] = exit_fade_duration
+
+    if exit_fade_steps <= 0:
+        values['ExitFadeSteps'] = values['FadeInSteps']
+    else:
+        values['ExitFadeSteps'] = exit_fade_steps
+
+    values['FadeCurve'] = parser.get('Fading', 'FadeCurve', fallback='linear').strip().lower()
+    values['FadeTables'] = build_fade_tables(values['FadeCurve'])
+
+    values['TuiRefreshRate'] = parser.getint('TUI', 'RefreshRate', fallback=4)
+    values['TuiMaxLogMessages'] = parser.getint('TUI', 'MaxLogMessages', fallback=100)
+
+    values['HeadlessLogFile'] = parser.get('Headless', 'LogFile', fallback='volume_changer.log')
+    values['HeadlessLogMaxBytes'] = parser.getint('Headless', 'LogMaxBytes', fallback=1048576)
+    values['HeadlessLogBackupCount'] = parser.getint('Headless', 'LogBackupCount', fallback=3)
+
+    values['EnableProfiling'] = parser.getboolean('Diagnostics', 'EnableProfiling', fallback=False)
+    values['ProfileDumpFile'] = parser.get('Diagnostics', 'ProfileDumpFile', fallback='profile.json')
+    return Settings(**values)
+
+def apply_settings(settings):
+    # Rende attiva una configurazione (all'avvio e a ogni ricaricamento a caldo)
+    global CONFIG, LOG_MESSAGES, CONFIG_VERSION
+    CONFIG = settings
+    PROFILER.enabled = settings.EnableProfiling
+    if LOG_MESSAGES.maxlen != settings.TuiMaxLogMessages:
+        LOG_MESSAGES = deque(LOG_MESSAGES, maxlen=settings.TuiMaxLogMessages)
+    CONFIG_VERSION += 1
+
+def load_config():
+    if not os.path.exists(CONFIG_PATH):
         print("ERRORE: File 'config.ini' non trovato. Assicurati che sia nella stessa directory dello script.")
         print("Puoi copiare il contenuto d'esempio fornito e salvarlo come 'config.ini'.")
         exit(1)
         
     try:
-        parser.read("config.ini")
-
-        CONFIG['TriggerAppName'] = parser.get('General', 'TriggerAppName')
-        CONFIG['TargetAppName'] = parser.get('General', 'TargetAppName')
-        CONFIG['PollingIntervalSeconds'] = parser.getfloat('General', 'PollingIntervalSeconds')
-        CONFIG['DebounceTimeSeconds'] = parser.getfloat('General', 'DebounceTimeSeconds')
-
-        CONFIG['TriggerVolumeThreshold'] = parser.getfloat('VolumeControl', 'TriggerVolumeThreshold')
-        CONFIG['UseDynamicReduction'] = parser.getboolean('VolumeControl', 'UseDynamicReduction')
-        CONFIG['FixedReductionAmountPoints'] = parser.getfloat('VolumeControl', 'FixedReductionAmountPoints')
-        CONFIG['MinimumVolumeAfterReduction'] = parser.getfloat('VolumeControl', 'MinimumVolumeAfterReduction')
-        CONFIG['VolumeFloatTolerance'] = parser.getfloat('VolumeControl', 'VolumeFloatTolerance')
-
-        rules_str = parser.get('DynamicReductionRules', 'Rules')
-        parsed_rules = []
-        if rules_str:
-            for rule_pair in rules_str.split(','):
-                parts = rule_pair.strip().split(':')
-                if len(parts) == 2:
-                    try:
-                        threshold = float(parts[0].strip())
-                        reduction = float(parts[1].strip())
-                        parsed_rules.append((threshold, reduction))
-                    except ValueError:
-                        raise ValueError(f"Formato regola non valido in DynamicReductionRules: '{rule_pair.strip()}'")
-        CONFIG['DynamicReductionRulesList'] = sorted(parsed_rules, key=lambda x: x[0], reverse=True)
-
-
-        CONFIG['FadeOutDurationSeconds'] = parser.getfloat('Fading', 'FadeOutDurationSeconds')
-        CONFIG['FadeOutSteps'] = parser.getint('Fading', 'FadeOutSteps')
-        CONFIG['FadeInDurationSeconds'] = parser.getfloat('Fading', 'FadeInDurationSeconds')
-        CONFIG['FadeInSteps'] = parser.getint('Fading', 'FadeInSteps')
-        
-        exit_fade_duration = parser.getfloat('Fading', 'ExitFadeDurationSeconds', fallback=0.0)
-        exit_fade_steps = parser.getint('Fading', 'ExitFadeSteps', fallback=0)
-
-        if exit_fade_duration <= 0:
-            CONFIG['ExitFadeDurationSeconds'] = max(0.1, CONFIG['FadeInDurationSeconds'] / 2)
-        else:
-            CONFIG['ExitFadeDurationSeconds'] = exit_fade_duration
-
-        if exit_fade_steps <= 0:
-            CONFIG['ExitFadeSteps'] = CONFIG['FadeInSteps']
-        else:
-            CONFIG['ExitFadeSteps'] = exit_fade_steps
-
-        CONFIG['TuiRefreshRate'] = parser.getint('TUI', 'RefreshRate', fallback=4)
-        CONFIG['TuiMaxLogMessages'] = parser.getint('TUI', 'MaxLogMessages', fallback=100)
-        LOG_MESSAGES = deque(maxlen=CONFIG['TuiMaxLogMessages'])
-
+        apply_settings(read_settings(CONFIG_PATH))
     except (configparser.NoSectionError, configparser.NoOptionError, ValueError) as e:
         print(f"ERRORE nel file 'config.ini': {e}")
         exit(1)
@@ -90,77 +190,1036 @@ def load_config():
         print(f"ERRORE IMPREVISTO durante il caricamento di 'config.ini': {e}")
         exit(1)
 
+
+class ConfigWatcher:
+    # Ricaricamento a caldo: al massimo ogni check_interval_seconds confronta mtime e dimensione di config.ini
+    # (una sola os.stat) e rilegge il file solo se sono cambiati. Un file non valido viene segnalato e ignorato.
+    def __init__(self, path=CONFIG_PATH, check_interval_seconds=1.0, clock=time.monotonic):
+        self.path = path
+        self.check_interval_seconds = check_interval_seconds
+        self.clock = clock
+        self.reloads = 0
+        self._signature = self._stat()
+        self._next_check = clock() + check_interval_seconds
+
+    def _stat(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def poll(self):
+        # Restituisce il nuovo Settings se config.ini è cambiato ed è valido, altrimenti None
+        now = self.clock()
+        if now < self._next_check: return None
+        self._next_check = now + self.check_interval_seconds
+        signature = self._stat()
+        if signature is None or signature == self._signature: return None
+        self._signature = signature
+        try:
+            settings = read_settings(self.path)
+        except Exception as e:
+            add_log_message(f"config.ini modificato ma non valido, mantengo la configurazione attuale: {e}", "ERROR")
+            return None
+        self.reloads += 1
+        return settings
+
+
 def add_log_message(message, level="INFO"):
+    global LOG_VERSION
     timestamp = time.strftime('%H:%M:%S')
-    color_map = {
-        "INFO": "cyan",
-        "WARN": "yellow",
-        "ERROR": "red",
-        "SUCCESS": "green",
-        "ACTION": "magenta"
-    }
-    color = color_map.get(level, "white")
-    LOG_MESSAGES.append(Text.assemble((f"[{timestamp}] ", "dim white"), (f"[{level}] ", color), str(message)))
+    LOG_MESSAGES.append((timestamp, level, str(message)))
+    LOG_VERSION += 1
+    if LOGGER.handlers:
+        LOGGER.log(LOG_LEVELS.get(level, logging.INFO), "[%s] %s", level, message)
 
+def setup_headless_logging():
+    from logging.handlers import RotatingFileHandler
+    handler = RotatingFileHandler(CONFIG.HeadlessLogFile, maxBytes=CONFIG.HeadlessLogMaxBytes,
+                                  backupCount=CONFIG.HeadlessLogBackupCount, encoding="utf-8")
+    handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+    LOGGER.addHandler(handler)
+    LOGGER.setLevel(logging.INFO)
+
+
+# --- STRUMENTAZIONE (PROFILING PER FASE) ---
+# Limiti superiori dei bucket in microsecondi; l'ultimo bucket raccoglie tutto il resto
+PROFILE_BUCKET_BOUNDS_US = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 20000, 50000, 100000, 200000, 500000)
+
+class LatencyHistogram:
+    __slots__ = ('counts', 'count', 'total_seconds', 'max_seconds')
+
+    def __init__(self):
+        self.counts = [0] * (len(PROFILE_BUCKET_BOUNDS_US) + 1)
+        self.count = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+
+    def record(self, seconds):
+        self.counts[bisect.bisect_left(PROFILE_BUCKET_BOUNDS_US, seconds * 1e6)] += 1
+        self.count += 1
+        self.total_seconds += seconds
+        if seconds > self.max_seconds:
+            self.max_seconds = seconds
+
+    def percentile_us(self, fraction):
+        # Limite superiore del bucket che contiene il percentile richiesto (mai oltre il massimo osservato)
+        if self.count == 0: return 0.0
+        max_us = self.max_seconds * 1e6
+        threshold = fraction * self.count
+        cumulative = 0
+        for index, bucket_count in enumerate(self.counts):
+            cumulative += bucket_count
+            if cumulative >= threshold:
+                return min(float(PROFILE_BUCKET_BOUNDS_US[index]), max_us) if index < len(PROFILE_BUCKET_BOUNDS_US) else max_us
+        return max_us
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "mean_us": self.total_seconds / self.count * 1e6 if self.count else 0.0,
+            "p50_us": self.percentile_us(0.50),
+            "p95_us": self.percentile_us(0.95),
+            "p99_us": self.percentile_us(0.99),
+            "max_us": self.max_seconds * 1e6,
+            "buckets_us": dict(zip([str(bound) for bound in PROFILE_BUCKET_BOUNDS_US] + ["inf"], self.counts)),
+        }
+
+
+class PhaseProfiler:
+    # Istogrammi a bucket fissi per fase del loop. Da disattivato ogni sonda costa un solo controllo di "enabled".
+    # Fasi: enumerate (refresh indice sessioni, include pid_lookup delle riscansioni), pid_lookup, query_interface,
+    # get_peak, set_volume (thread dei fade), render (thread di Live), tick (tick completo di controllo).
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.histograms = {}
+        self.tick_overruns = 0
+
+    def record(self, phase, seconds):
+        histogram = self.histograms.get(phase)
+        if histogram is None:
+            histogram = self.histograms[phase] = LatencyHistogram()
+        histogram.record(seconds)
+
+    def record_tick(self, seconds, budget_seconds):
+        self.record("tick", seconds)
+        if seconds > budget_seconds:
+            self.tick_overruns += 1
+
+    def summary(self):
+        return {
+            "tick_overruns": self.tick_overruns,
+            "phases": {phase: histogram.summary() for phase, histogram in sorted(self.histograms.items())},
+        }
+
+    def dump_json(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.summary(), f, indent=2)
+
+
+PROFILER = PhaseProfiler()
+
+
+REDUCTION_TABLE_SIZE = 1001 # Una cella ogni 0.1 punti percentuali di volume, da 0.0 a 1.0 inclusi
+REDUCTION_EDGE_MARGIN = 1e-9 # Margine per l'arrotondamento di volume * (REDUCTION_TABLE_SIZE - 1) vicino ai bordi delle celle
+
+def build_reduction_table(rules, interpolate=False):
+    # Compila le DynamicReductionRules (soglia, riduzione) in una tabella con un valore per cella di volume: la cella i
+    # copre i volumi da i / 1000 (incluso) a (i + 1) / 1000; la prima anche i volumi negativi, l'ultima quelli >= 1.0.
+    # A gradini: la prima regola (soglia più alta) con volume >= soglia, come la scansione originale. Le poche celle
+    # che contengono una soglia (entro REDUCTION_EDGE_MARGIN dai bordi) valgono NaN: per quelle
+    # calculate_dynamic_reduction_amount confronta il volume con le regole, così il risultato è sempre quello della scansione.
+    # Interpolata: la riduzione varia linearmente tra i punti (soglia, riduzione) delle regole.
+    last_index = REDUCTION_TABLE_SIZE - 1
+    table = array('d', bytes(8 * REDUCTION_TABLE_SIZE))
+    if not rules: return table
+    points = sorted(rules) # Soglie crescenti
+    for index in range(REDUCTION_TABLE_SIZE):
+        volume = index / last_index
+        if not interpolate:
+            low = -math.inf if index == 0 else volume - REDUCTION_EDGE_MARGIN
+            high = math.inf if index == last_index else (index + 1) / last_index + REDUCTION_EDGE_MARGIN
+            if any(low < threshold < high for threshold, _ in points):
+                table[index] = math.nan
+            else:
+                table[index] = next((reduction for threshold, reduction in reversed(points) if volume >= threshold), 0.0)
+            continue
+        position = bisect.bisect_right(points, (volume, math.inf))
+        if position == 0:
+            table[index] = points[0][1]
+        elif position == len(points):
+            table[index] = points[-1][1]
+        else:
+            (low_threshold, low_reduction), (high_threshold, high_reduction) = points[position - 1], points[position]
+            fraction = (volume - low_threshold) / (high_threshold - low_threshold)
+            table[index] = low_reduction + (high_reduction - low_reduction) * fraction
+    return table
 
 def calculate_dynamic_reduction_amount(original_volume_level):
-    for threshold, reduction_amount in CONFIG['DynamicReductionRulesList']:
+    # Lookup a costo costante nella tabella compilata in load_config, condivisa da tutte le sessioni target.
+    # Il costo non cresce con il numero di regole: con poche regole (come le 7 predefinite) la scansione
+    # originale è altrettanto veloce, la tabella conviene con molte regole.
+    if original_volume_level <= 0.0: index = 0
+    elif original_volume_level >= 1.0: index = REDUCTION_TABLE_SIZE - 1
+    else: index = int(original_volume_level * (REDUCTION_TABLE_SIZE - 1))
+    reduction = CONFIG.ReductionTable[index]
+    if reduction == reduction: return reduction
+    # Cella con una soglia (NaN): confronto esatto, come la scansione originale
+    for threshold, reduction_amount in CONFIG.DynamicReductionRulesList:
         if original_volume_level >= threshold:
             return reduction_amount
     return 0.0
 
 
-def get_process_name_from_pid(pid):
-    if pid == 0: return "System"
+# --- REGOLE DI DUCKING (TRIGGER -> TARGET) ---
+class DuckingRule:
+    __slots__ = ('name', 'trigger_names', 'target_names', 'threshold', 'fixed_reduction', '_last_reduction')
+
+    def __init__(self, name, trigger_names, target_names, threshold, fixed_reduction):
+        self.name = name
+        self.trigger_names = tuple(trigger_names)
+        self.target_names = tuple(target_names)
+        self.threshold = threshold
+        self.fixed_reduction = fixed_reduction # None = riduzione dinamica (DynamicReductionRules)
+        self._last_reduction = (None, math.nan, math.nan) # (CONFIG, volume originale, volume ridotto) dell'ultima chiamata
+
+    def reduced_volume(self, original_volume):
+        # Richiamata a ogni tick con lo stesso volume originale finché il target resta ridotto
+        config, last_original_volume, last_volume = self._last_reduction
+        if config is CONFIG and original_volume == last_original_volume: return last_volume
+        reduction_points = calculate_dynamic_reduction_amount(original_volume) if self.fixed_reduction is None else self.fixed_reduction
+        volume_to_set = min(max(original_volume - reduction_points, CONFIG.MinimumVolumeAfterReduction), original_volume)
+        self._last_reduction = (CONFIG, original_volume, volume_to_set)
+        return volume_to_set
+
+def parse_ducking_rule(name, value, default_threshold, default_fixed_reduction):
+    # Formato: "triggers: A.exe|B.exe, targets: C.exe|D.exe, threshold: 0.1, reduction: dynamic|0.3"
+    fields = {}
+    for part in value.split(','):
+        field_name, separator, field_value = part.partition(':')
+        if not separator:
+            raise ValueError(f"Formato regola non valido in DuckingRules: '{name} = {value}'")
+        fields[field_name.strip().lower()] = field_value.strip()
+
+    trigger_names = [app_name.strip() for app_name in fields.get('triggers', '').split('|') if app_name.strip()]
+    target_names = [app_name.strip() for app_name in fields.get('targets', '').split('|') if app_name.strip()]
+    if not trigger_names or not target_names:
+        raise ValueError(f"La regola '{name}' in DuckingRules deve indicare almeno un trigger e un target")
+
+    threshold = float(fields['threshold']) if 'threshold' in fields else default_threshold
+    if 'reduction' not in fields: fixed_reduction = default_fixed_reduction
+    elif fields['reduction'].lower() == 'dynamic': fixed_reduction = None
+    else: fixed_reduction = float(fields['reduction'])
+    return DuckingRule(name, trigger_names, target_names, threshold, fixed_reduction)
+
+
+def read_process_info(pid):
+    # Restituisce (create_time, nome); create_time None se il processo non è leggibile
     try:
         process = psutil.Process(pid)
-        return process.name()
+        return process.create_time(), process.name()
     except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
-        return f"PID_{pid}_?"
+        return None, f"PID_{pid}_?"
+
+class ProcessNameResolver:
+    # Cache PID -> nome processo con eviction LRU e TTL.
+    # Alla scadenza del TTL la voce viene rivalidata confrontando il create_time del processo,
+    # così un PID riciclato da un altro processo non restituisce un nome sbagliato.
+    # La capacità effettiva è almeno il numero di sessioni dell'ultima enumerazione (fit_sessions).
+    def __init__(self, max_entries=256, ttl_seconds=30.0, reader=None, clock=time.monotonic):
+        self._session_count = 0
+        self.configure(max_entries, ttl_seconds)
+        self._reader = reader or read_process_info
+        self.clock = clock
+        self._entries = OrderedDict() # pid -> [create_time, name, name_lower, verified_at]
+        self.hits = 0
+        self.lookups = 0 # Letture effettive tramite psutil
+
+    def configure(self, max_entries, ttl_seconds):
+        # Le voci in eccesso vengono scartate al prossimo inserimento
+        self.configured_entries = max(1, max_entries)
+        self.max_entries = max(self.configured_entries, self._session_count)
+        self.ttl_seconds = ttl_seconds
+
+    def fit_sessions(self, session_count):
+        # Ogni scansione risolve il PID di tutte le sessioni: con una cache più piccola l'LRU scarterebbe
+        # a ogni giro proprio le voci che servono alla scansione successiva
+        self._session_count = session_count
+        self.max_entries = max(self.configured_entries, session_count)
+
+    def _read_process(self, pid):
+        self.lookups += 1
+        return self._reader(pid)
 
-def find_app_sessions(app_name_target, all_sessions_list):
-    found_sessions = []
+    def _lookup(self, pid, now):
+        entry = self._entries.get(pid)
+        if entry is not None:
+            if now - entry[3] < self.ttl_seconds:
+                self.hits += 1
+                self._entries.move_to_end(pid)
+                return entry
+            create_time, name = self._read_process(pid)
+            if create_time is not None and create_time == entry[0]:
+                entry[3] = now
+                self._entries.move_to_end(pid)
+                return entry
+        else:
+            create_time, name = self._read_process(pid)
+
+        entry = [create_time, name, name.lower(), now]
+        self._entries[pid] = entry
+        self._entries.move_to_end(pid)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return entry
+
+    def name(self, pid, now=None):
+        if pid == 0: return "System"
+        return self._lookup(pid, self.clock() if now is None else now)[1]
+
+    def name_lower(self, pid, now=None):
+        if pid == 0: return "system"
+        return self._lookup(pid, self.clock() if now is None else now)[2]
+
+    def invalidate(self, pid):
+        self._entries.pop(pid, None)
+
+    def clear(self):
+        self._entries.clear()
+
+
+def find_sessions_by_app(app_names, all_sessions_list, resolver):
+    # Un solo passaggio sulla lista delle sessioni: ogni PID viene risolto una volta sola, qualunque sia il numero di app cercate
+    app_names_lower = [(app_name, app_name.lower()) for app_name in app_names]
+    found_sessions = {app_name: [] for app_name in app_names}
+    now = resolver.clock()
     for session in all_sessions_list:
-        process_name = get_process_name_from_pid(session.ProcessId)
-        if process_name and app_name_target.lower() in process_name.lower():
-            found_sessions.append(session)
+        process_name_lower = resolver.name_lower(session.ProcessId, now)
+        for app_name, app_name_lower in app_names_lower:
+            if app_name_lower in process_name_lower:
+                found_sessions[app_name].append(session)
     return found_sessions
 
-def set_volume_gradually(session_control, target_volume, current_volume, duration_seconds, steps):
-    if abs(current_volume - target_volume) < CONFIG['VolumeFloatTolerance'] or steps <= 0 or duration_seconds <= 0:
+
+# --- RILEVAMENTO ATTIVITÀ TRIGGER ---
+DETECTOR_LEVELS = ('peak', 'envelope', 'rms')
+
+class TriggerDetector:
+    # Trasforma il picco istantaneo di ogni sessione trigger in un livello più stabile, così le brevi pause del
+    # parlato non fanno scattare ripristino e riduzione a ogni tick.
+    # - envelope: inviluppo attack/release (sale in fretta, scende lentamente), dipendente dal tempo reale tra i tick
+    # - rms: valore efficace sugli ultimi window_samples picchi
+    # - peak: picco istantaneo (comportamento originale)
+    # Gli ultimi picchi di tutte le sessioni stanno in un unico ring buffer preallocato (window_samples per slot).
+    def __init__(self, mode='envelope', attack_seconds=0.01, release_seconds=0.25, window_samples=15):
+        if mode not in DETECTOR_LEVELS:
+            raise ValueError(f"DetectorLevel non valido: '{mode}'. Valori ammessi: {', '.join(DETECTOR_LEVELS)}")
+        self.mode = mode
+        self.attack_seconds = attack_seconds
+        self.release_seconds = release_seconds
+        self.window_samples = max(1, window_samples)
+        self.keys = []
+        self.samples = array('d') # Ring buffer: slot * window_samples valori
+        self.positions = array('l') # Prossima posizione di scrittura nel ring di ogni slot
+        self.filled = array('l') # Campioni validi nel ring di ogni slot
+        self.sum_squares = array('d') # Somma dei quadrati del ring, aggiornata in modo incrementale
+        self.envelopes = array('d')
+        self.last_times = array('d')
+
+    def resize(self, keys):
+        # Nuova disposizione degli slot (chiavi delle sessioni trigger); lo stato delle sessioni già note viene conservato
+        window = self.window_samples
+        previous_slot_by_key = {key: slot for slot, key in enumerate(self.keys)}
+        samples = array('d', bytes(8 * window * len(keys)))
+        positions, filled = array('l', [0] * len(keys)), array('l', [0] * len(keys))
+        sum_squares, envelopes = array('d', bytes(8 * len(keys))), array('d', bytes(8 * len(keys)))
+        last_times = array('d', [math.nan] * len(keys))
+        for slot, key in enumerate(keys):
+            previous_slot = previous_slot_by_key.get(key)
+            if previous_slot is None: continue
+            samples[slot * window:(slot + 1) * window] = self.samples[previous_slot * window:(previous_slot + 1) * window]
+            positions[slot] = self.positions[previous_slot]
+            filled[slot] = self.filled[previous_slot]
+            sum_squares[slot] = self.sum_squares[previous_slot]
+            envelopes[slot] = self.envelopes[previous_slot]
+            last_times[slot] = self.last_times[previous_slot]
+        self.keys = list(keys)
+        self.samples, self.positions, self.filled = samples, positions, filled
+        self.sum_squares, self.envelopes, self.last_times = sum_squares, envelopes, last_times
+
+    def update(self, slot, peak, now):
+        # Registra il picco del tick e restituisce il livello da confrontare con le soglie.
+        # Viene aggiornato solo lo stato della modalità attiva: se DetectorLevel cambia il detector viene ricreato
+        mode = self.mode
+        if mode == 'envelope':
+            envelope = self.envelopes[slot]
+            elapsed = now - self.last_times[slot]
+            time_constant = self.attack_seconds if peak > envelope else self.release_seconds
+            if math.isnan(elapsed) or time_constant <= 0:
+                envelope = peak
+            elif elapsed > 0:
+                envelope += (peak - envelope) * (1.0 - math.exp(-elapsed / time_constant))
+            self.envelopes[slot] = envelope
+            self.last_times[slot] = now
+            return envelope
+        if mode == 'peak': return peak
+
+        window = self.window_samples
+        base = slot * window
+        position = self.positions[slot]
+        outgoing = self.samples[base + position]
+        self.samples[base + position] = peak
+        position += 1
+        if position == window:
+            # A ogni giro completo la somma viene ricalcolata da zero, così gli errori di arrotondamento non si accumulano
+            position = 0
+            self.sum_squares[slot] = math.fsum(sample * sample for sample in self.samples[base:base + window])
+        else:
+            self.sum_squares[slot] += peak * peak - outgoing * outgoing
+        self.positions[slot] = position
+        if self.filled[slot] < window:
+            self.filled[slot] += 1
+        return self.rms(slot)
+
+    def rms(self, slot):
+        filled = self.filled[slot]
+        return math.sqrt(max(0.0, self.sum_squares[slot]) / filled) if filled else 0.0
+
+
+# --- POLLING ADATTIVO ---
+class AdaptivePoller:
+    # Intervallo di polling che si allunga gradualmente fino a max_interval quando non c'è niente da fare
+    # e torna subito a min_interval alla prima attività.
+    def __init__(self, min_interval, max_interval, backoff_factor=1.5):
+        self.configure(min_interval, max_interval, backoff_factor)
+        self.effective_rate = 0.0 # Tick al secondo misurati (media esponenziale)
+        self._last_tick_time = None
+        self._average_period = None
+
+    def configure(self, min_interval, max_interval, backoff_factor):
+        self.min_interval = min_interval
+        self.max_interval = max(min_interval, max_interval)
+        self.backoff_factor = backoff_factor
+        self.interval = min_interval
+
+    def update(self, fast, now=None):
+        now = time.monotonic() if now is None else now
+        if self._last_tick_time is not None:
+            period = now - self._last_tick_time
+            self._average_period = period if self._average_period is None else self._average_period * 0.8 + period * 0.2
+            if self._average_period > 0:
+                self.effective_rate = 1.0 / self._average_period
+        self._last_tick_time = now
+
+        if fast:
+            self.interval = self.min_interval
+        else:
+            self.interval = min(self.max_interval, self.interval * self.backoff_factor)
+        return self.interval
+
+
+# --- AUDIO BACKEND ---
+class AudioBackend(ABC):
+    # Interfaccia minima verso il sistema audio usata dal loop di controllo.
+    # Le sessioni devono esporre almeno l'attributo ProcessId. Un backend deve implementare almeno
+    # list_sessions, volume_control e meter; gli altri metodi hanno un comportamento predefinito.
+    errors = (Exception,)
+
+    @abstractmethod
+    def list_sessions(self):
+        ...
+
+    def is_expired(self, session):
+        return False
+
+    @abstractmethod
+    def volume_control(self, session):
+        ...
+
+    @abstractmethod
+    def meter(self, session):
+        ...
+
+    def change_counter(self):
+        # Contatore incrementato a ogni sessione creata/scaduta. None se il backend non invia notifiche.
+        return None
+
+    def session_key(self, session):
+        # Identità stabile della sessione, anche tra oggetti diversi restituiti da enumerazioni successive
+        return id(session)
+
+    def read_process(self, pid):
+        return read_process_info(pid)
+
+    def init_thread(self):
+        # Chiamato all'avvio di ogni thread di lavoro che usa le sessioni (es. inizializzazione COM)
+        pass
+
+
+class PycawAudioBackend(AudioBackend):
+    AUDIO_SESSION_STATE_EXPIRED = 2
+
+    def __init__(self):
+        # Import ritardati: pycaw/comtypes esistono solo su Windows
+        from comtypes import COMError
+        from pycaw.pycaw import AudioUtilities, ISimpleAudioVolume, IAudioMeterInformation
+        self._audio_utilities = AudioUtilities
+        self._simple_audio_volume = ISimpleAudioVolume
+        self._audio_meter_information = IAudioMeterInformation
+        self.errors = (COMError, AttributeError, OSError)
+        # Nessuna notifica di nuova sessione: AudioSessionNotification di pycaw funziona solo con COM in MTA
+        # (sys.coinit_flags = 0 prima di importare comtypes), mentre qui il thread principale e quelli di lavoro
+        # sono STA e non elaborano messaggi. change_counter() resta None e l'indice si affida alla riscansione
+        # periodica (SessionRescanIntervalSeconds); le sessioni scadute vengono comunque scartate a ogni tick.
+
+    def list_sessions(self):
+        return self._audio_utilities.GetAllSessions()
+
+    def init_thread(self):
+        import comtypes
+        comtypes.CoInitialize()
+
+    def is_expired(self, session):
         try:
-            session_control.SetMasterVolume(target_volume, None)
-        except Exception as e:
-            add_log_message(f"Errore impostazione diretta volume (fallback): {e}", "ERROR")
-        return
+            return session.State == self.AUDIO_SESSION_STATE_EXPIRED
+        except self.errors:
+            return True
+
+    def session_key(self, session):
+        try:
+            return session.InstanceIdentifier
+        except self.errors:
+            return id(session)
+
+    def volume_control(self, session):
+        return session._ctl.QueryInterface(self._simple_audio_volume)
+
+    def meter(self, session):
+        return session._ctl.QueryInterface(self._audio_meter_information)
+
+
+AUDIO_BACKENDS = ("pycaw", "simulated")
+
+def create_audio_backend(name):
+    if name == "pycaw":
+        return PycawAudioBackend()
+    if name == "simulated":
+        # Import ritardato come per pycaw: il backend simulato serve solo a prove e benchmark
+        from simulated_audio import SimulatedAudioBackend
+        return SimulatedAudioBackend.from_rules(CONFIG.DuckingRules)
+    raise ValueError(f"Backend audio sconosciuto: '{name}'. Valori ammessi: {', '.join(AUDIO_BACKENDS)}")
+
+
+# --- CACHE INTERFACCE COM PER SESSIONE ---
+class IndexedSession:
+    # Sessione nell'indice: la chiave (per pycaw una chiamata COM) è calcolata una sola volta alla scansione
+    # e le interfacce ISimpleAudioVolume / IAudioMeterInformation sono richieste (QueryInterface) al primo uso
+    __slots__ = ('session', 'key', 'volume', 'meter')
+
+    def __init__(self, session, key):
+        self.session = session
+        self.key = key
+        self.volume = None
+        self.meter = None
+
+
+class SessionInterfaceCache:
+    # Una IndexedSession per chiave di sessione, riusata tra una scansione e l'altra: QueryInterface viene eseguita
+    # una sola volta per sessione. Le interfacce vengono scartate quando una chiamata COM fallisce (invalidate)
+    # e la voce quando la sessione esce dall'indice (retain).
+    def __init__(self, backend):
+        self.backend = backend
+        self._records = {} # chiave sessione -> IndexedSession
+
+    def record(self, session):
+        # Unico punto in cui viene calcolata la chiave della sessione (alla scansione, mai durante il tick)
+        key = self.backend.session_key(session)
+        record = self._records.get(key)
+        if record is None:
+            record = self._records[key] = IndexedSession(session, key)
+        return record
+
+    def volume(self, record):
+        if record.volume is None:
+            if PROFILER.enabled: probe_start = time.perf_counter()
+            record.volume = self.backend.volume_control(record.session)
+            if PROFILER.enabled: PROFILER.record("query_interface", time.perf_counter() - probe_start)
+        return record.volume
+
+    def meter(self, record):
+        if record.meter is None:
+            if PROFILER.enabled: probe_start = time.perf_counter()
+            record.meter = self.backend.meter(record.session)
+            if PROFILER.enabled: PROFILER.record("query_interface", time.perf_counter() - probe_start)
+        return record.meter
+
+    def invalidate(self, record):
+        record.volume = None
+        record.meter = None
+
+    def retain(self, records):
+        # Tiene solo le voci delle sessioni ancora indicizzate
+        keys = {record.key for record in records}
+        for key in [key for key in self._records if key not in keys]:
+            del self._records[key]
+
+    def __len__(self):
+        return len(self._records)
+
+
+# --- ATTUATORE VOLUME (SCRITTURE FILTRATE) ---
+class VolumeChannel:
+    # Sostituto di ISimpleAudioVolume per una sessione: le letture passano direttamente, le scritture
+    # passano dal VolumeActuator. Può essere dato al FadeEngine al posto dell'interfaccia COM.
+    __slots__ = ('actuator', 'control', 'last_value', 'last_write_time', 'pending', 'change_times', 'backoff_until', 'backoff_seconds')
+
+    def __init__(self, actuator, control):
+        self.actuator = actuator
+        self.control = control
+        self.last_value = NO_VOLUME # Ultimo volume scritto o letto
+        self.last_write_time = -math.inf
+        self.pending = NO_VOLUME # Scrittura rimandata dal limite di frequenza (solo l'ultima richiesta)
+        self.change_times = deque() # Istanti delle ultime variazioni esterne rilevate
+        self.backoff_until = -math.inf
+        self.backoff_seconds = actuator.fight_backoff_seconds
+
+    def GetMasterVolume(self):
+        volume = self.control.GetMasterVolume()
+        self.last_value = volume
+        return volume
+
+    def SetMasterVolume(self, level, event_context):
+        self.actuator.write(self, level)
+
+    def set_final_volume(self, level):
+        # Ultima scrittura di un fade (o salto diretto): non viene rimandata dal limite di frequenza
+        self.actuator.write(self, level, final=True)
+
+
+def set_final_volume(control, level):
+    # Scrittura di destinazione del FadeEngine: attraverso un VolumeChannel deve arrivare subito,
+    # altrimenti il fade finirebbe solo al prossimo flush() del loop di controllo
+    if isinstance(control, VolumeChannel):
+        control.set_final_volume(level)
+    else:
+        control.SetMasterVolume(level, None)
+
+
+class VolumeActuator:
+    # Unico punto da cui passano le scritture del volume dei target:
+    # - scarta le scritture entro VolumeFloatTolerance dall'ultimo valore scritto o letto
+    # - limita le scritture a max_writes_per_second per sessione; le richieste in eccesso vengono fuse
+    #   nell'ultima e inviate da flush() appena possibile. Le scritture finali (fine fade) non sono limitate
+    # - riconosce un "conflitto" quando il volume viene cambiato esternamente fight_changes volte in
+    #   fight_window_seconds e sospende il ri-abbassamento con attesa crescente
+    def __init__(self, tolerance=0.001, max_writes_per_second=200.0, fight_changes=3, fight_window_seconds=5.0,
+                 fight_backoff_seconds=2.0, fight_max_backoff_seconds=30.0, clock=time.monotonic):
+        self.configure(tolerance, max_writes_per_second, fight_changes, fight_window_seconds,
+                       fight_backoff_seconds, fight_max_backoff_seconds)
+        self.clock = clock
+        self._channels = {} # chiave sessione -> VolumeChannel
+        self._pending_channels = set() # Canali con una scrittura rimandata
+        self._lock = threading.Lock() # Le scritture arrivano anche dal thread del FadeEngine
+        # Contatori
+        self.requested = 0 # SetMasterVolume richiesti
+        self.written = 0 # SetMasterVolume effettivamente inviati
+        self.dropped = 0 # Scartati perché entro la tolleranza
+        self.coalesced = 0 # Richieste rimandate e poi sostituite da una più recente
+        self.deferred = 0 # Richieste rimandate dal limite di frequenza
+        self.fights = 0 # Conflitti rilevati (ri-abbasso sospeso)
+
+    def configure(self, tolerance, max_writes_per_second, fight_changes, fight_window_seconds,
+                  fight_backoff_seconds, fight_max_backoff_seconds):
+        self.tolerance = tolerance
+        self.min_write_interval = 1.0 / max_writes_per_second if max_writes_per_second > 0 else 0.0
+        self.fight_changes = max(1, fight_changes)
+        self.fight_window_seconds = fight_window_seconds
+        self.fight_backoff_seconds = fight_backoff_seconds
+        self.fight_max_backoff_seconds = max(fight_backoff_seconds, fight_max_backoff_seconds)
+
+    def channel(self, key, control):
+        channel = self._channels.get(key)
+        if channel is None:
+            channel = self._channels[key] = VolumeChannel(self, control)
+        elif channel.control is not control:
+            # Interfaccia COM richiesta di nuovo (cache invalidata): l'ultimo valore noto non è più affidabile
+            channel.control = control
+            channel.last_value = NO_VOLUME
+        return channel
+
+    def retain(self, keys):
+        keys = set(keys)
+        for key in [key for key in self._channels if key not in keys]:
+            self._pending_channels.discard(self._channels.pop(key))
+
+    def write(self, channel, level, final=False):
+        with self._lock:
+            self.requested += 1
+            if not math.isnan(channel.pending):
+                self.coalesced += 1
+                channel.pending = NO_VOLUME
+                self._pending_channels.discard(channel)
+            if abs(level - channel.last_value) <= self.tolerance:
+                self.dropped += 1
+                return
+            now = self.clock()
+            if not final and now - channel.last_write_time < self.min_write_interval:
+                self.deferred += 1
+                channel.pending = level
+                self._pending_channels.add(channel)
+                return
+            self._send(channel, level, now)
+
+    def _send(self, channel, level, now):
+        channel.control.SetMasterVolume(level, None)
+        self.written += 1
+        channel.last_value = level
+        channel.last_write_time = now
+
+    def flush(self):
+        # Invia le scritture rimandate il cui intervallo minimo è trascorso.
+        # Il controllo senza lock è sicuro: una richiesta rimandata proprio ora parte al flush successivo
+        if not self._pending_channels: return
+        with self._lock:
+            now = self.clock()
+            for channel in list(self._pending_channels):
+                if now - channel.last_write_time < self.min_write_interval: continue
+                self._pending_channels.discard(channel)
+                level, channel.pending = channel.pending, NO_VOLUME
+                if abs(level - channel.last_value) <= self.tolerance:
+                    self.dropped += 1
+                    continue
+                try:
+                    self._send(channel, level, now)
+                except Exception as e:
+                    add_log_message(f"Errore impostazione volume rimandata: {e}", "ERROR")
+
+    def has_pending(self):
+        return bool(self._pending_channels)
+
+    def in_backoff(self, key):
+        channel = self._channels.get(key)
+        return channel is not None and self.clock() < channel.backoff_until
+
+    def note_external_change(self, key):
+        # Registra una variazione esterna del volume; restituisce i secondi di sospensione se è iniziato un conflitto, altrimenti 0
+        channel = self._channels.get(key)
+        if channel is None: return 0.0
+        now = self.clock()
+        change_times = channel.change_times
+        change_times.append(now)
+        while change_times and now - change_times[0] > self.fight_window_seconds:
+            change_times.popleft()
+        if len(change_times) < self.fight_changes: return 0.0
+        backoff = channel.backoff_seconds
+        channel.backoff_until = now + backoff
+        channel.backoff_seconds = min(backoff * 2, self.fight_max_backoff_seconds)
+        change_times.clear()
+        self.fights += 1
+        return backoff
+
+    def reset_fight(self, key):
+        # Chiamato al ripristino: il prossimo ducking riparte senza sospensioni
+        channel = self._channels.get(key)
+        if channel is None: return
+        channel.change_times.clear()
+        channel.backoff_until = -math.inf
+        channel.backoff_seconds = self.fight_backoff_seconds
+
+
+# --- INDICE SESSIONI ---
+class SessionIndex:
+    # Mantiene le sessioni già risolte per ogni nome di app e riesegue l'enumerazione completa solo
+    # quando il backend notifica un cambiamento, quando una sessione scade o allo scadere
+    # dell'intervallo di riscansione di sicurezza. version cambia a ogni modifica delle sessioni indicizzate.
+    def __init__(self, backend, app_names, rescan_interval_seconds=2.0, resolver=None, background_scans=False, clock=time.monotonic):
+        self.backend = backend
+        self.app_names = list(dict.fromkeys(app_names))
+        self.rescan_interval_seconds = rescan_interval_seconds
+        self.clock = clock
+        self.resolver = resolver or ProcessNameResolver(CONFIG.ProcessNameCacheSize, CONFIG.ProcessNameCacheTTLSeconds,
+                                                        reader=backend.read_process, clock=clock)
+        self.sessions_by_app = {name: [] for name in self.app_names}
+        self.interfaces = SessionInterfaceCache(backend)
+        self.scans = 0
+        self.version = 0
+        self._last_scan_time = None
+        self._last_change_counter = None
+        # background_scans: l'enumerazione la esegue un altro task (runtime asyncio) e arriva con submit_scan();
+        # refresh() si limita ad applicarla e segnala con scan_requested quando ne serve una nuova
+        self.background_scans = background_scans
+        self.scan_requested = False
+        self._pending_scan = None
+
+    def invalidate(self):
+        self._last_scan_time = None
+
+    def set_app_names(self, app_names):
+        # Nuovo elenco di app (ricaricamento della configurazione): le sessioni vengono rienumerate al prossimo refresh
+        app_names = list(dict.fromkeys(app_names))
+        if app_names == self.app_names: return
+        self.app_names = app_names
+        self.sessions_by_app = {name: self.sessions_by_app.get(name, []) for name in app_names}
+        self.interfaces.retain(self.indexed_sessions())
+        self.version += 1
+        self._last_scan_time = None
+
+    def indexed_sessions(self):
+        return [record for records in self.sessions_by_app.values() for record in records]
+
+    def _drop_expired(self):
+        is_expired = self.backend.is_expired
+        dropped = False
+        for name, sessions in self.sessions_by_app.items():
+            for record in sessions:
+                if is_expired(record.session): break
+            else:
+                continue
+            self.sessions_by_app[name] = [record for record in sessions if not is_expired(record.session)]
+            dropped = True
+        if dropped:
+            self.interfaces.retain(self.indexed_sessions())
+            self.version += 1
+        return dropped
+
+    def refresh(self, now=None):
+        profiling = PROFILER.enabled
+        if profiling: probe_start = time.perf_counter()
+        now = self.clock() if now is None else now
+        change_counter = self.backend.change_counter()
+        if change_counter is None or change_counter != self._last_change_counter:
+            expired_dropped = self._drop_expired()
+        else:
+            # Con le notifiche del backend ogni sessione scaduta cambia il contatore: se è fermo dall'ultima
+            # scansione non serve interrogare le sessioni indicizzate una per una
+            expired_dropped = False
+
+        if self.background_scans:
+            pending_scan, self._pending_scan = self._pending_scan, None
+            if pending_scan is not None:
+                self._apply_scan(*pending_scan)
+            elif expired_dropped or self._last_scan_time is None:
+                self.scan_requested = True
+        elif (self._last_scan_time is None or expired_dropped
+                or change_counter != self._last_change_counter
+                or now - self._last_scan_time >= self.rescan_interval_seconds):
+            self._rescan(now, change_counter)
+        if profiling: PROFILER.record("enumerate", time.perf_counter() - probe_start)
+        return self.sessions_by_app
+
+    def list_sessions(self):
+        # Enumerazione completa (la parte lenta della scansione); può essere eseguita su un altro thread
+        return [session for session in self.backend.list_sessions() if not self.backend.is_expired(session)]
+
+    def submit_scan(self, all_sessions, now, change_counter):
+        # Risultato di list_sessions() ottenuto altrove; verrà applicato al prossimo refresh()
+        self._pending_scan = (all_sessions, now, change_counter)
+
+    def _rescan(self, now, change_counter):
+        self._apply_scan(self.list_sessions(), now, change_counter)
+
+    def _apply_scan(self, all_sessions, now, change_counter):
+        profiling = PROFILER.enabled
+        if profiling: probe_start = time.perf_counter()
+        self.resolver.fit_sessions(len(all_sessions))
+        sessions_by_app = find_sessions_by_app(self.app_names, all_sessions, self.resolver)
+        if profiling: PROFILER.record("pid_lookup", time.perf_counter() - probe_start)
+        record = self.interfaces.record
+        sessions_by_app = {name: [record(session) for session in sessions] for name, sessions in sessions_by_app.items()}
+        if any(sessions_by_app[name] != self.sessions_by_app[name] for name in self.app_names):
+            self.version += 1
+        self.sessions_by_app = sessions_by_app
+        self.interfaces.retain(self.indexed_sessions())
+        self.scans += 1
+        self.scan_requested = False
+        self._last_scan_time = now
+        self._last_change_counter = change_counter
 
-    volume_diff = target_volume - current_volume
-    volume_step_size = volume_diff / steps
-    delay_step = duration_seconds / steps
 
-    for i in range(steps):
-        next_volume = current_volume + volume_step_size * (i + 1)
-        next_volume = max(0.0, min(1.0, next_volume))
+# --- FADE ENGINE ---
+FADE_TABLE_SIZE = 1024
+PERCEPTUAL_FADE_RANGE_DB = 40.0
+FADE_CURVES = ("linear", "perceptual", "scurve")
+
+def build_fade_tables(curve_name, size=FADE_TABLE_SIZE):
+    # Precalcola la forma del fade (0..1 -> 0..1) per fade crescenti e decrescenti.
+    # "perceptual" è lineare in dB su PERCEPTUAL_FADE_RANGE_DB: lento all'inizio salendo, rapido all'inizio scendendo.
+    if curve_name not in FADE_CURVES:
+        raise ValueError(f"FadeCurve non valida: '{curve_name}'. Valori ammessi: {', '.join(FADE_CURVES)}")
+    positions = [i / (size - 1) for i in range(size)]
+    if curve_name == "linear":
+        rise = array('d', positions)
+        return rise, rise
+    if curve_name == "scurve":
+        rise = array('d', (p * p * (3.0 - 2.0 * p) for p in positions))
+        return rise, rise
+    ratio = 10 ** (PERCEPTUAL_FADE_RANGE_DB / 20.0)
+    rise = array('d', ((ratio ** p - 1.0) / (ratio - 1.0) for p in positions))
+    fall = array('d', (1.0 - rise[size - 1 - i] for i in range(size)))
+    return rise, fall
+
+def sample_fade_table(table, progress):
+    position = progress * (len(table) - 1)
+    index = int(position)
+    if index >= len(table) - 1:
+        return table[-1]
+    return table[index] + (table[index + 1] - table[index]) * (position - index)
+
+
+class FadeJob:
+    __slots__ = ('control', 'start_volume', 'target_volume', 'start_time', 'duration', 'delay_step', 'steps', 'step_index', 'table')
+
+    def __init__(self, control, start_volume, target_volume, start_time, duration, steps, table):
+        self.control = control
+        self.start_volume = start_volume
+        self.target_volume = target_volume
+        self.start_time = start_time
+        self.duration = duration
+        self.delay_step = duration / steps
+        self.steps = steps
+        self.step_index = 0
+        self.table = table
+
+    def next_deadline(self):
+        return self.start_time + self.delay_step * (self.step_index + 1)
+
+    def volume_at(self, now):
+        progress = (now - self.start_time) / self.duration
+        shape = sample_fade_table(self.table, max(0.0, min(1.0, progress)))
+        return max(0.0, min(1.0, self.start_volume + (self.target_volume - self.start_volume) * shape))
+
+
+class FadeEngine:
+    # Esegue i fade come job pianificati su un thread dedicato, così il loop di controllo non si blocca.
+    # Un nuovo fade sulla stessa sessione sostituisce quello in corso (retarget), cancel() lo interrompe.
+    # Gli step sono agganciati a scadenze assolute sul clock monotono e il volume di ogni step dipende dal
+    # tempo trascorso: uno step in ritardo non sposta i successivi e la durata totale resta quella configurata.
+    def __init__(self, backend=None, clock=time.monotonic):
+        self.backend = backend
+        self.clock = clock
+        self._jobs = {} # chiave sessione -> FadeJob
+        self._condition = threading.Condition()
+        self._thread = None
+        self._running = False
+        self.on_schedule = None # Chiamato (da qualunque thread) a ogni nuovo fade: usato dal runtime asyncio al posto del thread
+
+    def start(self):
+        if self._thread is not None: return
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="FadeEngine", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=1.0):
+        # I fade ancora in corso vengono portati subito a destinazione, per non lasciare volumi intermedi
+        with self._condition:
+            self._running = False
+            for job in self._jobs.values():
+                try:
+                    set_final_volume(job.control, job.target_volume)
+                except Exception as e:
+                    add_log_message(f"Errore impostazione finale volume (fallback): {e}", "ERROR")
+            self._jobs.clear()
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def fade(self, key, control, target_volume, current_volume, duration_seconds, steps):
+        if abs(current_volume - target_volume) < CONFIG.VolumeFloatTolerance or steps <= 0 or duration_seconds <= 0:
+            self.cancel(key)
+            try:
+                set_final_volume(control, target_volume)
+            except Exception as e:
+                add_log_message(f"Errore impostazione diretta volume (fallback): {e}", "ERROR")
+            return
+
+        rise_table, fall_table = CONFIG.FadeTables
+        job = FadeJob(control, current_volume, target_volume, self.clock(), duration_seconds, steps,
+                      rise_table if target_volume > current_volume else fall_table)
+        with self._condition:
+            self._jobs[key] = job
+            self._condition.notify_all()
+        if self.on_schedule is not None:
+            self.on_schedule()
+
+    def wait(self, key, timeout):
+        # Attende la fine del fade sulla sessione indicata (usato all'uscita)
+        with self._condition:
+            return self._condition.wait_for(lambda: key not in self._jobs, timeout)
+
+    def cancel(self, key):
+        with self._condition:
+            self._jobs.pop(key, None)
+
+    def cancel_all(self):
+        with self._condition:
+            self._jobs.clear()
+
+    def is_fading(self, key):
+        return key in self._jobs
+
+    def pump(self, now=None):
+        # Esegue gli step scaduti di tutti i job; restituisce la prossima scadenza (None se non ci sono fade)
+        if not self._jobs: return None # Il caso più frequente: nessun fade, nessun lock
+        now = self.clock() if now is None else now
+        with self._condition:
+            finished = False
+            for key, job in list(self._jobs.items()):
+                if now >= job.start_time + job.duration:
+                    self._finish(key, job)
+                    finished = True
+                elif now >= job.next_deadline():
+                    # Gli step persi (thread in ritardo) vengono saltati, non recuperati
+                    # (almeno uno step: con now esattamente sulla scadenza l'arrotondamento può dare lo step precedente)
+                    job.step_index = max(job.step_index + 1, int((now - job.start_time) / job.delay_step))
+                    if not self._run_step(key, job, now):
+                        finished = True
+            if finished:
+                self._condition.notify_all()
+            if not self._jobs: return None
+            return min(min(job.next_deadline(), job.start_time + job.duration) for job in self._jobs.values())
+
+    def _run_step(self, key, job, now):
         try:
-            session_control.SetMasterVolume(next_volume, None)
+            if PROFILER.enabled:
+                probe_start = time.perf_counter()
+                job.control.SetMasterVolume(job.volume_at(now), None)
+                PROFILER.record("set_volume", time.perf_counter() - probe_start)
+            else:
+                job.control.SetMasterVolume(job.volume_at(now), None)
+            return True
         except Exception as e:
-            add_log_message(f"Errore impostazione graduale volume (step {i+1}): {e}", "ERROR")
+            add_log_message(f"Errore impostazione graduale volume (step {job.step_index}): {e}", "ERROR")
             try:
-                session_control.SetMasterVolume(target_volume, None)
+                set_final_volume(job.control, job.target_volume)
             except Exception as e_final:
-                 add_log_message(f"Errore impostazione finale volume (fallback): {e_final}", "ERROR")
-            return
-        time.sleep(delay_step)
-    
-    try:
-        final_check_vol = session_control.GetMasterVolume()
-        if abs(final_check_vol - target_volume) > CONFIG['VolumeFloatTolerance']:
-            session_control.SetMasterVolume(target_volume, None)
-    except Exception as e:
-        add_log_message(f"Errore impostazione finale precisa volume: {e}", "ERROR")
+                add_log_message(f"Errore impostazione finale volume (fallback): {e_final}", "ERROR")
+            del self._jobs[key]
+            return False
 
+    def _finish(self, key, job):
+        del self._jobs[key]
+        try:
+            set_final_volume(job.control, job.target_volume)
+        except Exception as e:
+            add_log_message(f"Errore impostazione finale precisa volume: {e}", "ERROR")
+
+    def _run(self):
+        if self.backend is not None:
+            self.backend.init_thread()
+        while self._running:
+            next_deadline = self.pump()
+            with self._condition:
+                if not self._running: break
+                if next_deadline is None:
+                    if not self._jobs: # Un fade aggiunto dopo pump() parte senza aspettare la notifica
+                        self._condition.wait()
+                else:
+                    timeout = next_deadline - self.clock()
+                    if timeout > 0:
+                        self._condition.wait(timeout)
 
-console = Console()
 
 class AppStatus:
     trigger_app_name = ""
@@ -176,11 +1235,17 @@ class AppStatus:
     original_target_volume_value = None # Valore float del volume originale
     is_target_volume_currently_reduced_by_script = False # Flag specifico
 
+    polling_rate_hz = 0.0 # Frequenza di polling effettiva (AdaptivePoller)
+    volume_writes_requested = 0 # Contatori del VolumeActuator
+    volume_writes_sent = 0
+    volume_fights = 0
+
 
 # Parte grafica configurazioni TUI
 status = AppStatus()
 
-def make_layout() -> Layout:
+def make_layout(show_profile=False) -> "Layout":
+    from rich.layout import Layout
     layout = Layout(name="root")
     layout.split_column(
         Layout(name="header", size=3),
@@ -195,33 +1260,54 @@ def make_layout() -> Layout:
         Layout(name="config_display", ratio=1),
         Layout(name="status_display", ratio=1)
     )
-    layout["right_panel"].name = "log_display"
+    if show_profile:
+        layout["right_panel"].split_column(
+            Layout(name="log_display", ratio=2),
+            Layout(name="profile_display", ratio=1)
+        )
+    else:
+        layout["right_panel"].name = "log_display"
     return layout
 
-def generate_config_panel() -> Panel:
+def generate_config_panel() -> "Panel":
+    from rich.panel import Panel
+    from rich.table import Table
+    from rich.text import Text
     config_table = Table(show_header=False, box=None, expand=True, padding=0)
     config_table.add_column("Setting", style="dim cyan", min_width=15, ratio=9, no_wrap=True, overflow="ellipsis")
     config_table.add_column("Value", ratio=7, overflow="fold", no_wrap=False)
 
-    config_table.add_row("Trigger App:", Text(CONFIG['TriggerAppName'], overflow="fold"))
-    config_table.add_row("Target App:", Text(CONFIG['TargetAppName'], overflow="fold"))
-    config_table.add_row("Trigger Soglia Vol.:", f"{CONFIG['TriggerVolumeThreshold']*100:.0f}%")
-    config_table.add_row("Polling Interval:", f"{CONFIG['PollingIntervalSeconds']}s")
-    config_table.add_row("Debounce Time:", f"{CONFIG['DebounceTimeSeconds']}s")
-    reduction_dynamic_text = Text("Sì", style="green") if CONFIG['UseDynamicReduction'] else Text("No", style="red")
+    if len(CONFIG.DuckingRules) == 1:
+        rule = CONFIG.DuckingRules[0]
+        config_table.add_row("Trigger App:", Text(", ".join(rule.trigger_names), overflow="fold"))
+        config_table.add_row("Target App:", Text(", ".join(rule.target_names), overflow="fold"))
+        config_table.add_row("Trigger Soglia Vol.:", f"{rule.threshold*100:.0f}%")
+    else:
+        for rule in CONFIG.DuckingRules:
+            reduction_text = "dinamica" if rule.fixed_reduction is None else f"-{rule.fixed_reduction*100:.0f} punti"
+            rule_text = f"{', '.join(rule.trigger_names)} -> {', '.join(rule.target_names)} (soglia {rule.threshold*100:.0f}%, {reduction_text})"
+            config_table.add_row(f"Regola {rule.name}:", Text(rule_text, overflow="fold"))
+    config_table.add_row("Polling Interval:", f"{CONFIG.PollingIntervalSeconds}s - {CONFIG.MaxPollingIntervalSeconds}s")
+    config_table.add_row("Debounce Time:", f"{CONFIG.DebounceTimeSeconds}s")
+    config_table.add_row("Rilevamento:", f"{CONFIG.DetectorLevel} (rilascio {CONFIG.ReleaseThresholdRatio*100:.0f}% soglia)")
+    if not CONFIG.UseDynamicReduction: reduction_dynamic_text = Text("No", style="red")
+    else: reduction_dynamic_text = Text("Sì (interpolata)" if CONFIG.InterpolateReduction else "Sì", style="green")
     config_table.add_row("Riduzione Dinamica:", reduction_dynamic_text)
-    if not CONFIG['UseDynamicReduction']:
-        config_table.add_row("Riduzione Fissa:", f"{CONFIG['FixedReductionAmountPoints']*100:.0f} punti %")
-    config_table.add_row("Volume Min. Ridotto:", f"{CONFIG['MinimumVolumeAfterReduction']*100:.0f}%")
-    fade_out_val = f"{CONFIG['FadeOutDurationSeconds']}s ({CONFIG['FadeOutSteps']} steps)"
+    if not CONFIG.UseDynamicReduction:
+        config_table.add_row("Riduzione Fissa:", f"{CONFIG.FixedReductionAmountPoints*100:.0f} punti %")
+    config_table.add_row("Volume Min. Ridotto:", f"{CONFIG.MinimumVolumeAfterReduction*100:.0f}%")
+    fade_out_val = f"{CONFIG.FadeOutDurationSeconds}s ({CONFIG.FadeOutSteps} steps)"
     config_table.add_row("Fade Out:", Text(fade_out_val, overflow="fold"))
-    fade_in_val = f"{CONFIG['FadeInDurationSeconds']}s ({CONFIG['FadeInSteps']} steps)"
+    fade_in_val = f"{CONFIG.FadeInDurationSeconds}s ({CONFIG.FadeInSteps} steps)"
     config_table.add_row("Fade In:", Text(fade_in_val, overflow="fold"))
-    fade_uscita_val = f"{CONFIG['ExitFadeDurationSeconds']:.2f}s ({CONFIG['ExitFadeSteps']} steps)"
+    fade_uscita_val = f"{CONFIG.ExitFadeDurationSeconds:.2f}s ({CONFIG.ExitFadeSteps} steps)"
     config_table.add_row("Fade Uscita:", Text(fade_uscita_val, overflow="fold"))
+    config_table.add_row("Curva Fade:", CONFIG.FadeCurve)
     return Panel(config_table, title="[b]Impostazioni[/b]", border_style="blue", padding=(0, 1))
 
-def generate_status_panel() -> Panel:
+def generate_status_panel() -> "Panel":
+    from rich.panel import Panel
+    from rich.text import Text
     status_text = Text()
     status_text.append("App Trigger: ", style="bold")
     status_text.append(f"{status.trigger_app_name} ", style="cyan")
@@ -235,208 +1321,1032 @@ def generate_status_panel() -> Panel:
     status_text.append(f"\n  └ Volume Originale: {status.target_original_volume_percent}") # Usa la stringa formattata
     status_text.append("\n  └ Stato Riduzione: ", style="bold")
     status_text.append("ATTIVA" if status.is_target_volume_currently_reduced_by_script else "NON ATTIVA", style="yellow" if status.is_target_volume_currently_reduced_by_script else "dim")
+    status_text.append(f"\n\nPolling: {status.polling_rate_hz:.1f} Hz", style="dim")
+    status_text.append(f"\nScritture volume: {status.volume_writes_sent}/{status.volume_writes_requested} inviate, "
+                       f"{status.volume_fights} conflitti", style="dim")
     return Panel(status_text, title="[b]Stato Attuale[/b]", border_style="green", padding=(1,1))
 
-def generate_log_panel() -> Panel:
-    log_content = Text("\n").join(list(LOG_MESSAGES))
+LOG_LEVEL_COLORS = {
+    "INFO": "cyan",
+    "WARN": "yellow",
+    "ERROR": "red",
+    "SUCCESS": "green",
+    "ACTION": "magenta"
+}
+
+def format_log_message(entry) -> "Text":
+    from rich.text import Text
+    timestamp, level, message = entry
+    color = LOG_LEVEL_COLORS.get(level, "white")
+    return Text.assemble((f"[{timestamp}] ", "dim white"), (f"[{level}] ", color), message)
+
+def generate_log_panel() -> "Panel":
+    from rich.panel import Panel
+    from rich.text import Text
+    log_content = Text("\n").join([format_log_message(entry) for entry in list(LOG_MESSAGES)])
     return Panel(log_content, title="[b]Log Eventi[/b]", border_style="yellow", padding=(1,1))
 
-def generate_ui_components() -> Layout:
-    layout = make_layout()
-    header_title = Text.assemble(("Volume Changer", "bold bright_magenta"), (" v1.1"))
-    layout["header"].update(Align.center(header_title))
-    layout["config_display"].update(generate_config_panel())
-    layout["status_display"].update(generate_status_panel())
-    layout["log_display"].update(generate_log_panel())
-    layout["footer"].update(Align.center(Text("Premi Ctrl+C per uscire", style="dim white")))
-    return layout
+def generate_profile_panel() -> "Panel":
+    from rich.panel import Panel
+    from rich.table import Table
+    profile_table = Table(box=None, expand=True, padding=0)
+    profile_table.add_column("Fase", style="dim cyan")
+    for column in ("n", "p50", "p95", "p99", "max"):
+        profile_table.add_column(column, justify="right")
+    for phase, histogram in sorted(PROFILER.histograms.items()):
+        profile_table.add_row(phase, str(histogram.count),
+                              *(f"{value / 1000:.2f}ms" for value in (histogram.percentile_us(0.50), histogram.percentile_us(0.95),
+                                                                      histogram.percentile_us(0.99), histogram.max_seconds * 1e6)))
+    title = f"[b]Profiling[/b] (tick in ritardo: {PROFILER.tick_overruns})"
+    return Panel(profile_table, title=title, border_style="magenta", padding=(0, 1))
 
+def status_snapshot() -> tuple:
+    # Tutti i valori mostrati nel pannello di stato: se non cambiano il pannello non viene ricostruito
+    return (status.trigger_app_name, status.trigger_found, status.trigger_active,
+            status.target_app_name, status.target_found, status.target_current_volume_percent,
+            status.target_original_volume_percent, status.is_target_volume_currently_reduced_by_script,
+            round(status.polling_rate_hz, 1), status.volume_writes_requested, status.volume_writes_sent, status.volume_fights)
 
-def main_loop_tui(live: Live):
-    global status
+class TuiRenderer:
+    # Layout costruito una volta sola; i pannelli vengono ricostruiti solo quando i loro dati cambiano.
+    # render() viene chiamato dal thread di refresh di Live, alla frequenza RefreshRate, indipendentemente dal loop di controllo.
+    def __init__(self):
+        from rich.align import Align
+        from rich.text import Text
+        self.show_profile = PROFILER.enabled
+        self.layout = make_layout(self.show_profile)
+        header_title = Text.assemble(("Volume Changer", "bold bright_magenta"), (" v1.1"))
+        self.layout["header"].update(Align.center(header_title))
+        self.layout["footer"].update(Align.center(Text("Premi Ctrl+C per uscire", style="dim white")))
+        self._config_version = None
+        self._status_snapshot = None
+        self._log_version = None
+        self._profile_refreshed_at = None
 
-    status.trigger_app_name = CONFIG['TriggerAppName']
-    status.target_app_name = CONFIG['TargetAppName']
-    add_log_message(f"Controllo volume avviato. Trigger: {CONFIG['TriggerAppName']}, Target: {CONFIG['TargetAppName']}", "SUCCESS")
+    def render(self) -> "Layout":
+        profiling = PROFILER.enabled
+        if profiling: probe_start = time.perf_counter()
+        if self._config_version != CONFIG_VERSION:
+            self._config_version = CONFIG_VERSION
+            self.layout["config_display"].update(generate_config_panel())
+        snapshot = status_snapshot()
+        if snapshot != self._status_snapshot:
+            self._status_snapshot = snapshot
+            self.layout["status_display"].update(generate_status_panel())
+        if self._log_version != LOG_VERSION:
+            self._log_version = LOG_VERSION
+            self.layout["log_display"].update(generate_log_panel())
+        if self.show_profile:
+            # I dati di profiling cambiano a ogni tick: il pannello viene aggiornato al massimo una volta al secondo
+            now = time.monotonic()
+            if self._profile_refreshed_at is None or now - self._profile_refreshed_at >= 1.0:
+                self._profile_refreshed_at = now
+                self.layout["profile_display"].update(generate_profile_panel())
+        if profiling: PROFILER.record("render", time.perf_counter() - probe_start)
+        return self.layout
 
-    # Queste variabili ora sono in status per il ripristino all'uscita
-    # status.original_target_volume_value = None
-    # status.is_target_volume_currently_reduced_by_script = False
-    
-    trigger_app_quiet_since = None 
-    trigger_app_previously_found = True 
-    target_app_previously_found = True
-    current_reduced_volume_level = None # Livello a cui il volume è stato effettivamente ridotto
-
-    while True:
-        live.update(generate_ui_components())
-        time.sleep(CONFIG['PollingIntervalSeconds'])
-
-        all_sessions = AudioUtilities.GetAllSessions()
-        trigger_sessions_list = find_app_sessions(CONFIG['TriggerAppName'], all_sessions)
-        target_sessions_list = find_app_sessions(CONFIG['TargetAppName'], all_sessions)
-        target_session = target_sessions_list[0] if target_sessions_list else None
-
-        status.trigger_found = bool(trigger_sessions_list)
-        status.target_found = bool(target_session)
-        
-        if not status.trigger_found and trigger_app_previously_found:
-            add_log_message(f"App trigger '{CONFIG['TriggerAppName']}' non trovata.", "WARN")
-        elif status.trigger_found and not trigger_app_previously_found:
-             add_log_message(f"App trigger '{CONFIG['TriggerAppName']}' trovata nuovamente.", "INFO")
-        trigger_app_previously_found = status.trigger_found
-
-        if not status.target_found and target_app_previously_found and (status.trigger_found or status.is_target_volume_currently_reduced_by_script):
-            add_log_message(f"App target '{CONFIG['TargetAppName']}' non trovata.", "WARN")
-            if status.is_target_volume_currently_reduced_by_script: # Se scompare mentre era ridotto
-                status.original_target_volume_value = None
-                status.is_target_volume_currently_reduced_by_script = False
-                trigger_app_quiet_since = None
-                current_reduced_volume_level = None
-                status.target_original_volume_percent = "N/A"
-        elif status.target_found and not target_app_previously_found:
-            add_log_message(f"App target '{CONFIG['TargetAppName']}' trovata nuovamente.", "INFO")
-        target_app_previously_found = status.target_found
-        
-        if target_session:
+
+NO_VOLUME = math.nan # Valore "assente" negli array di stato dei target
+
+class VolumeController:
+    # Motore di ducking: valuta tutte le regole (insieme di trigger -> insieme di target) in un solo passaggio per tick.
+    # Ogni sessione trigger viene letta una volta sola anche se compare in più regole; lo stato di ogni sessione
+    # target (volume originale, livello ridotto, debounce, ripristino in corso) è tenuto in array compatti per slot.
+    # Non blocca mai: i fade vengono eseguiti dal FadeEngine.
+    def __init__(self, backend, fade_engine, rules=None, session_index=None, clock=time.monotonic, detector=None, actuator=None):
+        # clock viene passato anche all'indice delle sessioni e al VolumeActuator creati qui (clock virtuale in simulazione)
+        self.backend = backend
+        self.fade_engine = fade_engine
+        self.rules = list(rules or CONFIG.DuckingRules)
+        self.trigger_names = list(dict.fromkeys(name for rule in self.rules for name in rule.trigger_names))
+        self.target_names = list(dict.fromkeys(name for rule in self.rules for name in rule.target_names))
+        self.session_index = session_index or SessionIndex(backend, self.trigger_names + self.target_names,
+                                                           CONFIG.SessionRescanIntervalSeconds, clock=clock)
+        self.clock = clock
+        self.detector = detector or self._make_detector()
+        self.actuator = actuator or VolumeActuator(CONFIG.VolumeFloatTolerance, CONFIG.MaxWritesPerSecond,
+                                                   CONFIG.FightChanges, CONFIG.FightWindowSeconds,
+                                                   CONFIG.FightBackoffSeconds, CONFIG.FightMaxBackoffSeconds, clock)
+        self.app_previously_found = dict.fromkeys(self.trigger_names + self.target_names, True)
+        self.trigger_peak = 0.0 # Picco massimo dei trigger nell'ultimo tick
+        self.trigger_level = 0.0 # Livello massimo (dopo il TriggerDetector) dei trigger nell'ultimo tick
+
+        # Disposizione delle sessioni, ricalcolata solo quando cambia l'indice
+        self._layout_version = None
+        self.trigger_sessions = [] # Per slot trigger: IndexedSession (sessione, chiave e interfacce)
+        self.rule_trigger_slots = [()] * len(self.rules) # Per regola: indici in trigger_sessions
+        self.trigger_slot_names = [] # Per slot trigger: nome dell'app
+        self.peaks = array('d') # Per slot trigger: picco letto nell'ultimo tick
+        self.levels = array('d') # Per slot trigger: livello restituito dal TriggerDetector
+        self.rule_active = bytearray(len(self.rules))
+        self.target_sessions = [] # Per slot target: IndexedSession
+        self.target_keys = []
+        self.target_rule_ids = [] # Per slot target: indici delle regole che lo controllano
+        self.target_slot_names = [] # Per slot target: nome dell'app
+        self.current_volumes = array('d') # Per slot target: volume letto nell'ultimo tick (NO_VOLUME se non leggibile)
+
+        # Stato per slot target
+        self.original_volumes = array('d')
+        self.reduced_volumes = array('d') # Livello a cui il volume è stato effettivamente ridotto
+        self.quiet_since = array('d')
+        self.pending_restore_volumes = array('d') # Destinazione del fade-in di ripristino in corso
+        self.reduced = bytearray()
+        self._status_volumes = None # Valori mostrati nella TUI all'ultimo tick
+
+        status.trigger_app_name = ", ".join(self.trigger_names)
+        status.target_app_name = ", ".join(self.target_names)
+
+    @staticmethod
+    def _make_detector():
+        return TriggerDetector(CONFIG.DetectorLevel, CONFIG.EnvelopeAttackSeconds, CONFIG.EnvelopeReleaseSeconds,
+                               math.ceil(CONFIG.RmsWindowSeconds / CONFIG.PollingIntervalSeconds))
+
+    def reconfigure(self):
+        # Applica la configurazione appena ricaricata (CONFIG già sostituito), tra due tick.
+        # Lo stato di riduzione dei target (volume originale, livello ridotto, debounce) resta legato alla chiave
+        # di sessione e sopravvive al cambio di regole: _rebuild_layout lo ricopia al prossimo tick.
+        rule_was_active = {rule.name: self.rule_active[rule_id] for rule_id, rule in enumerate(self.rules)}
+        self.rules = list(CONFIG.DuckingRules)
+        self.rule_active = bytearray(rule_was_active.get(rule.name, 0) for rule in self.rules)
+        self.rule_trigger_slots = [()] * len(self.rules)
+        self.trigger_names = list(dict.fromkeys(name for rule in self.rules for name in rule.trigger_names))
+        self.target_names = list(dict.fromkeys(name for rule in self.rules for name in rule.target_names))
+
+        # Le app ridotte che non sono più target di nessuna regola tornano subito al volume originale
+        for slot, name in enumerate(self.target_slot_names):
+            if name in self.target_names or not self.reduced[slot]: continue
             try:
-                vol_ctrl_for_display = target_session._ctl.QueryInterface(ISimpleAudioVolume)
-                current_vol_display = vol_ctrl_for_display.GetMasterVolume()
-                status.target_current_volume_percent = f"{current_vol_display*100:.0f}%"
-            except: status.target_current_volume_percent = "Errore"
-        else: status.target_current_volume_percent = "N/A"
+                volume_control_target = self.session_index.interfaces.volume(self.target_sessions[slot])
+                add_log_message(f"{name} non è più un target: ripristino il volume a {self.original_volumes[slot]*100:.0f}%.", "ACTION")
+                self.fade_engine.fade(self.target_keys[slot], volume_control_target, self.original_volumes[slot],
+                                      volume_control_target.GetMasterVolume(), CONFIG.FadeInDurationSeconds, CONFIG.FadeInSteps)
+            except Exception as e:
+                add_log_message(f"Errore nel ripristinare il volume di {name}: {e}", "ERROR")
+        for name in self.trigger_names + self.target_names:
+            self.app_previously_found.setdefault(name, True)
+        self.session_index.set_app_names(self.trigger_names + self.target_names)
+        self.session_index.rescan_interval_seconds = CONFIG.SessionRescanIntervalSeconds
+        self.session_index.resolver.configure(CONFIG.ProcessNameCacheSize, CONFIG.ProcessNameCacheTTLSeconds)
+        detector = self._make_detector()
+        if (detector.mode, detector.attack_seconds, detector.release_seconds, detector.window_samples) != \
+           (self.detector.mode, self.detector.attack_seconds, self.detector.release_seconds, self.detector.window_samples):
+            self.detector = detector
+        self.actuator.configure(CONFIG.VolumeFloatTolerance, CONFIG.MaxWritesPerSecond, CONFIG.FightChanges,
+                                CONFIG.FightWindowSeconds, CONFIG.FightBackoffSeconds, CONFIG.FightMaxBackoffSeconds)
+        self._layout_version = None
+        status.trigger_app_name = ", ".join(self.trigger_names)
+        status.target_app_name = ", ".join(self.target_names)
 
-        # Aggiorna la stringa per la visualizzazione del volume originale
-        status.target_original_volume_percent = f"{status.original_target_volume_value*100:.0f}%" if status.original_target_volume_value is not None else "N/A"
+    def _rebuild_layout(self, sessions_by_app):
+        trigger_sessions, trigger_keys, trigger_slot_by_key, rule_trigger_slots, trigger_slot_names = [], [], {}, [], []
+        target_sessions, target_keys, target_slot_by_key, target_rule_ids, target_slot_names = [], [], {}, [], []
+        for rule_id, rule in enumerate(self.rules):
+            slots = []
+            for name in rule.trigger_names:
+                for record in sessions_by_app[name]:
+                    key = record.key
+                    if key not in trigger_slot_by_key:
+                        trigger_slot_by_key[key] = len(trigger_sessions)
+                        trigger_sessions.append(record)
+                        trigger_keys.append(key)
+                        trigger_slot_names.append(name)
+                    slots.append(trigger_slot_by_key[key])
+            rule_trigger_slots.append(tuple(dict.fromkeys(slots)))
+            for name in rule.target_names:
+                for record in sessions_by_app[name]:
+                    key = record.key
+                    if key not in target_slot_by_key:
+                        target_slot_by_key[key] = len(target_sessions)
+                        target_sessions.append(record)
+                        target_keys.append(key)
+                        target_slot_names.append(name)
+                        target_rule_ids.append([])
+                    if rule_id not in target_rule_ids[target_slot_by_key[key]]:
+                        target_rule_ids[target_slot_by_key[key]].append(rule_id)
 
+        # Lo stato delle sessioni target ancora presenti viene conservato, quello delle sessioni sparite scartato
+        previous_slot_by_key = {key: slot for slot, key in enumerate(self.target_keys)}
+        original_volumes, reduced_volumes, quiet_since, pending_restore_volumes, reduced = array('d'), array('d'), array('d'), array('d'), bytearray()
+        for key in target_keys:
+            previous_slot = previous_slot_by_key.get(key)
+            if previous_slot is None:
+                original_volumes.append(NO_VOLUME)
+                reduced_volumes.append(NO_VOLUME)
+                quiet_since.append(NO_VOLUME)
+                pending_restore_volumes.append(NO_VOLUME)
+                reduced.append(0)
+            else:
+                original_volumes.append(self.original_volumes[previous_slot])
+                reduced_volumes.append(self.reduced_volumes[previous_slot])
+                quiet_since.append(self.quiet_since[previous_slot])
+                pending_restore_volumes.append(self.pending_restore_volumes[previous_slot])
+                reduced.append(self.reduced[previous_slot])
 
-        status.trigger_active = False
-        if trigger_sessions_list:
-            for trigger_session_candidate in trigger_sessions_list:
-                try:
-                    meter = trigger_session_candidate._ctl.QueryInterface(IAudioMeterInformation)
-                    if meter.GetPeakValue() > CONFIG['TriggerVolumeThreshold']:
-                        status.trigger_active = True
-                        break 
-                except (COMError, AttributeError, Exception): pass 
-
-        if status.trigger_active:
-            trigger_app_quiet_since = None 
-            if target_session:
-                volume_control_target = target_session._ctl.QueryInterface(ISimpleAudioVolume)
-                actual_current_target_vol = volume_control_target.GetMasterVolume()
-
-                if not status.is_target_volume_currently_reduced_by_script: 
-                    if status.original_target_volume_value is None: 
-                        status.original_target_volume_value = actual_current_target_vol
-                        status.target_original_volume_percent = f"{status.original_target_volume_value*100:.0f}%" # Aggiorna display subito
-                    
-                    reduction_points = calculate_dynamic_reduction_amount(status.original_target_volume_value) if CONFIG['UseDynamicReduction'] else CONFIG['FixedReductionAmountPoints']
-                    volume_to_set_when_triggered = max(status.original_target_volume_value - reduction_points, CONFIG['MinimumVolumeAfterReduction'])
-                    volume_to_set_when_triggered = min(volume_to_set_when_triggered, status.original_target_volume_value)
-
-                    if abs(actual_current_target_vol - volume_to_set_when_triggered) > CONFIG['VolumeFloatTolerance']:
-                        msg = (f"{CONFIG['TriggerAppName']} attiva! Abbasso {CONFIG['TargetAppName']} da "
-                               f"{actual_current_target_vol*100:.0f}% a {volume_to_set_when_triggered*100:.0f}%. "
-                               f"(Originale: {status.original_target_volume_value*100:.0f}%)")
-                        add_log_message(msg, "ACTION")
-                        set_volume_gradually(volume_control_target, volume_to_set_when_triggered, actual_current_target_vol, 
-                                             CONFIG['FadeOutDurationSeconds'], CONFIG['FadeOutSteps'])
-                    current_reduced_volume_level = volume_to_set_when_triggered
-                    status.is_target_volume_currently_reduced_by_script = True
-
-                elif current_reduced_volume_level is not None and \
-                     abs(actual_current_target_vol - current_reduced_volume_level) > CONFIG['VolumeFloatTolerance']:
-                    msg = (f"{CONFIG['TargetAppName']} volume ({actual_current_target_vol*100:.0f}%) variato esternamente. "
-                           f"Ri-abbasso a {current_reduced_volume_level*100:.0f}%.")
+        self.trigger_sessions = trigger_sessions
+        self.rule_trigger_slots = rule_trigger_slots
+        self.trigger_slot_names = trigger_slot_names
+        self.peaks = array('d', bytes(8 * len(trigger_sessions)))
+        self.levels = array('d', bytes(8 * len(trigger_sessions)))
+        self.detector.resize(trigger_keys)
+        self.actuator.retain(target_keys)
+        self.target_sessions = target_sessions
+        self.target_keys = target_keys
+        self.target_rule_ids = [tuple(rule_ids) for rule_ids in target_rule_ids]
+        self.target_slot_names = target_slot_names
+        self.current_volumes = array('d', [NO_VOLUME] * len(target_sessions))
+        self.original_volumes = original_volumes
+        self.reduced_volumes = reduced_volumes
+        self.quiet_since = quiet_since
+        self.pending_restore_volumes = pending_restore_volumes
+        self.reduced = reduced
+        self._layout_version = self.session_index.version
+
+    def _log_app_presence(self, sessions_by_app):
+        trigger_found = bool(self.trigger_sessions)
+        for name in self.trigger_names:
+            found = bool(sessions_by_app[name])
+            if not found and self.app_previously_found[name]:
+                add_log_message(f"App trigger '{name}' non trovata.", "WARN")
+            elif found and not self.app_previously_found[name]:
+                add_log_message(f"App trigger '{name}' trovata nuovamente.", "INFO")
+            self.app_previously_found[name] = found
+        for name in self.target_names:
+            found = bool(sessions_by_app[name])
+            if not found and self.app_previously_found[name] and (trigger_found or status.is_target_volume_currently_reduced_by_script):
+                add_log_message(f"App target '{name}' non trovata.", "WARN")
+            elif found and not self.app_previously_found[name]:
+                add_log_message(f"App target '{name}' trovata nuovamente.", "INFO")
+            self.app_previously_found[name] = found
+
+    def is_restoring(self, slot):
+        return not math.isnan(self.pending_restore_volumes[slot]) and self.fade_engine.is_fading(self.target_keys[slot])
+
+    def needs_fast_polling(self):
+        # Polling veloce solo se un trigger è presente e vicino alla soglia, o se un target è ridotto/in transizione
+        if any(self.reduced) or self.actuator.has_pending() or any(self.is_restoring(slot) for slot in range(len(self.target_keys))):
+            return True
+        if not (self.trigger_sessions and self.target_sessions):
+            return False
+        near_level = min(rule.threshold for rule in self.rules) * CONFIG.NearThresholdRatio
+        return self.trigger_peak >= near_level or self.trigger_level >= near_level
+
+    def tick(self):
+        profiling = PROFILER.enabled
+
+        sessions_by_app = self.session_index.refresh()
+        if self._layout_version != self.session_index.version:
+            self._rebuild_layout(sessions_by_app)
+            self._log_app_presence(sessions_by_app) # La presenza delle app cambia solo con l'indice
+        interfaces = self.session_index.interfaces
+        self.actuator.flush()
+
+        # 1. Picco di ogni sessione trigger, letto una volta sola e passato al TriggerDetector
+        now = self.clock()
+        detector = self.detector
+        peaks, levels = self.peaks, self.levels
+        self.trigger_peak = self.trigger_level = 0.0
+        for trigger_slot, trigger_session in enumerate(self.trigger_sessions):
+            try:
+                meter = interfaces.meter(trigger_session)
+                if profiling: probe_start = time.perf_counter()
+                peak = meter.GetPeakValue()
+                if profiling: PROFILER.record("get_peak", time.perf_counter() - probe_start)
+            except Exception:
+                interfaces.invalidate(trigger_session)
+                peak = 0.0
+            peaks[trigger_slot] = peak
+            level = levels[trigger_slot] = detector.update(trigger_slot, peak, now)
+            if peak > self.trigger_peak:
+                self.trigger_peak = peak
+            if level > self.trigger_level:
+                self.trigger_level = level
+
+        # 2. Regole attive, con isteresi: una regola attiva si spegne solo sotto soglia * ReleaseThresholdRatio
+        rule_active = self.rule_active
+        release_ratio = CONFIG.ReleaseThresholdRatio
+        for rule_id, rule in enumerate(self.rules):
+            threshold = rule.threshold * release_ratio if rule_active[rule_id] else rule.threshold
+            active = 0
+            for trigger_slot in self.rule_trigger_slots[rule_id]:
+                if levels[trigger_slot] > threshold:
+                    active = 1
+                    break
+            rule_active[rule_id] = active
+
+        # 3. Stato di ogni sessione target
+        display_volume = original_volume = None
+        for slot in range(len(self.target_sessions)):
+            current_volume = self._update_target(slot, now, interfaces)
+            self.current_volumes[slot] = NO_VOLUME if current_volume is None else current_volume
+            if slot == 0:
+                display_volume = current_volume
+            if original_volume is None and self.reduced[slot]:
+                original_volume = self.original_volumes[slot]
+
+        status.trigger_found = bool(self.trigger_sessions)
+        status.target_found = bool(self.target_sessions)
+        status.trigger_active = any(rule_active)
+        status.is_target_volume_currently_reduced_by_script = original_volume is not None
+        # Le stringhe per la TUI vengono riformattate solo quando i valori cambiano
+        status_volumes = (bool(self.target_sessions), display_volume, original_volume)
+        if status_volumes != self._status_volumes:
+            self._status_volumes = status_volumes
+            if not self.target_sessions: status.target_current_volume_percent = "N/A"
+            elif display_volume is None: status.target_current_volume_percent = "Errore"
+            else: status.target_current_volume_percent = f"{display_volume*100:.0f}%"
+            status.original_target_volume_value = original_volume
+            # Aggiorna la stringa per la visualizzazione del volume originale
+            status.target_original_volume_percent = f"{original_volume*100:.0f}%" if original_volume is not None else "N/A"
+        status.volume_writes_requested = self.actuator.requested
+        status.volume_writes_sent = self.actuator.written
+        status.volume_fights = self.actuator.fights
+
+    def _update_target(self, slot, now, interfaces):
+        target_session = self.target_sessions[slot]
+        target_key = self.target_keys[slot] # Chiave dei fade nel FadeEngine
+        try:
+            volume_control_target = self.actuator.channel(target_key, interfaces.volume(target_session))
+            actual_current_target_vol = volume_control_target.GetMasterVolume()
+        except Exception:
+            interfaces.invalidate(target_session)
+            return None
+
+        active_rule_ids = [rule_id for rule_id in self.target_rule_ids[slot] if self.rule_active[rule_id]]
+        if active_rule_ids:
+            self.quiet_since[slot] = NO_VOLUME
+            if not self.reduced[slot]:
+                # Se un ripristino è ancora in corso il volume attuale è intermedio: l'originale è la destinazione del fade-in
+                if math.isnan(self.original_volumes[slot]):
+                    self.original_volumes[slot] = self.pending_restore_volumes[slot] if self.is_restoring(slot) else actual_current_target_vol
+                self.pending_restore_volumes[slot] = NO_VOLUME
+
+            original_volume = self.original_volumes[slot]
+            # Con più regole attive sullo stesso target vince la riduzione maggiore
+            if len(active_rule_ids) == 1:
+                volume_to_set_when_triggered = self.rules[active_rule_ids[0]].reduced_volume(original_volume)
+            else:
+                volume_to_set_when_triggered = min(self.rules[rule_id].reduced_volume(original_volume) for rule_id in active_rule_ids)
+            reduced_level = self.reduced_volumes[slot]
+
+            if not self.reduced[slot] or abs(volume_to_set_when_triggered - reduced_level) > CONFIG.VolumeFloatTolerance:
+                if abs(actual_current_target_vol - volume_to_set_when_triggered) > CONFIG.VolumeFloatTolerance:
+                    trigger_names = ", ".join(name for rule_id in active_rule_ids for name in self.rules[rule_id].trigger_names)
+                    msg = (f"{trigger_names} attiva! Abbasso {self._target_name(target_session)} da "
+                           f"{actual_current_target_vol*100:.0f}% a {volume_to_set_when_triggered*100:.0f}%. "
+                           f"(Originale: {original_volume*100:.0f}%)")
                     add_log_message(msg, "ACTION")
-                    set_volume_gradually(volume_control_target, current_reduced_volume_level, actual_current_target_vol, 
-                                         CONFIG['FadeOutDurationSeconds'], CONFIG['FadeOutSteps'])
-        else: # Trigger non attivo
-            if status.is_target_volume_currently_reduced_by_script: 
-                if trigger_app_quiet_since is None:
-                    trigger_app_quiet_since = time.time() 
-
-                if trigger_app_quiet_since and (time.time() - trigger_app_quiet_since >= CONFIG['DebounceTimeSeconds']):
-                    if target_session and status.original_target_volume_value is not None:
-                        volume_control_target = target_session._ctl.QueryInterface(ISimpleAudioVolume)
-                        actual_current_target_vol = volume_control_target.GetMasterVolume()
-                        
-                        if abs(actual_current_target_vol - status.original_target_volume_value) > CONFIG['VolumeFloatTolerance']:
-                            msg = (f"{CONFIG['TriggerAppName']} silenzioso. Ripristino {CONFIG['TargetAppName']} da "
-                                   f"{actual_current_target_vol*100:.0f}% a {status.original_target_volume_value*100:.0f}%.")
-                            add_log_message(msg, "ACTION")
-                            set_volume_gradually(volume_control_target, status.original_target_volume_value, actual_current_target_vol, 
-                                                 CONFIG['FadeInDurationSeconds'], CONFIG['FadeInSteps'])
-                        
-                        status.original_target_volume_value = None 
-                        status.is_target_volume_currently_reduced_by_script = False
-                        trigger_app_quiet_since = None
-                        current_reduced_volume_level = None
-                        status.target_original_volume_percent = "N/A"
-                    elif not target_session and status.original_target_volume_value is not None: # App target chiusa
-                        add_log_message(f"{CONFIG['TriggerAppName']} silenzioso. App target '{CONFIG['TargetAppName']}' non trovata, resetto stato.", "WARN")
-                        status.original_target_volume_value = None
-                        status.is_target_volume_currently_reduced_by_script = False
-                        trigger_app_quiet_since = None
-                        current_reduced_volume_level = None
-                        status.target_original_volume_percent = "N/A"
-                    elif status.original_target_volume_value is None and status.is_target_volume_currently_reduced_by_script: # Stato anomalo
-                         add_log_message(f"{CONFIG['TriggerAppName']} silenzioso. Stato inconsistente. Reset stato.", "WARN")
-                         status.is_target_volume_currently_reduced_by_script = False
-                         trigger_app_quiet_since = None
-                         current_reduced_volume_level = None
-                         status.target_original_volume_percent = "N/A" # Resetta anche display
-        
-        live.update(generate_ui_components())
+                    self.fade_engine.fade(target_key, volume_control_target, volume_to_set_when_triggered, actual_current_target_vol,
+                                          CONFIG.FadeOutDurationSeconds, CONFIG.FadeOutSteps)
+                self.reduced_volumes[slot] = volume_to_set_when_triggered
+                self.reduced[slot] = 1
 
+            elif abs(actual_current_target_vol - reduced_level) > CONFIG.VolumeFloatTolerance and \
+                 not self.fade_engine.is_fading(target_key) and not self.actuator.in_backoff(target_key):
+                backoff_seconds = self.actuator.note_external_change(target_key)
+                if backoff_seconds:
+                    msg = (f"{self._target_name(target_session)} volume cambiato più volte esternamente: conflitto con un'altra app "
+                           f"o con l'utente. Sospendo il ri-abbasso per {backoff_seconds:.0f}s.")
+                    add_log_message(msg, "WARN")
+                else:
+                    msg = (f"{self._target_name(target_session)} volume ({actual_current_target_vol*100:.0f}%) variato esternamente. "
+                           f"Ri-abbasso a {reduced_level*100:.0f}%.")
+                    add_log_message(msg, "ACTION")
+                    self.fade_engine.fade(target_key, volume_control_target, reduced_level, actual_current_target_vol,
+                                          CONFIG.FadeOutDurationSeconds, CONFIG.FadeOutSteps)
+
+        elif self.reduced[slot]: # Nessun trigger attivo per questo target
+            if math.isnan(self.quiet_since[slot]):
+                self.quiet_since[slot] = now
+
+            if now - self.quiet_since[slot] >= CONFIG.DebounceTimeSeconds:
+                original_volume = self.original_volumes[slot]
+                if abs(actual_current_target_vol - original_volume) > CONFIG.VolumeFloatTolerance:
+                    trigger_names = ", ".join(name for rule_id in self.target_rule_ids[slot] for name in self.rules[rule_id].trigger_names)
+                    msg = (f"{trigger_names} silenzioso. Ripristino {self._target_name(target_session)} da "
+                           f"{actual_current_target_vol*100:.0f}% a {original_volume*100:.0f}%.")
+                    add_log_message(msg, "ACTION")
+                    self.fade_engine.fade(target_key, volume_control_target, original_volume, actual_current_target_vol,
+                                          CONFIG.FadeInDurationSeconds, CONFIG.FadeInSteps)
+                    self.pending_restore_volumes[slot] = original_volume
+
+                self.original_volumes[slot] = NO_VOLUME
+                self.reduced_volumes[slot] = NO_VOLUME
+                self.quiet_since[slot] = NO_VOLUME
+                self.reduced[slot] = 0
+                self.actuator.reset_fight(target_key)
+
+        return actual_current_target_vol
+
+    def _target_name(self, record):
+        return self.session_index.resolver.name(record.session.ProcessId)
+
+    def volumes_to_restore(self):
+        # (IndexedSession, chiave, volume) dei target ridotti o con un ripristino ancora in corso
+        restores = []
+        for slot, session in enumerate(self.target_sessions):
+            if self.reduced[slot]:
+                restores.append((session, self.target_keys[slot], self.original_volumes[slot]))
+            elif self.is_restoring(slot):
+                restores.append((session, self.target_keys[slot], self.pending_restore_volumes[slot]))
+        return restores
+
+
+# --- REGISTRAZIONE E SIMULAZIONE TRACCE ---
+# File traccia: intestazione TRACE_HEADER (magic, versione, numero trigger, numero target, lunghezza nomi),
+# nomi delle app in UTF-8 separati da "\n" e allineati a 4 byte, poi righe di float32 a larghezza fissa:
+# [secondi dall'inizio, picco di ogni trigger..., volume di ogni target...]. Volume NaN = target non trovato.
+TRACE_MAGIC = b"VCTR"
+TRACE_VERSION = 1
+TRACE_HEADER = struct.Struct("<4sHHHI")
+
+class TraceRecorder:
+    # Registra a ogni tick il picco massimo di ogni app trigger e il volume della prima sessione di ogni app target
+    def __init__(self, path, trigger_names, target_names, flush_rows=256):
+        self.trigger_names = list(trigger_names)
+        self.target_names = list(target_names)
+        # Colonna di ogni app; le app aggiunte dopo l'avvio (ricaricamento della configurazione) non vengono registrate
+        self._trigger_columns = {name: 1 + index for index, name in enumerate(self.trigger_names)}
+        self._target_columns = {name: 1 + len(self.trigger_names) + index for index, name in enumerate(self.target_names)}
+        self.row_width = 1 + len(self.trigger_names) + len(self.target_names)
+        self.flush_rows = flush_rows
+        self.rows = 0
+        self._start_time = None
+        self._buffer = array('f')
+        self._row = array('f', bytes(4 * self.row_width))
+        names = "\n".join(self.trigger_names + self.target_names).encode("utf-8")
+        names += b"\0" * (-(TRACE_HEADER.size + len(names)) % 4)
+        self._file = open(path, "wb")
+        self._file.write(TRACE_HEADER.pack(TRACE_MAGIC, TRACE_VERSION, len(self.trigger_names), len(self.target_names), len(names)))
+        self._file.write(names)
+
+    def record(self, controller, now):
+        if self._start_time is None:
+            self._start_time = now
+        row = self._row
+        row[0] = now - self._start_time
+        trigger_count = len(self.trigger_names)
+        for column in range(1, self.row_width):
+            row[column] = 0.0 if column <= trigger_count else NO_VOLUME
+        for trigger_slot, name in enumerate(controller.trigger_slot_names):
+            column = self._trigger_columns.get(name)
+            if column is not None:
+                row[column] = max(row[column], controller.peaks[trigger_slot])
+        for slot, name in enumerate(controller.target_slot_names):
+            column = self._target_columns.get(name)
+            if column is not None and math.isnan(row[column]):
+                row[column] = controller.current_volumes[slot]
+        self._buffer.extend(row)
+        self.rows += 1
+        if len(self._buffer) >= self.flush_rows * self.row_width:
+            self.flush()
+
+    def flush(self):
+        self._buffer.tofile(self._file)
+        self._file.flush()
+        del self._buffer[:]
+
+    def close(self):
+        if self._file.closed: return
+        self.flush()
+        self._file.close()
 
-if __name__ == "__main__":
-    load_config() 
-    
-    status.trigger_app_name = CONFIG['TriggerAppName']
-    status.target_app_name = CONFIG['TargetAppName']
 
-    with Live(generate_ui_components(), refresh_per_second=CONFIG['TuiRefreshRate'], screen=True, transient=False) as live:
+class TraceFile:
+    # Lettura di una traccia tramite mmap, senza copiare i dati: rows è una memoryview di float32
+    def __init__(self, path):
+        self._file = open(path, "rb")
         try:
-            main_loop_tui(live)
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError: # File vuoto
+            self._file.close()
+            raise ValueError(f"File traccia '{path}' vuoto o non valido")
+        if len(self._map) < TRACE_HEADER.size:
+            self.close()
+            raise ValueError(f"File traccia '{path}' vuoto o non valido")
+        magic, version, trigger_count, target_count, names_length = TRACE_HEADER.unpack_from(self._map, 0)
+        if magic != TRACE_MAGIC or version != TRACE_VERSION:
+            self.close()
+            raise ValueError(f"File traccia '{path}' non valido (formato o versione non supportati)")
+        names = bytes(self._map[TRACE_HEADER.size:TRACE_HEADER.size + names_length]).rstrip(b"\0").decode("utf-8").split("\n")
+        self.trigger_names = names[:trigger_count]
+        self.target_names = names[trigger_count:trigger_count + target_count]
+        self.row_width = 1 + trigger_count + target_count
+        data_offset = TRACE_HEADER.size + names_length
+        # Un'eventuale riga incompleta in fondo (registrazione interrotta) viene ignorata
+        self.row_count = (len(self._map) - data_offset) // (4 * self.row_width)
+        self.rows = memoryview(self._map)[data_offset:data_offset + self.row_count * self.row_width * 4].cast('f')
+
+    def __len__(self):
+        return self.row_count
+
+    def time(self, row_index):
+        return self.rows[row_index * self.row_width]
+
+    def duration(self):
+        return self.time(self.row_count - 1) if self.row_count else 0.0
+
+    def row(self, row_index):
+        start = row_index * self.row_width
+        return self.rows[start:start + self.row_width]
+
+    def close(self):
+        if getattr(self, 'rows', None) is not None:
+            self.rows.release()
+            self.rows = None
+        self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class SimulationReport:
+    __slots__ = ('simulated_seconds', 'wall_seconds', 'ticks', 'duck_events', 'restore_events', 'duck_latencies',
+                 'volume_writes', 'volume_write_requests', 'reduced_seconds')
+
+    def __init__(self):
+        self.simulated_seconds = 0.0
+        self.wall_seconds = 0.0
+        self.ticks = 0
+        self.duck_events = 0
+        self.restore_events = 0
+        self.duck_latencies = [] # Secondi tra il superamento della soglia nella traccia e l'inizio della riduzione
+        self.volume_writes = 0
+        self.volume_write_requests = 0
+        self.reduced_seconds = 0.0
+
+    def lines(self):
+        latencies = sorted(self.duck_latencies)
+        latency_text = (f"media {sum(latencies) / len(latencies) * 1000:.0f} ms, max {latencies[-1] * 1000:.0f} ms"
+                        if latencies else "N/A")
+        speedup = self.simulated_seconds / self.wall_seconds if self.wall_seconds > 0 else math.inf
+        return [
+            f"Durata simulata: {self.simulated_seconds:.1f}s in {self.wall_seconds:.3f}s ({speedup:.0f}x tempo reale, {self.ticks} tick)",
+            f"Riduzioni: {self.duck_events}, ripristini: {self.restore_events}",
+            f"Latenza trigger -> riduzione: {latency_text}",
+            f"Tempo con volume ridotto: {self.reduced_seconds:.1f}s",
+            f"Scritture volume: {self.volume_writes} inviate su {self.volume_write_requests} richieste",
+        ]
+
+
+def simulate_trace(trace, rules=None):
+    # Esegue la logica di main_loop_tui sulla traccia con un clock virtuale: ogni app della traccia diventa una
+    # sessione del FakeAudioBackend (i target partono dal primo volume registrato), il FadeEngine viene eseguito
+    # alle sue scadenze e il polling segue l'AdaptivePoller come nel loop reale.
+    # I volumi registrati dopo il primo non vengono riprodotti: includono le riduzioni fatte dallo script stesso.
+    report = SimulationReport()
+    if not len(trace): return report
+    wall_start = time.perf_counter()
+    from simulated_audio import FakeAudioBackend # Import ritardato: serve solo con --replay e nei benchmark
+    now = 0.0
+    clock = lambda: now
+    backend = FakeAudioBackend()
+    trigger_meters = [backend.add_session(name).meter for name in trace.trigger_names]
+    first_row = trace.row(0)
+    target_sessions = []
+    for column, name in enumerate(trace.target_names, start=1 + len(trace.trigger_names)):
+        recorded_volume = first_row[column]
+        target_sessions.append(backend.add_session(name, volume=1.0 if math.isnan(recorded_volume) else recorded_volume))
+    fade_engine = FadeEngine(clock=clock)
+    controller = VolumeController(backend, fade_engine, rules=rules, clock=clock)
+    poller = AdaptivePoller(CONFIG.PollingIntervalSeconds, CONFIG.MaxPollingIntervalSeconds, CONFIG.PollingBackoffFactor)
+    trigger_threshold = min(rule.threshold for rule in controller.rules)
+
+    # Le righe vengono lette direttamente dalla memoryview della traccia; i picchi cambiano solo a ogni nuova riga
+    rows, row_width, row_count = trace.rows, trace.row_width, len(trace)
+    row_index, row_time, next_row_time = -1, 0.0, 0.0
+    peak = 0.0
+    end_time = trace.duration()
+    onset_time = None # Primo superamento della soglia nella traccia non ancora seguito da una riduzione
+    was_reduced = False
+    ticks, reduced_seconds = 0, 0.0
+    tick, needs_fast_polling, update_poller, pump = controller.tick, controller.needs_fast_polling, poller.update, fade_engine.pump
+    while now <= end_time:
+        if next_row_time <= now:
+            while next_row_time <= now:
+                row_index += 1
+                next_row_time = rows[(row_index + 1) * row_width] if row_index + 1 < row_count else math.inf
+            row_start = row_index * row_width
+            row_time = rows[row_start]
+            peak = 0.0
+            for column, meter in enumerate(trigger_meters, start=row_start + 1):
+                meter.peak = rows[column]
+                if meter.peak > peak: peak = meter.peak
+        if peak > trigger_threshold and onset_time is None and not was_reduced:
+            onset_time = row_time
+
+        tick()
+        ticks += 1
+        reduced = any(controller.reduced)
+        if reduced and not was_reduced:
+            report.duck_events += 1
+            if onset_time is not None:
+                report.duck_latencies.append(now - onset_time)
+        elif was_reduced and not reduced:
+            report.restore_events += 1
+        if not reduced and peak <= trigger_threshold:
+            onset_time = None
+        was_reduced = reduced
+
+        interval = update_poller(needs_fast_polling(), now)
+        if reduced: reduced_seconds += interval
+        # Step dei fade fino al prossimo tick, ognuno alla sua scadenza
+        next_tick = now + interval
+        next_deadline = pump(now)
+        while next_deadline is not None and next_deadline <= next_tick:
+            now = next_deadline
+            next_deadline = pump(next_deadline)
+        now = next_tick
+    report.ticks, report.reduced_seconds = ticks, reduced_seconds
+    report.simulated_seconds = end_time
+    report.volume_writes = sum(session.volume_control.set_calls for session in target_sessions)
+    report.volume_write_requests = controller.actuator.requested
+    report.wall_seconds = time.perf_counter() - wall_start
+    return report
+
+
+def run_replay(path):
+    # Nessun handler di log: i messaggi della simulazione restano solo in LOG_MESSAGES
+    with TraceFile(path) as trace:
+        print(f"Simulazione della traccia '{path}': {len(trace)} campioni, {trace.duration():.1f}s, "
+              f"trigger {', '.join(trace.trigger_names)}, target {', '.join(trace.target_names)}.")
+        report = simulate_trace(trace)
+    for line in report.lines():
+        print(line)
+
+
+def main_loop_tui(controller, recorder=None, stop=None):
+    rule_descriptions = "; ".join(f"{', '.join(rule.trigger_names)} -> {', '.join(rule.target_names)}" for rule in controller.rules)
+    add_log_message(f"Controllo volume avviato. Regole: {rule_descriptions}", "SUCCESS")
+
+    poller = AdaptivePoller(CONFIG.PollingIntervalSeconds, CONFIG.MaxPollingIntervalSeconds, CONFIG.PollingBackoffFactor)
+    watcher = ConfigWatcher(CONFIG_PATH, CONFIG.ConfigReloadIntervalSeconds) if CONFIG.ConfigReloadIntervalSeconds > 0 else None
+
+    # Il rendering (se la TUI è attiva) avviene sul thread di refresh di Live: qui solo logica di controllo.
+    # stop (threading.Event, opzionale) termina il loop tra due tick: usato dai benchmark
+    while stop is None or not stop.is_set():
+        time.sleep(poller.interval)
+        if PROFILER.enabled:
+            probe_start = time.perf_counter()
+            controller.tick()
+            PROFILER.record_tick(time.perf_counter() - probe_start, poller.interval)
+        else:
+            controller.tick()
+        if recorder is not None:
+            recorder.record(controller, time.monotonic())
+        poller.update(controller.needs_fast_polling())
+        status.polling_rate_hz = poller.effective_rate
+        if watcher is not None:
+            watcher = poll_config_watcher(watcher, controller, poller)
+
+
+def reload_config(settings, controller, poller):
+    # Chiamato tra due tick: la nuova configurazione sostituisce la vecchia senza perdere lo stato di riduzione
+    apply_settings(settings)
+    controller.reconfigure()
+    poller.configure(CONFIG.PollingIntervalSeconds, CONFIG.MaxPollingIntervalSeconds, CONFIG.PollingBackoffFactor)
+    add_log_message("config.ini modificato: nuova configurazione applicata.", "SUCCESS")
+
+
+def poll_config_watcher(watcher, controller, poller):
+    # Restituisce il watcher da usare ai tick successivi, None se il file ricaricato ha disattivato il controllo
+    settings = watcher.poll()
+    if settings is None: return watcher
+    reload_config(settings, controller, poller)
+    if CONFIG.ConfigReloadIntervalSeconds > 0:
+        watcher.check_interval_seconds = max(CONFIG.ConfigReloadIntervalSeconds, 0.1)
+        return watcher
+    add_log_message("Ricaricamento automatico di config.ini disattivato.", "INFO")
+    return None
+
+
+def restore_target_volume_on_exit(controller):
+    restores = controller.volumes_to_restore()
+    if not restores:
+        add_log_message(f"Nessun ripristino del volume necessario per {status.target_app_name} all'uscita.", "INFO")
+        return
+
+    # Fade di uscita: i fade ancora in corso vengono sostituiti
+    fade_engine = controller.fade_engine
+    fade_engine.cancel_all()
+    started_fades = []
+    for target_session, target_key, original_volume in restores:
+        target_name = controller._target_name(target_session)
+        add_log_message(f"Tentativo di ripristino volume di {target_name} a {original_volume*100:.0f}%...", "ACTION")
+        if controller.backend.is_expired(target_session.session):
+            add_log_message(f"Impossibile trovare {target_name} per ripristinare il volume all'uscita.", "WARN")
+            continue
+        try:
+            volume_control_target = controller.backend.volume_control(target_session.session)
+            fade_engine.fade(target_key, volume_control_target, original_volume,
+                             volume_control_target.GetMasterVolume(), CONFIG.ExitFadeDurationSeconds, CONFIG.ExitFadeSteps)
+            started_fades.append((target_key, target_name, original_volume))
+        except Exception as e_exit:
+            add_log_message(f"Errore nel ripristinare il volume di {target_name} all'uscita: {e_exit}", "ERROR")
+
+    for target_key, target_name, original_volume in started_fades:
+        fade_engine.wait(target_key, CONFIG.ExitFadeDurationSeconds + 1.0)
+        add_log_message(f"Volume di {target_name} ripristinato a {original_volume*100:.0f}%.", "SUCCESS")
+
+
+def dump_profile():
+    if not PROFILER.enabled: return
+    try:
+        PROFILER.dump_json(CONFIG.ProfileDumpFile)
+        add_log_message(f"Dati di profiling salvati in '{CONFIG.ProfileDumpFile}'.", "INFO")
+    except OSError as e:
+        add_log_message(f"Errore nel salvataggio dei dati di profiling: {e}", "ERROR")
+
+
+def run_tui(controller, recorder=None):
+    from rich.console import Console
+    from rich.live import Live
+    console = Console()
+    renderer = TuiRenderer()
+
+    with Live(get_renderable=renderer.render, refresh_per_second=CONFIG.TuiRefreshRate, screen=True, transient=False) as live:
+        try:
+            main_loop_tui(controller, recorder)
         except KeyboardInterrupt:
             add_log_message("Uscita dal programma richiesta dall'utente.", "WARN")
-            live.update(generate_ui_components()) # Aggiorna TUI un'ultima volta
-            
-            if status.is_target_volume_currently_reduced_by_script and status.original_target_volume_value is not None:
-                add_log_message(f"Tentativo di ripristino volume di {CONFIG['TargetAppName']} a {status.original_target_volume_value*100:.0f}%...", "ACTION")
-                all_sessions_on_exit = AudioUtilities.GetAllSessions()
-                target_sessions_list_on_exit = find_app_sessions(CONFIG['TargetAppName'], all_sessions_on_exit)
-                target_session_on_exit = target_sessions_list_on_exit[0] if target_sessions_list_on_exit else None
-
-                if target_session_on_exit:
-                    try:
-                        volume_control_target = target_session_on_exit._ctl.QueryInterface(ISimpleAudioVolume)
-                        # Ripristino istantaneo
-                        volume_control_target.SetMasterVolume(status.original_target_volume_value, None)
-                        add_log_message(f"Volume di {CONFIG['TargetAppName']} ripristinato istantaneamente a {status.original_target_volume_value*100:.0f}%.", "SUCCESS")
-                    except Exception as e_exit:
-                        add_log_message(f"Errore nel ripristinare istantaneamente il volume di {CONFIG['TargetAppName']} all'uscita: {e_exit}", "ERROR")
-                else:
-                    add_log_message(f"Impossibile trovare {CONFIG['TargetAppName']} per ripristinare il volume all'uscita.", "WARN")
-            else:
-                add_log_message(f"Nessun ripristino del volume necessario per {CONFIG['TargetAppName']} all'uscita.", "INFO")
-            
+            live.refresh() # Aggiorna TUI un'ultima volta
+            restore_target_volume_on_exit(controller)
             # Pausa per permettere di leggere il messaggio di log del ripristino prima che la TUI scompaia
             time.sleep(0.5) 
 
         except Exception as e:
             console.print_exception(show_locals=True)
             add_log_message(f"ERRORE GLOBALE IMPREVISTO: {e}", "ERROR")
-            live.update(generate_ui_components()) 
+            live.refresh()
             time.sleep(5)
         finally:
+            controller.fade_engine.stop()
+            dump_profile()
             add_log_message("Script terminato.", "INFO")
             # console.clear() # Opzionale: pulisce lo schermo dopo la chiusura di Live
     
     # Stampa log finale sulla console normale
     print("\n--- Log ------------------------------")
-    for msg_text in LOG_MESSAGES:
-        console.print(msg_text)
-    print("--------------------------------------")
\ No newline at end of file
+    for entry in LOG_MESSAGES:
+        console.print(format_log_message(entry))
+    print("--------------------------------------")
+
+
+def run_headless(controller, recorder=None):
+    setup_headless_logging()
+    try:
+        main_loop_tui(controller, recorder)
+    except KeyboardInterrupt:
+        add_log_message("Uscita dal programma richiesta dall'utente.", "WARN")
+        restore_target_volume_on_exit(controller)
+    except Exception as e:
+        LOGGER.exception("ERRORE GLOBALE IMPREVISTO")
+        add_log_message(f"ERRORE GLOBALE IMPREVISTO: {e}", "ERROR")
+    finally:
+        controller.fade_engine.stop()
+        dump_profile()
+        add_log_message("Script terminato.", "INFO")
+
+
+# --- RUNTIME ASYNCIO ---
+class AsyncRuntime:
+    # Alternativa a main_loop_tui (--asyncio): il lavoro è diviso in task indipendenti che comunicano tramite code.
+    #   discovery: enumerazione completa delle sessioni (lenta) -> scan_queue
+    #   controllo: applica le scansioni, legge i picchi e aggiorna i volumi (controller.tick) -> render_queue
+    #   fade:      esegue gli step dei fade quando scadono, al posto del thread del FadeEngine
+    #   render:    ridisegna la TUI solo quando lo stato mostrato è cambiato
+    #   config:    controlla config.ini -> config_queue
+    # Le chiamate COM bloccanti girano in un piccolo executor dedicato: una chiamata lenta (es. enumerazione)
+    # ritarda solo il proprio task, non il metering né i fade.
+    # asyncio e concurrent.futures vengono importati solo qui, come Rich nella TUI: senza --asyncio non vengono caricati.
+    DISCOVERY_CHECK_SECONDS = 0.1
+    EXECUTOR_WORKERS = 3 # discovery, controllo, fade
+
+    def __init__(self, controller, recorder=None, tui=None):
+        from concurrent.futures import ThreadPoolExecutor
+        self.controller = controller
+        self.recorder = recorder
+        self.tui = tui # Live di Rich (auto_refresh=False) e TuiRenderer, oppure None in modalità headless
+        self.poller = AdaptivePoller(CONFIG.PollingIntervalSeconds, CONFIG.MaxPollingIntervalSeconds, CONFIG.PollingBackoffFactor)
+        self.executor = ThreadPoolExecutor(self.EXECUTOR_WORKERS, thread_name_prefix="VolumeChangerCOM",
+                                           initializer=controller.backend.init_thread)
+        self.ticks = 0
+        self._loop = None
+        self._tasks = []
+
+    async def _call(self, function, *args):
+        return await self._loop.run_in_executor(self.executor, function, *args)
+
+    async def run(self):
+        import asyncio
+        self._loop = asyncio.get_running_loop()
+        controller = self.controller
+        index = controller.session_index
+        index.background_scans = True
+        # Il FadeEngine non usa più il suo thread: il task dei fade viene svegliato a ogni nuovo fade
+        controller.fade_engine.stop()
+        self._fade_event = asyncio.Event()
+        self._rescan_event = asyncio.Event()
+        controller.fade_engine.on_schedule = lambda: self._loop.call_soon_threadsafe(self._fade_event.set)
+        self.scan_queue = asyncio.Queue()
+        self.config_queue = asyncio.Queue()
+        self.render_queue = asyncio.Queue(maxsize=1)
+
+        rule_descriptions = "; ".join(f"{', '.join(rule.trigger_names)} -> {', '.join(rule.target_names)}" for rule in controller.rules)
+        add_log_message(f"Controllo volume avviato (asyncio). Regole: {rule_descriptions}", "SUCCESS")
+
+        # Prima scansione prima di partire, così il primo tick vede già le sessioni
+        index.submit_scan(await self._call(index.list_sessions), time.monotonic(), controller.backend.change_counter())
+        coroutines = [self._discovery_task(), self._control_task(), self._fade_task()]
+        if self.tui is not None:
+            coroutines.append(self._render_task())
+        if CONFIG.ConfigReloadIntervalSeconds > 0:
+            coroutines.append(self._config_task())
+        self._tasks = [asyncio.create_task(coroutine) for coroutine in coroutines]
+        try:
+            await asyncio.gather(*self._tasks)
+        except asyncio.CancelledError:
+            # Ctrl+C (asyncio.run cancella il task principale): ripristino dei volumi come gestore di cancellazione
+            add_log_message("Uscita dal programma richiesta dall'utente.", "WARN")
+            await self._cancel_tasks()
+            controller.fade_engine.on_schedule = None
+            controller.fade_engine.start() # I fade di uscita vengono eseguiti dal thread del FadeEngine
+            await self._call(restore_target_volume_on_exit, controller)
+            if self.tui is not None:
+                self.tui[0].refresh()
+            raise
+        except Exception:
+            await self._cancel_tasks()
+            raise
+
+    async def _cancel_tasks(self):
+        import asyncio
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def _discovery_task(self):
+        import asyncio
+        index = self.controller.session_index
+        backend = self.controller.backend
+        last_scan_time = time.monotonic()
+        last_change_counter = backend.change_counter()
+        while True:
+            try:
+                await asyncio.wait_for(self._rescan_event.wait(), self.DISCOVERY_CHECK_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            now = time.monotonic()
+            change_counter = backend.change_counter()
+            if (self._rescan_event.is_set() or change_counter != last_change_counter
+                    or now - last_scan_time >= index.rescan_interval_seconds):
+                self._rescan_event.clear()
+                sessions = await self._call(index.list_sessions)
+                last_scan_time, last_change_counter = now, change_counter
+                await self.scan_queue.put((sessions, now, change_counter))
+
+    async def _control_task(self):
+        import asyncio
+        controller = self.controller
+        index = controller.session_index
+        poller = self.poller
+        shown = None
+        while True:
+            # Il tick parte allo scadere dell'intervallo di polling o appena arriva una nuova scansione
+            try:
+                index.submit_scan(*await asyncio.wait_for(self.scan_queue.get(), poller.interval))
+            except asyncio.TimeoutError:
+                pass
+            while not self.config_queue.empty():
+                await self._call(reload_config, self.config_queue.get_nowait(), controller, poller)
+            if PROFILER.enabled:
+                probe_start = time.perf_counter()
+                await self._call(controller.tick)
+                PROFILER.record_tick(time.perf_counter() - probe_start, poller.interval)
+            else:
+                await self._call(controller.tick)
+            self.ticks += 1
+            if self.recorder is not None:
+                self.recorder.record(controller, time.monotonic())
+            poller.update(controller.needs_fast_polling())
+            status.polling_rate_hz = poller.effective_rate
+            if index.scan_requested:
+                index.scan_requested = False
+                self._rescan_event.set()
+            if self.tui is not None:
+                current = (status_snapshot(), LOG_VERSION, CONFIG_VERSION)
+                if (current != shown or PROFILER.enabled) and self.render_queue.empty():
+                    shown = current
+                    self.render_queue.put_nowait(current)
+
+    async def _fade_task(self):
+        import asyncio
+        fade_engine = self.controller.fade_engine
+        while True:
+            self._fade_event.clear()
+            next_deadline = await self._call(fade_engine.pump)
+            timeout = None if next_deadline is None else max(0.0, next_deadline - fade_engine.clock())
+            try:
+                await asyncio.wait_for(self._fade_event.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _render_task(self):
+        import asyncio
+        live, renderer = self.tui
+        while True:
+            await self.render_queue.get()
+            live.update(renderer.render(), refresh=True)
+            await asyncio.sleep(1.0 / CONFIG.TuiRefreshRate) # Non più di TuiRefreshRate ridisegni al secondo
+
+    async def _config_task(self):
+        import asyncio
+        watcher = ConfigWatcher(CONFIG_PATH, 0.0)
+        while True:
+            await asyncio.sleep(max(CONFIG.ConfigReloadIntervalSeconds, 0.1))
+            settings = await self._call(watcher.poll)
+            if settings is not None:
+                await self.config_queue.put(settings)
+                if settings.ConfigReloadIntervalSeconds <= 0:
+                    add_log_message("Ricaricamento automatico di config.ini disattivato.", "INFO")
+                    return
+
+
+def run_async(controller, recorder=None, headless=False):
+    import asyncio
+    console = None
+    if headless:
+        setup_headless_logging()
+    else:
+        from rich.console import Console
+        from rich.live import Live
+        console = Console()
+        renderer = TuiRenderer()
+        live = Live(renderer.render(), auto_refresh=False, screen=True, transient=False)
+        live.start(refresh=True)
+    runtime = AsyncRuntime(controller, recorder, None if headless else (live, renderer))
+    try:
+        asyncio.run(runtime.run())
+    except KeyboardInterrupt:
+        pass # Il ripristino è già stato eseguito dal gestore di cancellazione di AsyncRuntime.run
+    except Exception as e:
+        if headless:
+            LOGGER.exception("ERRORE GLOBALE IMPREVISTO")
+        else:
+            console.print_exception(show_locals=True)
+        add_log_message(f"ERRORE GLOBALE IMPREVISTO: {e}", "ERROR")
+    finally:
+        controller.fade_engine.stop()
+        runtime.executor.shutdown(wait=False)
+        dump_profile()
+        add_log_message("Script terminato.", "INFO")
+        if not headless:
+            live.stop()
+
+    if not headless:
+        # Stampa log finale sulla console normale
+        print("\n--- Log ------------------------------")
+        for entry in LOG_MESSAGES:
+            console.print(format_log_message(entry))
+        print("--------------------------------------")
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Volume Changer: abbassa il volume di un'app quando un'altra è attiva.")
+    arg_parser.add_argument("--headless", action="store_true",
+                            help="Nessuna interfaccia: Rich non viene caricato e il log va su file (sezione [Headless] di config.ini).")
+    arg_parser.add_argument("--record", metavar="FILE",
+                            help="Registra i picchi dei trigger e i volumi dei target in un file traccia binario.")
+    arg_parser.add_argument("--replay", metavar="FILE",
+                            help="Simula le impostazioni di config.ini su una traccia registrata con --record e mostra un resoconto.")
+    arg_parser.add_argument("--backend", choices=AUDIO_BACKENDS, default="pycaw",
+                            help="Backend audio: 'simulated' genera sessioni e picchi sintetici dalle regole di config.ini (funziona senza Windows).")
+    arg_parser.add_argument("--asyncio", action="store_true",
+                            help="Runtime asyncio: scoperta sessioni, controllo, fade, interfaccia e config.ini in task separati.")
+    args = arg_parser.parse_args()
+
+    load_config() 
+
+    if args.replay:
+        run_replay(args.replay)
+        exit(0)
+
+    audio_backend = create_audio_backend(args.backend)
+    fade_engine = FadeEngine(audio_backend)
+    fade_engine.start()
+    controller = VolumeController(audio_backend, fade_engine)
+    recorder = TraceRecorder(args.record, controller.trigger_names, controller.target_names) if args.record else None
+
+    try:
+        if args.asyncio:
+            run_async(controller, recorder, args.headless)
+        elif args.headless:
+            run_headless(controller, recorder)
+        else:
+            run_tui(controller, recorder)
+    finally:
+        if recorder is not None:
+            recorder.close()
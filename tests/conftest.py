@@ -0,0 +1,83 @@
+# Test della logica di controllo su FakeAudioBackend e clock virtuale: funzionano anche fuori da Windows.
+import importlib.util
+import os
+import sys
+
+import pytest
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+sys.path.insert(0, SRC_DIR) # simulated_audio.py (backend finto) e gli import ritardati dello script
+
+from simulated_audio import RecordingVolumeControl
+
+
+@pytest.fixture(scope="session")
+def src_dir():
+    return SRC_DIR
+
+
+@pytest.fixture(scope="session")
+def volume_manager():
+    spec = importlib.util.spec_from_file_location("volume_manager", os.path.join(SRC_DIR, "volume_manager_1.1.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    cwd = os.getcwd()
+    os.chdir(SRC_DIR)
+    try:
+        module.load_config()
+    finally:
+        os.chdir(cwd)
+    return module
+
+
+@pytest.fixture
+def vm(volume_manager):
+    # Ogni test parte dalla configurazione di config.ini e da uno stato TUI pulito
+    saved_config = volume_manager.CONFIG
+    volume_manager.status = volume_manager.AppStatus()
+    yield volume_manager
+    volume_manager.CONFIG = saved_config
+    volume_manager.status = volume_manager.AppStatus()
+
+
+class VirtualLoop:
+    # Loop di controllo su clock virtuale a passi di 1 ms: FadeEngine.pump a ogni passo (come il suo thread)
+    # e VolumeController.tick all'intervallo dell'AdaptivePoller, aggiornato dopo ogni tick (come main_loop_tui)
+    def __init__(self, vm, backend, **controller_args):
+        self.now = 0.0
+        self._ms = 0
+        clock = lambda: self.now
+        self.clock = clock
+        self.fade_engine = vm.FadeEngine(clock=clock)
+        self.controller = vm.VolumeController(backend, self.fade_engine, clock=clock, **controller_args)
+        self.poller = vm.AdaptivePoller(vm.CONFIG.PollingIntervalSeconds, vm.CONFIG.MaxPollingIntervalSeconds,
+                                        vm.CONFIG.PollingBackoffFactor)
+        self._next_tick_ms = self._interval_ms()
+        self.ticks = 0
+
+    def _interval_ms(self):
+        return max(1, round(self.poller.interval * 1000))
+
+    def record_volume(self, session):
+        session.volume_control = RecordingVolumeControl(session.volume_control.volume, clock=self.clock)
+        return session.volume_control
+
+    def run(self, seconds, until=None):
+        # Avanza di seconds (o finché until() diventa vero); restituisce True se until() si è verificato
+        for _ in range(round(seconds * 1000)):
+            self._ms += 1
+            self.now = self._ms / 1000
+            self.fade_engine.pump(self.now)
+            if self._ms >= self._next_tick_ms:
+                self.controller.tick()
+                self.ticks += 1
+                self.poller.update(self.controller.needs_fast_polling(), self.now)
+                self._next_tick_ms = self._ms + self._interval_ms()
+            if until is not None and until():
+                return True
+        return False
+
+
+@pytest.fixture
+def virtual_loop(vm):
+    return lambda backend, **controller_args: VirtualLoop(vm, backend, **controller_args)
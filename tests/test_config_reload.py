@@ -0,0 +1,118 @@
+# Ricaricamento a caldo di config.ini su clock virtuale: il controllo del file rispetta ConfigReloadIntervalSeconds,
+# = 0 in un file ricaricato lo disattiva, e un target già ridotto conserva il volume originale
+import asyncio
+import os
+import re
+import shutil
+
+import pytest
+from simulated_audio import FakeAudioBackend
+
+
+@pytest.fixture
+def config_file(vm, src_dir, tmp_path, monkeypatch):
+    path = tmp_path / "config.ini"
+    shutil.copy(os.path.join(src_dir, "config.ini"), path)
+    monkeypatch.setattr(vm, "CONFIG_PATH", str(path))
+    set_option(path, "ConfigReloadIntervalSeconds", "0.1")
+    vm.apply_settings(vm.read_settings(str(path)))
+    return path
+
+
+def set_option(path, name, value):
+    text = path.read_text(encoding="utf-8")
+    text, count = re.subn(rf"^{name} = .*$", f"{name} = {value}", text, flags=re.MULTILINE)
+    assert count == 1
+    mtime_ns = os.stat(path).st_mtime_ns
+    path.write_text(text, encoding="utf-8")
+    os.utime(path, ns=(mtime_ns + 10**9, mtime_ns + 10**9)) # ConfigWatcher vede la modifica anche a parità di dimensione
+
+
+def disabled_logged(vm):
+    return any("config.ini disattivato" in message for _, _, message in vm.LOG_MESSAGES)
+
+
+def test_watcher_stops_when_reload_is_disabled(vm, config_file):
+    vm.LOG_MESSAGES.clear()
+    now = [0.0]
+    controller = vm.VolumeController(FakeAudioBackend(), vm.FadeEngine(clock=lambda: now[0]), clock=lambda: now[0])
+    poller = vm.AdaptivePoller(vm.CONFIG.PollingIntervalSeconds, vm.CONFIG.MaxPollingIntervalSeconds, vm.CONFIG.PollingBackoffFactor)
+    watcher = vm.ConfigWatcher(str(config_file), vm.CONFIG.ConfigReloadIntervalSeconds, clock=lambda: now[0])
+
+    set_option(config_file, "ConfigReloadIntervalSeconds", "0")
+    now[0] = 0.05 # ConfigReloadIntervalSeconds non ancora trascorso: il file non viene controllato
+    assert vm.poll_config_watcher(watcher, controller, poller) is watcher
+    assert vm.CONFIG.ConfigReloadIntervalSeconds == 0.1
+    now[0] = 0.1
+    assert vm.poll_config_watcher(watcher, controller, poller) is None # main_loop_tui smette di controllare il file
+    assert vm.CONFIG.ConfigReloadIntervalSeconds == 0 and disabled_logged(vm)
+
+
+def test_async_config_task_ends_when_reload_is_disabled(vm, config_file):
+    runtime = vm.AsyncRuntime(vm.VolumeController(FakeAudioBackend(), vm.FadeEngine()))
+
+    async def scenario():
+        runtime._loop = asyncio.get_running_loop()
+        runtime.config_queue = asyncio.Queue()
+        task = asyncio.create_task(runtime._config_task())
+        await asyncio.sleep(0) # Il task crea il suo ConfigWatcher prima della modifica
+        set_option(config_file, "ConfigReloadIntervalSeconds", "0")
+        await asyncio.wait_for(task, 3.0) # Il task termina invece di continuare a controllare il file
+        return runtime.config_queue.get_nowait()
+
+    try:
+        settings = asyncio.run(scenario())
+    finally:
+        runtime.executor.shutdown()
+    assert settings.ConfigReloadIntervalSeconds == 0
+
+
+@pytest.fixture
+def ducked(vm, config_file, virtual_loop):
+    # Spotify all'80% ridotto da Discord, che resta attivo per tutto il test
+    backend = FakeAudioBackend()
+    backend.add_session("Discord.exe", peak=0.9)
+    target = backend.add_session("Spotify.exe", volume=0.8)
+    loop = virtual_loop(backend)
+    control = loop.record_volume(target)
+    loop.run(0.5)
+    assert loop.controller.reduced[0]
+    watcher = vm.ConfigWatcher(str(config_file), vm.CONFIG.ConfigReloadIntervalSeconds, clock=loop.clock)
+    return loop, control, watcher
+
+
+def reload(vm, loop, watcher):
+    loop.run(watcher.check_interval_seconds) # Il controllo successivo del file cade tra due tick, come in main_loop_tui
+    assert vm.poll_config_watcher(watcher, loop.controller, loop.poller) is watcher
+    assert watcher.reloads == 1
+
+
+def test_reload_while_ducked_keeps_original_volume(vm, config_file, ducked):
+    loop, control, watcher = ducked
+    controller = loop.controller
+    assert controller.reduced_volumes[0] == pytest.approx(0.8 - 0.45) # Regola dinamica 0.75:0.45
+
+    set_option(config_file, "UseDynamicReduction", "False")
+    set_option(config_file, "FixedReductionAmountPoints", "0.60")
+    reload(vm, loop, watcher)
+    loop.run(vm.CONFIG.FadeOutDurationSeconds + 0.1)
+
+    assert controller.reduced[0]
+    assert controller.original_volumes[0] == pytest.approx(0.8) # Non il volume ridotto letto al momento del reload
+    assert controller.reduced_volumes[0] == pytest.approx(0.2)
+    assert control.volume == pytest.approx(0.2)
+
+
+def test_reload_restores_targets_dropped_from_every_rule(vm, config_file, ducked):
+    loop, control, watcher = ducked
+    controller = loop.controller
+
+    set_option(config_file, "TargetAppName", "vlc.exe")
+    reload(vm, loop, watcher)
+    reloaded_at = loop.now
+    loop.run(vm.CONFIG.FadeInDurationSeconds + 0.1)
+
+    # Il trigger è ancora attivo: senza il ripristino al reload Spotify resterebbe ridotto per sempre
+    assert control.volume == pytest.approx(0.8)
+    assert control.history[-1][0] <= reloaded_at + vm.CONFIG.FadeInDurationSeconds + 1e-9
+    assert controller.target_names == ["vlc.exe"] and not any(controller.reduced)
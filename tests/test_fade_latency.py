@@ -0,0 +1,65 @@
+# Latenza trigger -> duck con i fade eseguiti dal FadeEngine e il polling adattivo di main_loop_tui: la riduzione
+# parte al primo tick dopo l'inizio dell'attività del trigger. Da fermo il polling è rallentato fino a
+# MaxPollingIntervalSeconds; a metà di un fade-in di ripristino è veloce (PollingIntervalSeconds)
+import pytest
+from simulated_audio import FakeAudioBackend
+
+
+@pytest.fixture
+def duck_rig(vm, virtual_loop):
+    backend = FakeAudioBackend()
+    trigger = backend.add_session("Discord.exe")
+    target = backend.add_session("Spotify.exe", volume=0.8)
+    loop = virtual_loop(backend)
+    control = loop.record_volume(target)
+    loop.run(3.0)
+    return loop, trigger, control
+
+
+def duck_bound(vm, polling_interval):
+    # Il primo tick dopo l'attivazione avvia il fade-out, il cui primo step arriva dopo FadeOutDurationSeconds / FadeOutSteps
+    return polling_interval + vm.CONFIG.FadeOutDurationSeconds / vm.CONFIG.FadeOutSteps
+
+
+@pytest.mark.parametrize("fraction", [0.0, 0.3, 0.6, 0.99])
+def test_duck_from_rest_within_one_max_polling_interval(vm, duck_rig, fraction):
+    loop, trigger, control = duck_rig
+    # Trigger silenzioso da secondi: il polling è rallentato al massimo
+    assert loop.poller.interval == pytest.approx(vm.CONFIG.MaxPollingIntervalSeconds)
+    loop.run(fraction * vm.CONFIG.MaxPollingIntervalSeconds) # Attivazione in un punto qualunque dell'intervallo
+    trigger.meter.peak = 0.9
+    start = loop.now
+    loop.run(vm.CONFIG.MaxPollingIntervalSeconds + 0.2)
+    assert loop.controller.reduced[0]
+    latency = control.first_write_after(start, lambda level: level < 0.8)
+    assert latency is not None
+    assert latency <= duck_bound(vm, vm.CONFIG.MaxPollingIntervalSeconds) + 1e-9
+    # Dalla prima riduzione il polling torna veloce
+    assert loop.poller.interval == pytest.approx(vm.CONFIG.PollingIntervalSeconds)
+
+
+def test_duck_during_fade_in_within_one_polling_interval(vm, duck_rig):
+    loop, trigger, control = duck_rig
+    trigger.meter.peak = 0.9
+    loop.run(0.5)
+    ducked_volume = control.GetMasterVolume()
+    assert ducked_volume < 0.8
+
+    # Silenzio: dopo debounce e rilascio parte il fade-in; il trigger riparte a metà del fade-in
+    trigger.meter.peak = 0.0
+    assert loop.run(vm.CONFIG.DebounceTimeSeconds + 2.0, until=lambda: control.GetMasterVolume() > ducked_volume)
+    loop.run(vm.CONFIG.FadeInDurationSeconds / 2)
+    mid_fade_volume = control.GetMasterVolume()
+    assert ducked_volume < mid_fade_volume < 0.8
+    assert loop.poller.interval == pytest.approx(vm.CONFIG.PollingIntervalSeconds) # Target in transizione: polling veloce
+    trigger.meter.peak = 0.9
+    start = loop.now
+    loop.run(0.5)
+
+    latency = control.first_write_after(start, lambda level: level < mid_fade_volume)
+    assert latency is not None
+    assert latency <= duck_bound(vm, vm.CONFIG.PollingIntervalSeconds) + 1e-9
+    # Il fade-in è stato sostituito, non completato, e l'originale resta quello di prima del primo duck
+    assert max(level for timestamp, level in control.history if timestamp >= start) <= mid_fade_volume + 0.05
+    assert loop.controller.original_volumes[0] == pytest.approx(0.8)
+    assert control.GetMasterVolume() == pytest.approx(ducked_volume)
@@ -0,0 +1,109 @@
+# ProcessNameResolver su clock virtuale: eviction LRU e TTL, PID riciclati (create_time diverso),
+# processi spariti (psutil.NoSuchProcess) e capacità adattata al numero di sessioni
+import psutil
+import pytest
+from simulated_audio import FakeAudioBackend
+
+
+class FakeProcesses:
+    # Lettore (create_time, nome) come read_process_info; un PID assente è un processo terminato
+    def __init__(self):
+        self.processes = {}
+        self.reads = []
+
+    def __call__(self, pid):
+        self.reads.append(pid)
+        if pid not in self.processes:
+            return None, f"PID_{pid}_?"
+        return self.processes[pid]
+
+
+@pytest.fixture
+def clock():
+    now = [0.0]
+    return now
+
+
+@pytest.fixture
+def processes():
+    processes = FakeProcesses()
+    processes.processes = {pid: (100.0 + pid, f"app_{pid}.exe") for pid in range(1, 10)}
+    return processes
+
+
+def test_least_recently_used_entry_is_evicted(vm, clock, processes):
+    resolver = vm.ProcessNameResolver(max_entries=2, ttl_seconds=30.0, reader=processes, clock=lambda: clock[0])
+    assert [resolver.name(pid) for pid in (1, 2, 1)] == ["app_1.exe", "app_2.exe", "app_1.exe"]
+    resolver.name(3) # Scarta il PID 2, usato meno di recente
+    processes.reads.clear()
+    assert resolver.name(1) == "app_1.exe" and resolver.name(3) == "app_3.exe"
+    assert processes.reads == []
+    resolver.name(2)
+    assert processes.reads == [2]
+    assert (resolver.hits, resolver.lookups) == (3, 4)
+
+
+def test_entry_is_revalidated_after_ttl(vm, clock, processes):
+    resolver = vm.ProcessNameResolver(ttl_seconds=30.0, reader=processes, clock=lambda: clock[0])
+    resolver.name(1)
+    clock[0] = 29.9
+    resolver.name(1)
+    assert processes.reads == [1] # Entro il TTL: nessuna lettura
+    clock[0] = 30.0
+    assert resolver.name(1) == "app_1.exe"
+    assert processes.reads == [1, 1] # Stesso create_time: voce confermata, TTL rinnovato
+    clock[0] = 59.9
+    resolver.name(1)
+    assert processes.reads == [1, 1]
+
+
+def test_reused_pid_gets_the_new_process_name(vm, clock, processes):
+    resolver = vm.ProcessNameResolver(ttl_seconds=30.0, reader=processes, clock=lambda: clock[0])
+    assert resolver.name(5) == "app_5.exe"
+    processes.processes[5] = (500.0, "Spotify.exe") # Il processo termina e il PID viene riassegnato
+    clock[0] = 30.0
+    assert resolver.name(5) == "Spotify.exe"
+    assert resolver.name_lower(5) == "spotify.exe"
+
+
+def test_vanished_process_is_cached_until_ttl(vm, clock, processes):
+    resolver = vm.ProcessNameResolver(ttl_seconds=30.0, reader=processes, clock=lambda: clock[0])
+    assert resolver.name(42) == "PID_42_?"
+    clock[0] = 10.0
+    resolver.name(42)
+    assert processes.reads == [42]
+    processes.processes[42] = (4200.0, "Discord.exe") # PID riusato da un processo leggibile
+    clock[0] = 30.0
+    assert resolver.name(42) == "Discord.exe"
+
+
+def test_no_such_process_is_reported_as_unknown_pid(vm, monkeypatch):
+    def gone(pid):
+        raise psutil.NoSuchProcess(pid)
+    monkeypatch.setattr(vm.psutil, "Process", gone)
+    assert vm.read_process_info(1234) == (None, "PID_1234_?")
+    resolver = vm.ProcessNameResolver()
+    assert resolver.name(1234) == "PID_1234_?"
+    assert resolver.name(0) == "System" # PID 0 non viene mai letto
+
+
+def test_cache_grows_to_the_session_count(vm, clock):
+    # Più sessioni di ProcessNameCacheSize: le riscansioni non rileggono i processi già risolti
+    backend = FakeAudioBackend()
+    for i in range(20):
+        backend.add_session(f"app_{i}.exe")
+    resolver = vm.ProcessNameResolver(max_entries=8, ttl_seconds=30.0, reader=backend.read_process, clock=lambda: clock[0])
+    index = vm.SessionIndex(backend, ["app_3.exe"], rescan_interval_seconds=2.0, resolver=resolver, clock=lambda: clock[0])
+    index.refresh()
+    assert (resolver.max_entries, backend.process_reads) == (20, 20)
+    clock[0] = 2.0
+    index.refresh()
+    assert index.scans == 2 and backend.process_reads == 20
+
+    resolver.configure(4, 30.0) # Ricaricamento della configurazione: resta la capacità richiesta dalle sessioni
+    assert resolver.max_entries == 20
+    for session in backend.sessions[10:]:
+        backend.expire_session(session)
+    clock[0] = 2.02
+    index.refresh()
+    assert resolver.max_entries == 10 # Con meno sessioni torna verso ProcessNameCacheSize
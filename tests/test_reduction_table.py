@@ -0,0 +1,53 @@
+# Tabella compilata delle DynamicReductionRules: a gradini deve dare esattamente il risultato della scansione originale
+import math
+
+import pytest
+
+
+def linear_scan(rules, volume):
+    for threshold, reduction_amount in rules:
+        if volume >= threshold:
+            return reduction_amount
+    return 0.0
+
+
+def probe_volumes(rules):
+    # Griglia fine su [0, 1], le soglie, i valori subito sotto/sopra e i bordi delle celle della tabella
+    volumes = [i / 10000 for i in range(-5, 10006)] + [0.7496, 0.10001, 0.1001]
+    for threshold, _ in rules:
+        volumes += [threshold, math.nextafter(threshold, -math.inf), math.nextafter(threshold, math.inf),
+                    threshold - 1e-6, threshold + 1e-6]
+    return volumes
+
+
+RULE_SETS = [
+    None, # Regole di config.ini
+    ((0.95, 0.80), (0.85, 0.65), (0.75, 0.45), (0.50, 0.35), (0.25, 0.15), (0.10001, 0.10), (0.0, 0.05)),
+    ((0.6667, 0.5), (0.3333, 0.2), (0.0005, 0.01)),
+    tuple((i / 100, 0.8 * i / 100) for i in range(99, -1, -1)),
+]
+
+
+@pytest.mark.parametrize("rules", RULE_SETS)
+def test_stepwise_table_matches_linear_scan(vm, rules):
+    rules = rules or vm.CONFIG.DynamicReductionRulesList
+    vm.CONFIG = vm.CONFIG.replace(DynamicReductionRulesList=rules, ReductionTable=vm.build_reduction_table(rules))
+    mismatches = [(volume, vm.calculate_dynamic_reduction_amount(volume), linear_scan(rules, volume))
+                  for volume in probe_volumes(rules)
+                  if vm.calculate_dynamic_reduction_amount(volume) != linear_scan(rules, volume)]
+    assert mismatches == []
+
+
+def test_volume_just_below_a_threshold_keeps_the_lower_rule(vm):
+    assert vm.calculate_dynamic_reduction_amount(0.7496) == 0.35
+    assert vm.calculate_dynamic_reduction_amount(0.75) == 0.45
+    assert vm.calculate_dynamic_reduction_amount(0.10001) == 0.10
+    assert vm.calculate_dynamic_reduction_amount(0.1) == 0.05
+
+
+def test_interpolated_table_between_rule_points(vm):
+    rules = vm.CONFIG.DynamicReductionRulesList
+    vm.CONFIG = vm.CONFIG.replace(ReductionTable=vm.build_reduction_table(rules, interpolate=True))
+    assert vm.calculate_dynamic_reduction_amount(0.90) == pytest.approx(0.725)
+    assert vm.calculate_dynamic_reduction_amount(1.0) == pytest.approx(0.80)
+    assert not any(math.isnan(value) for value in vm.CONFIG.ReductionTable)
@@ -0,0 +1,123 @@
+# SessionIndex.refresh su FakeAudioBackend e clock virtuale: quando l'enumerazione completa viene rieseguita
+# (notifiche del backend, sessioni scadute, intervallo di sicurezza, nuovi nomi di app) e quando no
+import pytest
+from simulated_audio import FakeAudioBackend
+
+RESCAN = 2.0
+
+
+@pytest.fixture
+def clock():
+    now = [0.0]
+    return now
+
+
+def make_index(vm, clock, notify_changes=True):
+    backend = FakeAudioBackend(notify_changes=notify_changes)
+    trigger = backend.add_session("Discord.exe")
+    target = backend.add_session("Spotify.exe")
+    backend.add_session("chrome.exe")
+    index = vm.SessionIndex(backend, ["Discord.exe", "Spotify.exe"], RESCAN, clock=lambda: clock[0])
+    index.refresh()
+    return backend, index, trigger, target
+
+
+def indexed(index, name):
+    return [record.session for record in index.sessions_by_app[name]]
+
+
+def test_audio_backend_requires_the_core_methods(vm):
+    with pytest.raises(TypeError):
+        vm.AudioBackend()
+    assert vm.AudioBackend.__abstractmethods__ == {"list_sessions", "volume_control", "meter"}
+    # Il backend finto dei test espone tutta l'interfaccia, anche se non deriva da AudioBackend
+    interface = {name for name in vars(vm.AudioBackend) if not name.startswith("_")}
+    assert interface <= set(dir(FakeAudioBackend))
+
+
+@pytest.mark.parametrize("notify_changes", [True, False])
+def test_unchanged_ticks_do_not_rescan(vm, clock, notify_changes):
+    backend, index, trigger, target = make_index(vm, clock, notify_changes)
+    assert (index.scans, backend.list_calls) == (1, 1)
+    assert indexed(index, "Discord.exe") == [trigger] and indexed(index, "Spotify.exe") == [target]
+    version = index.version
+    for tick in range(1, 99):
+        clock[0] = tick * 0.02
+        index.refresh()
+    assert (index.scans, backend.list_calls, index.version) == (1, 1, version)
+
+
+@pytest.mark.parametrize("notify_changes", [True, False])
+def test_safety_rescan_after_interval(vm, clock, notify_changes):
+    backend, index, _, _ = make_index(vm, clock, notify_changes)
+    clock[0] = RESCAN - 0.01
+    index.refresh()
+    assert index.scans == 1
+    clock[0] = RESCAN
+    index.refresh()
+    assert index.scans == 2
+    clock[0] = 2 * RESCAN - 0.01 # L'intervallo riparte dall'ultima scansione
+    index.refresh()
+    assert index.scans == 2
+
+
+def test_created_session_triggers_rescan_with_notifications(vm, clock):
+    backend, index, _, _ = make_index(vm, clock)
+    clock[0] = 0.02
+    second_target = backend.add_session("Spotify.exe")
+    index.refresh()
+    assert index.scans == 2
+    assert second_target in indexed(index, "Spotify.exe")
+
+
+def test_created_session_waits_for_interval_without_notifications(vm, clock):
+    backend, index, _, _ = make_index(vm, clock, notify_changes=False)
+    clock[0] = 0.02
+    second_target = backend.add_session("Spotify.exe")
+    index.refresh()
+    assert index.scans == 1 and second_target not in indexed(index, "Spotify.exe")
+    clock[0] = RESCAN
+    index.refresh()
+    assert second_target in indexed(index, "Spotify.exe")
+
+
+@pytest.mark.parametrize("notify_changes", [True, False])
+def test_expired_session_is_dropped_and_rescanned(vm, clock, notify_changes):
+    backend, index, trigger, target = make_index(vm, clock, notify_changes)
+    index.interfaces.volume(index.sessions_by_app["Spotify.exe"][0])
+    assert len(index.interfaces) == 2
+    version = index.version
+    clock[0] = 0.02
+    backend.expire_session(target)
+    index.refresh()
+    assert indexed(index, "Spotify.exe") == [] and indexed(index, "Discord.exe") == [trigger]
+    assert index.version > version
+    assert index.scans == 2 # La sessione scaduta fa rieseguire subito l'enumerazione, anche senza notifiche
+    assert len(index.interfaces) == 1 # Interfacce della sessione scaduta rilasciate
+
+
+def test_expired_handle_is_dropped_before_the_rescan(vm, clock):
+    # Un handle scaduto ma ancora restituito dall'enumerazione (pycaw lo fa per qualche istante) non torna nell'indice
+    backend, index, trigger, target = make_index(vm, clock, notify_changes=False)
+    clock[0] = 0.02
+    target.expired = True
+    index.refresh()
+    assert target in backend.sessions
+    assert indexed(index, "Spotify.exe") == []
+
+
+def test_set_app_names_rescans_on_next_refresh(vm, clock):
+    backend, index, trigger, _ = make_index(vm, clock)
+    version = index.version
+    index.set_app_names(["Discord.exe", "Spotify.exe"]) # Stesso elenco: nessun effetto
+    index.refresh()
+    assert (index.scans, index.version) == (1, version)
+
+    index.set_app_names(["Discord.exe", "chrome.exe"])
+    assert index.version > version
+    assert indexed(index, "Discord.exe") == [trigger] # Le sessioni delle app rimaste restano indicizzate
+    assert "Spotify.exe" not in index.sessions_by_app
+    clock[0] = 0.02
+    index.refresh()
+    assert index.scans == 2
+    assert [session.process_name for session in indexed(index, "chrome.exe")] == ["chrome.exe"]
@@ -0,0 +1,59 @@
+# Cache delle interfacce COM (QueryInterface) e delle chiavi di sessione per l'intera vita della sessione
+from simulated_audio import FakeAudioBackend
+
+
+def make_backend(vm, background_sessions=8):
+    backend = FakeAudioBackend()
+    trigger = backend.add_session("Discord.exe", peak=0.9)
+    target = backend.add_session("Spotify.exe", volume=0.8)
+    for i in range(background_sessions):
+        backend.add_session(f"app_{i}.exe")
+    return backend, trigger, target
+
+
+def test_one_query_interface_per_session_lifetime(vm, virtual_loop):
+    backend, trigger, target = make_backend(vm)
+    loop = virtual_loop(backend)
+    loop.run(2.0) # Duck, poi tick con trigger ancora attivo
+    assert loop.ticks == 100
+    assert loop.controller.reduced[0]
+    # Meter del trigger e volume del target, una volta sola ciascuno
+    assert backend.query_interface_calls == 2
+
+
+def test_ticks_never_compute_session_keys(vm, virtual_loop):
+    backend, trigger, target = make_backend(vm)
+    loop = virtual_loop(backend)
+    loop.run(0.02)
+    scans, key_calls = loop.controller.session_index.scans, backend.session_key_calls
+    loop.run(1.0)
+    assert loop.controller.session_index.scans == scans
+    assert backend.session_key_calls == key_calls
+
+
+def test_reopened_session_queries_its_interfaces_again(vm, virtual_loop):
+    backend, trigger, target = make_backend(vm)
+    loop = virtual_loop(backend)
+    loop.run(0.5)
+    backend.expire_session(target)
+    reopened = backend.add_session("Spotify.exe", volume=0.5)
+    loop.run(0.5)
+    # Solo il volume della nuova sessione target; la voce della sessione scaduta è stata scartata
+    assert backend.query_interface_calls == 3
+    assert [record.session for record in loop.controller.target_sessions] == [reopened]
+    assert len(loop.controller.session_index.interfaces) == 2
+
+
+def test_com_error_invalidates_cached_interface(vm, virtual_loop):
+    backend, trigger, target = make_backend(vm)
+    loop = virtual_loop(backend)
+    loop.run(0.1)
+    class BrokenMeter:
+        def GetPeakValue(self):
+            raise OSError("sessione non più valida")
+    record = loop.controller.trigger_sessions[0]
+    record.meter = BrokenMeter()
+    loop.run(0.1)
+    # Dopo l'errore l'interfaccia viene richiesta di nuovo, una volta sola
+    assert backend.query_interface_calls == 3
+    assert record.meter is trigger.meter
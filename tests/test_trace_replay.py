@@ -0,0 +1,80 @@
+# Tracce binarie: quello che scrive TraceRecorder viene riletto uguale da TraceFile, e simulate_trace
+# riproduce riduzioni e ripristini della registrazione
+import math
+
+import pytest
+from simulated_audio import FakeAudioBackend
+
+TICK = 0.02
+# Silenzio, due raffiche di parlato separate da una pausa più lunga di debounce e fade-in, silenzio finale
+PEAKS = [0.0] * 50 + [0.5] * 100 + [0.0] * 150 + [0.5] * 100 + [0.0] * 150
+
+
+@pytest.fixture
+def recording(vm, tmp_path):
+    # Registra PEAKS un tick alla volta, come --record nel loop di controllo
+    path = tmp_path / "call.vct"
+    now = [0.0]
+    backend = FakeAudioBackend()
+    trigger = backend.add_session("Discord.exe")
+    backend.add_session("Spotify.exe", volume=0.8)
+    fade_engine = vm.FadeEngine(clock=lambda: now[0])
+    controller = vm.VolumeController(backend, fade_engine, clock=lambda: now[0])
+    # vlc.exe non ha sessioni: la sua colonna resta NaN
+    recorder = vm.TraceRecorder(str(path), ["Discord.exe"], ["Spotify.exe", "vlc.exe"], flush_rows=64)
+    volumes = []
+    try:
+        for tick_index, peak in enumerate(PEAKS):
+            now[0] = tick_index * TICK
+            trigger.meter.peak = peak
+            controller.tick()
+            recorder.record(controller, now[0])
+            volumes.append(controller.current_volumes[0])
+            fade_engine.pump(now[0])
+    finally:
+        recorder.close()
+    return path, volumes
+
+
+def duck_count(volumes, original_volume=0.8):
+    reduced = [volume < original_volume - 0.01 for volume in volumes]
+    return sum(1 for previous, current in zip([False] + reduced, reduced) if current and not previous)
+
+
+def test_trace_file_reads_back_what_was_recorded(vm, recording):
+    path, volumes = recording
+    with vm.TraceFile(str(path)) as trace:
+        assert trace.trigger_names == ["Discord.exe"]
+        assert trace.target_names == ["Spotify.exe", "vlc.exe"]
+        assert len(trace) == len(PEAKS)
+        for row_index, (peak, volume) in enumerate(zip(PEAKS, volumes)):
+            time, recorded_peak, recorded_volume, missing_volume = trace.row(row_index)
+            assert time == pytest.approx(row_index * TICK, abs=1e-5)
+            assert recorded_peak == pytest.approx(peak)
+            assert recorded_volume == pytest.approx(volume, abs=1e-6) # float32
+            assert math.isnan(missing_volume)
+        assert trace.duration() == pytest.approx((len(PEAKS) - 1) * TICK, abs=1e-5)
+
+
+def test_truncated_row_is_ignored(vm, recording):
+    path, _ = recording
+    with open(path, "ab") as trace_file:
+        trace_file.write(b"\0" * 6) # Registrazione interrotta a metà riga
+    with vm.TraceFile(str(path)) as trace:
+        assert len(trace) == len(PEAKS)
+
+
+def test_simulate_trace_replays_ducks_and_restores(vm, recording):
+    path, volumes = recording
+    assert duck_count(volumes) == 2
+    with vm.TraceFile(str(path)) as trace:
+        report = vm.simulate_trace(trace)
+
+    assert (report.duck_events, report.restore_events) == (2, 2)
+    assert len(report.duck_latencies) == 2
+    # Dopo un silenzio il polling può essere all'intervallo massimo, più un campione della traccia
+    assert max(report.duck_latencies) <= vm.CONFIG.MaxPollingIntervalSeconds + TICK + 1e-6
+    assert report.simulated_seconds == pytest.approx((len(PEAKS) - 1) * TICK, abs=1e-5)
+    # Ridotto almeno per le due raffiche, e rilasciato entro debounce + intervallo massimo dopo ciascuna
+    assert 2 * 100 * TICK <= report.reduced_seconds <= 2 * (100 * TICK + vm.CONFIG.DebounceTimeSeconds + 1.0)
+    assert 0 < report.volume_writes <= report.volume_write_requests
@@ -0,0 +1,93 @@
+# Rilevamento dell'attività del trigger (TriggerDetector + isteresi delle regole) su tracce sintetiche
+import math
+
+import pytest
+from simulated_audio import FakeAudioBackend, speech_trace, threshold_noise_trace
+
+
+def count_transitions(vm, virtual_loop, trace, detector_level, release_ratio):
+    vm.CONFIG = vm.CONFIG.replace(DetectorLevel=detector_level, ReleaseThresholdRatio=release_ratio)
+    backend = FakeAudioBackend()
+    trigger = backend.add_session("Discord.exe")
+    backend.add_session("Spotify.exe", volume=0.8)
+    loop = virtual_loop(backend)
+    tick = vm.CONFIG.PollingIntervalSeconds
+    transitions, was_active = 0, False
+    for peak in trace:
+        trigger.meter.peak = peak
+        loop.run(tick)
+        active = bool(loop.controller.rule_active[0])
+        transitions += active != was_active
+        was_active = active
+    return transitions
+
+
+def test_speech_gaps_do_not_flap(vm, virtual_loop):
+    trace = speech_trace(6, vm.CONFIG.PollingIntervalSeconds)
+    release_ratio = vm.CONFIG.ReleaseThresholdRatio
+    peak_transitions = count_transitions(vm, virtual_loop, trace, "peak", 1.0)
+    envelope_transitions = count_transitions(vm, virtual_loop, trace, "envelope", release_ratio)
+    # Un'attivazione e un rilascio per blocco di parlato, non per parola
+    assert envelope_transitions == 2 * 6
+    assert peak_transitions > 10 * envelope_transitions
+
+
+def test_noise_at_threshold_does_not_flap(vm, virtual_loop):
+    threshold, release_ratio = vm.CONFIG.TriggerVolumeThreshold, vm.CONFIG.ReleaseThresholdRatio
+    trace = threshold_noise_trace(20.0, vm.CONFIG.PollingIntervalSeconds, threshold)
+    assert count_transitions(vm, virtual_loop, trace, "peak", 1.0) > 100
+    # Con l'isteresi la regola si attiva una volta e resta attiva: il rumore non scende mai sotto soglia * ReleaseThresholdRatio
+    assert count_transitions(vm, virtual_loop, trace, "envelope", release_ratio) == 1
+    assert count_transitions(vm, virtual_loop, trace, "rms", release_ratio) == 1
+
+
+def test_hysteresis_between_release_and_trigger_threshold(vm, virtual_loop):
+    vm.CONFIG = vm.CONFIG.replace(DetectorLevel="peak")
+    threshold, release_ratio = vm.CONFIG.TriggerVolumeThreshold, vm.CONFIG.ReleaseThresholdRatio
+    backend = FakeAudioBackend()
+    trigger = backend.add_session("Discord.exe")
+    backend.add_session("Spotify.exe", volume=0.8)
+    loop = virtual_loop(backend)
+    tick = vm.CONFIG.PollingIntervalSeconds
+    between = threshold * (1.0 + release_ratio) / 2
+
+    trigger.meter.peak = between
+    loop.run(tick)
+    assert not loop.controller.rule_active[0] # Sotto soglia: non si attiva
+    trigger.meter.peak = threshold * 1.5
+    loop.run(tick)
+    assert loop.controller.rule_active[0]
+    trigger.meter.peak = between
+    loop.run(tick)
+    assert loop.controller.rule_active[0] # Sopra la soglia di rilascio: resta attiva
+    trigger.meter.peak = threshold * release_ratio * 0.5
+    loop.run(tick)
+    assert not loop.controller.rule_active[0]
+
+
+def test_envelope_attack_and_bounded_release(vm):
+    tick = vm.CONFIG.PollingIntervalSeconds
+    detector = vm.TriggerDetector("envelope", vm.CONFIG.EnvelopeAttackSeconds, vm.CONFIG.EnvelopeReleaseSeconds)
+    detector.resize(["trigger"])
+    detector.update(0, 0.0, 0.0)
+    # Attivazione entro un tick
+    assert detector.update(0, 0.5, tick) > vm.CONFIG.TriggerVolumeThreshold
+    # Rilascio dopo circa release * ln(picco / soglia di rilascio)
+    release_level = vm.CONFIG.TriggerVolumeThreshold * vm.CONFIG.ReleaseThresholdRatio
+    ticks = 1
+    while detector.update(0, 0.0, tick * (ticks + 1)) > release_level:
+        ticks += 1
+    expected = vm.CONFIG.EnvelopeReleaseSeconds * math.log(0.5 / release_level)
+    assert ticks * tick == pytest.approx(expected, abs=2 * tick)
+
+
+def test_rms_over_ring_buffer_window(vm):
+    detector = vm.TriggerDetector("rms", window_samples=4)
+    detector.resize(["a", "b"])
+    levels = [detector.update(0, peak, i * 0.02) for i, peak in enumerate((0.4, 0.4, 0.4, 0.4, 0.0, 0.0, 0.0, 0.0))]
+    assert levels == pytest.approx([0.4, 0.4, 0.4, 0.4, 0.4 * math.sqrt(0.75), 0.4 * math.sqrt(0.5), 0.2, 0.0])
+    # Lo slot vicino non è toccato, e resize conserva lo stato delle chiavi già note
+    assert detector.rms(1) == 0.0
+    detector.resize(["b", "a"])
+    detector.update(1, 0.4, 0.2)
+    assert detector.rms(1) == pytest.approx(0.2)
@@ -0,0 +1,151 @@
+# VolumeActuator su clock virtuale: tolleranza, limite di frequenza con fusione delle richieste, conflitti con
+# attesa crescente e azzeramento dell'attesa al ripristino
+import pytest
+from simulated_audio import FakeAudioBackend, FakeVolumeControl
+
+
+@pytest.fixture
+def clock():
+    now = [0.0]
+    return now
+
+
+def make_actuator(vm, clock, **settings):
+    return vm.VolumeActuator(clock=lambda: clock[0], **settings)
+
+
+def test_write_within_tolerance_is_dropped(vm, clock):
+    actuator = make_actuator(vm, clock, tolerance=0.001)
+    control = FakeVolumeControl(0.8)
+    channel = actuator.channel("target", control)
+    channel.GetMasterVolume() # L'ultimo valore letto conta come già scritto
+
+    channel.SetMasterVolume(0.8005, None)
+    assert (control.set_calls, actuator.dropped) == (0, 1)
+    channel.SetMasterVolume(0.5, None)
+    assert (control.set_calls, control.volume) == (1, 0.5)
+    channel.SetMasterVolume(0.5 - 0.0009, None)
+    assert (control.set_calls, actuator.dropped) == (1, 2)
+
+
+def test_writes_above_rate_limit_are_coalesced_and_flushed(vm, clock):
+    actuator = make_actuator(vm, clock, max_writes_per_second=100.0)
+    control = FakeVolumeControl(0.8)
+    channel = actuator.channel("target", control)
+
+    channel.SetMasterVolume(0.7, None)
+    clock[0] = 0.002
+    channel.SetMasterVolume(0.6, None) # Entro 10 ms dalla scrittura precedente: rimandata
+    clock[0] = 0.004
+    channel.SetMasterVolume(0.5, None) # Sostituisce la precedente ancora in attesa
+    assert (control.set_calls, control.volume) == (1, 0.7)
+    assert (actuator.deferred, actuator.coalesced) == (2, 1)
+    assert actuator.has_pending()
+
+    clock[0] = 0.008
+    actuator.flush() # Intervallo minimo non ancora trascorso
+    assert control.set_calls == 1
+    clock[0] = 0.011
+    actuator.flush()
+    assert (control.set_calls, control.volume) == (2, 0.5)
+    assert not actuator.has_pending()
+
+
+def test_final_write_is_not_rate_limited(vm, clock):
+    actuator = make_actuator(vm, clock, max_writes_per_second=100.0)
+    control = FakeVolumeControl(0.8)
+    channel = actuator.channel("target", control)
+    channel.SetMasterVolume(0.7, None)
+    clock[0] = 0.001
+    channel.SetMasterVolume(0.6, None)
+    channel.set_final_volume(0.5) # Sostituisce la richiesta rimandata e parte subito
+    assert (control.set_calls, control.volume) == (2, 0.5)
+    assert not actuator.has_pending()
+
+
+def test_fade_steps_above_rate_limit_are_coalesced(vm, virtual_loop):
+    vm.CONFIG = vm.CONFIG.replace(MaxWritesPerSecond=10.0)
+    backend = FakeAudioBackend()
+    backend.add_session("Discord.exe", peak=0.9)
+    target = backend.add_session("Spotify.exe", volume=0.8)
+    loop = virtual_loop(backend)
+    control = loop.record_volume(target)
+    loop.run(0.5)
+
+    # Fade-out di 15 step in 0.15 s con al massimo 10 scritture al secondo: gli step intermedi vengono fusi,
+    # la scrittura finale arriva comunque a fine fade
+    actuator = loop.controller.actuator
+    assert actuator.coalesced > 0 and actuator.written < actuator.requested
+    assert control.history[-1][1] == pytest.approx(loop.controller.reduced_volumes[0])
+    assert control.history[-1][0] <= 0.02 + vm.CONFIG.FadeOutDurationSeconds + 1e-9
+
+
+def test_deferred_write_is_flushed_by_the_next_tick(vm, virtual_loop):
+    backend = FakeAudioBackend()
+    backend.add_session("Discord.exe")
+    target = backend.add_session("Spotify.exe", volume=0.8)
+    loop = virtual_loop(backend)
+    control = loop.record_volume(target)
+    loop.run(0.5)
+    actuator = loop.controller.actuator
+    channel = actuator.channel(loop.controller.target_keys[0], control)
+
+    channel.SetMasterVolume(0.6, None)
+    channel.SetMasterVolume(0.5, None) # Entro 1 / MaxWritesPerSecond: rimandata
+    assert control.volume == 0.6 and actuator.has_pending()
+    tick = loop.ticks
+    assert loop.run(1.0, until=lambda: loop.ticks > tick)
+    assert control.volume == 0.5 and not actuator.has_pending()
+    assert control.history[-1][0] == loop.now # Inviata dal tick stesso
+
+
+def test_fight_detection_with_exponential_backoff(vm, clock):
+    actuator = make_actuator(vm, clock, fight_changes=3, fight_window_seconds=5.0,
+                             fight_backoff_seconds=2.0, fight_max_backoff_seconds=5.0)
+    actuator.channel("target", FakeVolumeControl(0.8))
+
+    def change_at(now):
+        clock[0] = now
+        return actuator.note_external_change("target")
+
+    # Variazioni più distanti della finestra: nessun conflitto
+    assert [change_at(t) for t in (0.0, 6.0, 12.0)] == [0.0, 0.0, 0.0]
+    # Tre variazioni entro FightWindowSeconds: sospensione di 2 s
+    assert [change_at(t) for t in (20.0, 21.0, 22.0)] == [0.0, 0.0, 2.0]
+    clock[0] = 23.9
+    assert actuator.in_backoff("target")
+    clock[0] = 24.1
+    assert not actuator.in_backoff("target")
+    # Ogni nuovo conflitto raddoppia l'attesa fino a FightMaxBackoffSeconds
+    assert [change_at(t) for t in (25.0, 25.5, 26.0)] == [0.0, 0.0, 4.0]
+    assert [change_at(t) for t in (31.0, 31.5, 32.0)] == [0.0, 0.0, 5.0]
+    assert actuator.fights == 3
+
+
+def test_backoff_resets_after_restore(vm, virtual_loop):
+    backend = FakeAudioBackend()
+    trigger = backend.add_session("Discord.exe", peak=0.9)
+    target = backend.add_session("Spotify.exe", volume=0.8)
+    loop = virtual_loop(backend)
+    loop.run(0.5)
+    controller = loop.controller
+    actuator = controller.actuator
+    key = controller.target_keys[0]
+    reduced_level = controller.reduced_volumes[0]
+    assert target.volume_control.volume == pytest.approx(reduced_level)
+
+    # Un'altra app riporta il volume all'80% a ogni ri-abbasso: al FightChanges-esimo cambio parte la sospensione
+    for _ in range(vm.CONFIG.FightChanges):
+        target.volume_control.volume = 0.8
+        loop.run(0.5)
+    assert actuator.fights == 1
+    assert actuator.in_backoff(key)
+    assert target.volume_control.volume == 0.8 # Durante la sospensione il target non viene ri-abbassato
+    channel = actuator.channel(key, controller.session_index.interfaces.volume(controller.target_sessions[0]))
+    assert channel.backoff_seconds == 2 * vm.CONFIG.FightBackoffSeconds
+
+    # Trigger silenzioso: dopo il debounce il target viene ripristinato e l'attesa azzerata
+    trigger.meter.peak = 0.0
+    assert loop.run(vm.CONFIG.DebounceTimeSeconds + 2.0, until=lambda: not controller.reduced[0])
+    assert not actuator.in_backoff(key)
+    assert channel.backoff_seconds == vm.CONFIG.FightBackoffSeconds